@@ -2,13 +2,27 @@
 # TriviaBot Config #
 ##                ##
 
-# List of admin nicknames and the single game channel
+# List of admin nicknames and the game channel
 ADMINS = ['admin', 'Bob']
 GAME_CHANNEL = '#triviachannel'
+# Uncomment to run a separate game in each of several channels instead
+#GAME_CHANNELS = ['#triviachannel', '#moretrivia']
 
 # Folder locations
 Q_DIR = './questions/'
 SAVE_DIR = './savedata/'
+# Every score change is appended to a journal. The journal is folded into a
+# full snapshot this many seconds after a change, or after this many changes.
+# With the sqlite backend these batch the changes instead, and unwritten
+# changes are lost in a crash, so keep them lower there.
+SAVE_DELAY = 300
+SAVE_CHANGES = 500
+# Uncomment to keep scores, answer history and question stats in an SQLite
+# database in SAVE_DIR. An existing scores.json is imported the first time.
+#SCORE_BACKEND = 'sqlite'
+# Uncomment to serve questions from a file compiled by utils/build_questions.py
+# instead of loading Q_DIR into memory. Rebuild it after editing questions.
+#Q_FILE = './questions.bin'
 
 # Bot's info
 DEFAULT_NICK = 'TriviaBot'
@@ -18,18 +32,88 @@ DEFAULT_QUIT = 'This is triviabot, signing off.'
 # Uncomment and change password, if the NICK is registered
 #IDENT_PASS = 'password'
 
+# How many players ?standings shows per page
+STANDINGS_PAGE = 10
+
 # Trivia Speed
 WAIT_INTERVAL = 15
+# Which letters clues reveal first: 'random', 'vowels' or 'initials', the
+# first letter of each word.
+CLUE_STYLE = 'random'
+# How many questions each game draws ahead of time, so the next one is
+# ready the moment the last is answered.
+PREFETCH_QUESTIONS = 3
+# Seconds to wait after the first correct answer, so the earliest answer by
+# the server's clock wins rather than the first one the bot reads.
+ANSWER_GRACE = 1.0
 LINE_RATE = 0.4
+# Once this many messages are waiting to be sent, standings are dropped
+OUTPUT_BACKLOG = 20
+# Each nick may use COMMAND_BURST commands at once, then COMMAND_RATE a
+# second. Over that, they're ignored. Guesses cost 0.25, and help,
+# standings, top and fastest cost 3, unless changed in COMMAND_COSTS.
+# COMMAND_COOLDOWNS sets the seconds before a command can be used again in
+# a channel, by anyone.
+COMMAND_RATE = 0.5
+COMMAND_BURST = 5
+#COMMAND_COSTS = {'clue': 2}
+#COMMAND_COOLDOWNS = {'standings': 10, 'top': 30, 'fastest': 30, 'help': 10}
+# How likely questions from a category are, by channel, with '*' for every
+# channel. Categories come from question prefixes like "Music:". 0 leaves a
+# category out, and anything not listed counts as 1.
+CATEGORY_WEIGHTS = {
+#    '*': {'word scramble': 0.5, 'unscramble this word': 0.5},
+#    '#triviachannel': {'music': 2},
+}
+# Each question's solve rate is learned as it is asked. Each time, the
+# closest to TARGET_SOLVE_RATE of DIFFICULTY_CANDIDATES random questions is
+# asked (1 turns this off), and with DIFFICULTY_POINTS harder questions are
+# worth up to half as much again, easier ones down to half.
+TARGET_SOLVE_RATE = 0.5
+DIFFICULTY_CANDIDATES = 3
+DIFFICULTY_POINTS = True
+# How many of the most recently asked questions won't be asked again
+REPEAT_WINDOW = 10000
 
 # Connection info
 SERVER = 'irc.freenode.net'
 SERVER_PORT = 6667
 # Increase this if you have a very poor connection
 TIMEOUT = 30
+# The longest to wait between attempts to reconnect, in seconds. The wait
+# starts at a second and doubles each time.
+RECONNECT_MAX_DELAY = 300
+# How many seconds starting up, signing on and joining the games should
+# take at most. A slower start is logged as a warning, with the time
+# each step took.
+SIGNON_BUDGET = 10
 # If not using SSL, leave this commented out
 #SERVER_TYPE = 'ssl'
 # If you need to bind to a specific address or port, uncomment the following
 # Defaults are to use a random port and any IPv4 interface
 #BIND_PORT = 43000
 #BIND_ADDR = '0.0.0.0'
+
+# Workers
+# To play on several networks, or spread many channels out, run a process
+# for each entry here. Each entry overrides any of the settings above for its
+# worker. The workers share the scores in SAVE_DIR, kept in SQLite whatever
+# SCORE_BACKEND says, and each picks up the others' points every SCORE_SYNC
+# seconds. Workers write their scores at least every 5 seconds, whatever
+# SAVE_DELAY says, unless their entry sets it. Compile the questions into
+# Q_FILE, so they share one copy in memory too. Workers which crash are
+# started again.
+#WORKERS = [
+#    {'SERVER': 'irc.freenode.net', 'GAME_CHANNELS': ['#triviachannel']},
+#    {'SERVER': 'irc.oftc.net', 'SERVER_PORT': 6697, 'SERVER_TYPE': 'ssl',
+#     'GAME_CHANNELS': ['#trivia', '#moretrivia']},
+#]
+SCORE_SYNC = 10
+
+# Monitoring
+# How much to log: 'DEBUG', 'INFO', 'WARNING' or 'ERROR'
+LOG_LEVEL = 'INFO'
+# Serve metrics in Prometheus' text format on this port of METRICS_ADDR, or
+# on a Unix socket if it is a path. Admins can also say ?stats.
+#METRICS_PORT = 9180
+#METRICS_ADDR = '127.0.0.1'
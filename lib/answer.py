@@ -1,64 +1,247 @@
-from random import randint
+from itertools import product
+from random import shuffle
+import re
+
+ARTICLES = frozenset(['a', 'an', 'the'])
+UNITS = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven',
+         'eight', 'nine', 'ten', 'eleven', 'twelve', 'thirteen', 'fourteen',
+         'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen']
+TENS = ['twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty',
+        'ninety']
+ORDINALS = ['first', 'second', 'third', 'fourth', 'fifth', 'sixth',
+            'seventh', 'eighth', 'ninth', 'tenth']
+SUFFIXES = ['st', 'nd', 'rd'] + ['th'] * 7
+NUMBERS = dict((word, str(value)) for value, word in enumerate(UNITS))
+NUMBERS.update((word, str(20 + value * 10)) for value, word in enumerate(TENS))
+NUMBERS.update((word, str(value + 1) + SUFFIXES[value])
+               for value, word in enumerate(ORDINALS))
+NUMBER_WORDS = frozenset(NUMBERS)
+VOWELS = frozenset('aeiouAEIOU')
+PUNCTUATION = re.compile(r'[^\w\s]', re.UNICODE)
+PARENTHESES = re.compile(r'\([^)]*\)?')
+ROMAN = re.compile(r'(?=[MDCLXVI])M{0,3}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})'
+                   r'(IX|IV|V?I{0,3})$')
+# Raw guesses longer than twice the longest form, or the answer as
+# written, plus this are rejected without being normalized.
+SLACK = 8
+# Limit on how many forms slash alternatives may expand into.
+MAX_FORMS = 16
+
+
+def normalize(text):
+    '''
+    Reduces text to a canonical form for comparing answers: casefolded,
+    without punctuation, articles or spaces, and with number words
+    written as digits. Text made only of articles and punctuation, like
+    "The", keeps them, just without spaces, so it can still be matched.
+    '''
+    try:
+        text = text.casefold()
+    except AttributeError:
+        text = text.lower()
+    words = PUNCTUATION.sub('', text.replace('&', ' and ')).split()
+    if NUMBER_WORDS.isdisjoint(words):
+        # Most guesses are plain words, so skip the number handling.
+        return (''.join([word for word in words if word not in ARTICLES]) or
+                ''.join(text.split()))
+    result = []
+    tens = False
+    for word in words:
+        if word in ARTICLES:
+            continue
+        if tens and word in UNITS[1:10]:
+            # twenty five -> 25
+            result[-1] = result[-1][0] + NUMBERS[word]
+            tens = False
+            continue
+        tens = word in TENS
+        result.append(NUMBERS.get(word, word))
+    return ''.join(result)
+
+
+def words(text):
+    '''
+    Splits text into casefolded words without punctuation.
+    '''
+    try:
+        text = text.casefold()
+    except AttributeError:
+        text = text.lower()
+    return PUNCTUATION.sub('', text).split()
+
+
+def numerals(text):
+    '''
+    Returns the words in text that read as Roman numerals, casefolded,
+    like the "xiv" in "Louis XIV". The bank writes them in any case, so
+    every word after the first counts, but not a leading "I" or "Mix".
+    '''
+    return frozenset(word for word in words(text)[1:]
+                     if ROMAN.match(word.upper()))
+
+
+def allowed_distance(form):
+    '''
+    How many typos are forgiven in a guess for this form. Numbers and
+    short answers must be exact.
+    '''
+    if len(form) < 5 or any(c.isdigit() for c in form):
+        return 0
+    if len(form) < 10:
+        return 1
+    return 2
+
+
+def within_distance(a, b, limit):
+    '''
+    Returns True if the edit distance between a and b is at most limit.
+
+    Only a band of width 2*limit+1 around the diagonal is computed and
+    the search stops as soon as a whole row is over the limit, so the
+    cost is O(len*limit) at worst.
+    '''
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if limit == 0:
+        return a == b
+    big = limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [big] * (len(b) + 1)
+        current[0] = i if i <= limit else big
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if a[i-1] == b[j-1] else 1
+            value = min(previous[j] + 1, current[j-1] + 1,
+                        previous[j-1] + cost)
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return False
+        previous = current
+    return previous[len(b)] <= limit
+
+
+def answer_forms(answer):
+    '''
+    Returns the normalized forms accepted for an answer: the answer
+    itself, without any parenthetical, each part of a "a; b" answer, and
+    every choice of a "glad/good to see you" style alternative. Each
+    form maps to the Roman numerals a guess for it must spell exactly.
+    '''
+    variants = set([answer, PARENTHESES.sub(' ', answer)])
+    for variant in list(variants):
+        variants.update(variant.split(';'))
+    for variant in list(variants):
+        words = [word.split('/') for word in variant.split()]
+        if any(len(choices) > 1 for choices in words):
+            for count, choice in enumerate(product(*words)):
+                if count == MAX_FORMS:
+                    break
+                variants.add(' '.join(choice))
+    forms = dict((normalize(variant), numerals(variant))
+                 for variant in variants)
+    forms.pop('', None)
+    return forms
+
+
+def reveal_order(answer, style='random'):
+    '''
+    Returns the positions of the letters and digits in answer, in the
+    reverse of the order they should be revealed, so clues can pop them
+    off the end.
 
-class Answer:
+    'random' reveals them in any order, 'vowels' the vowels first and
+    'initials' the first letter of each word first.
+    '''
+    positions = [i for i, char in enumerate(answer) if char.isalnum()]
+    shuffle(positions)
+    if style == 'vowels':
+        positions.sort(key=lambda i: answer[i] in VOWELS)
+    elif style == 'initials':
+        positions.sort(key=lambda i: i == 0 or not answer[i-1].isalnum())
+    return positions
+
+
+class Answer(object):
     '''
     This class implements storage for an answer you want to conceil
     and give clues 1 letter at a time.
 
+    The order letters are revealed in is worked out once, when the
+    answer is set, so each clue just pops positions off a list.
+
     Methods:
 
-    give_clue(): returns the masked string after revealing a letter and saving the mask.
+    give_clue(): returns the masked string after revealing a letter and
+        saving the mask.
     get_clue(): returns the masked string.
-    set_answer('string'): makes this object reusable, sets a new answer and clue mask.
+    set_answer('string'): makes this object reusable, sets a new answer
+        and clue mask.
+    check('guess'): returns True if the guess is close enough to the answer.
     reveal(): returns the answer string.
     '''
 
-    def __init__(self, answer='None'):
-        self._answer = answer
-        self._masked_answer = str()
+    __slots__ = ('_answer', '_style', '_mask', '_masked_answer', '_positions',
+                 '_forms', '_fuzzy', '_max_length', '_max_raw')
 
-        for i in self._answer:
-            if i.isalnum():
-                self._masked_answer += '*'
-            else:
-                self._masked_answer += i
+    def __init__(self, answer='None', style='random'):
+        self._answer = answer
+        self._style = style
+        self._mask = ['*' if char.isalnum() else char for char in answer]
+        self._masked_answer = ''.join(self._mask)
+        self._positions = reveal_order(answer, style)
+
+        # Work out everything a guess is compared against once, so
+        # checking a line of channel chatter stays cheap.
+        self._forms = answer_forms(self._answer)
+        self._fuzzy = [(form, allowed_distance(form), self._forms[form])
+                       for form in self._forms]
+        self._fuzzy = [entry for entry in self._fuzzy if entry[1]]
+        self._max_length = max([len(form) for form in self._forms] + [0])
+        # Number words shrink to digits, so an answer like "seventy eight"
+        # is far longer written out than its form.
+        self._max_raw = 2 * max(self._max_length, len(answer)) + SLACK
 
     def give_clue(self):
-        length = len(self._answer)
-        expose = int(length*0.25)
-        if expose == 0: expose = 1
-        #print("length: %d and expose: %d" % (length, expose))
-        for i in range(0, expose):
-            #print("i: %d" % i)
-            exposed = self.unmask()
-            #print(exposed)
-        return self._masked_answer
+        expose = max(1, int(len(self._answer)*0.25))
+        return self._reveal_letters(expose)
 
     def unmask(self):
-        if self._answer == self._masked_answer:
-            return self._masked_answer
-
-        letter = ' '
-
-        while not letter.isalnum():
-            index = randint(0, len(self._answer)-1)
-            letter = self._answer[index]
-            if self._masked_answer[index] == letter:
-                letter = ' '
-
-        temp = list(self._masked_answer)
-
-        temp[index] = letter
-
-        self._masked_answer = "".join(temp)
-
+        return self._reveal_letters(1)
+
+    def _reveal_letters(self, count):
+        positions = self._positions
+        for i in range(min(count, len(positions))):
+            index = positions.pop()
+            self._mask[index] = self._answer[index]
+        self._masked_answer = ''.join(self._mask)
         return self._masked_answer
 
+    def check(self, guess):
+        if len(guess) > self._max_raw:
+            return False
+        raw, guess = guess, normalize(guess)
+        if guess in self._forms:
+            return True
+        if len(guess) > self._max_length + 2:
+            return False
+        for form, limit, required in self._fuzzy:
+            if within_distance(guess, form, limit):
+                # Typos are forgiven, but "World War I" is not a typo of
+                # "World War II".
+                if not required or required.issubset(words(raw)):
+                    return True
+        return False
+
     def current_clue(self):
         return self._masked_answer
 
     def set_answer(self, new_answer):
-        self.__init__(answer=new_answer)
+        self.__init__(new_answer, self._style)
 
     def _reveal(self):
         return self._answer
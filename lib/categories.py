@@ -0,0 +1,94 @@
+from random import random, randrange
+import re
+
+# A category is a short prefix ending in a colon, like "Music :" or "007:".
+# Definitions like "To bring about: ..." are questions, not categories.
+PREFIX = re.compile(r'\s*(?![Tt]o\s)([^\W_][^:`?]{0,30}?)\s*:\s')
+WORD = re.compile(r'[^\W_]+', re.UNICODE)
+# Questions without a prefix, and anything with the generic "Category:"
+# prefix and nothing after it.
+UNCATEGORIZED = 'uncategorized'
+# Categories with fewer questions than this, which are mostly the words of
+# a definition before its colon, like "prying:", are folded into
+# uncategorized.
+MIN_MEMBERS = 5
+
+
+def category_key(text):
+    '''
+    Reduces a category name to lowercase words of letters and digits, so
+    "TV / Movies" and "tv/movies" are the same category.
+    '''
+    return ' '.join(WORD.findall(text.lower()))
+
+
+def category_of(question):
+    '''
+    Returns the category of a question, from a prefix like "Music:".
+    '''
+    match = PREFIX.match(question)
+    if match is not None and match.group(1).lower() == 'category':
+        # "Category: 1980s GrabBag: ..." is in the 1980s grabbag.
+        match = PREFIX.match(question, match.end())
+    if match is None:
+        return UNCATEGORIZED
+    return category_key(match.group(1)) or UNCATEGORIZED
+
+
+class AliasTable(object):
+    '''
+    Draws an index in proportion to a list of weights in O(1), after
+    O(n) setup, with Vose's alias method.
+    '''
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        if not count or total <= 0:
+            raise ValueError('Nothing to draw from.')
+        self._prob = [weight * count / total for weight in weights]
+        self._alias = list(range(count))
+        small = [i for i, p in enumerate(self._prob) if p < 1]
+        large = [i for i, p in enumerate(self._prob) if p >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._alias[less] = more
+            self._prob[more] += self._prob[less] - 1
+            if self._prob[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        for i in small + large:
+            self._prob[i] = 1
+
+    def draw(self):
+        i = randrange(len(self._prob))
+        return i if random() < self._prob[i] else self._alias[i]
+
+
+class CategoryPicker(object):
+    '''
+    Picks question numbers from a question bank, weighting each question
+    by its category, and leaving out categories weighted 0 or not in
+    `only`, if that is given.
+
+    A category is drawn in proportion to its weight times its question
+    count, then a question is drawn from it uniformly.
+    '''
+
+    def __init__(self, bank, weights=None, only=None):
+        weights = weights or {}
+        self.categories = []
+        scaled = []
+        for name, count in bank.categories():
+            weight = weights.get(name, 1)
+            if weight > 0 and (only is None or name in only):
+                self.categories.append(name)
+                scaled.append(count * weight)
+        self._members = [bank.members(name) for name in self.categories]
+        self._table = AliasTable(scaled)
+
+    def __call__(self):
+        members = self._members[self._table.draw()]
+        return members[randrange(len(members))]
@@ -0,0 +1,118 @@
+from binascii import hexlify, unhexlify
+from os import path
+import struct
+
+from lib.storage import atomic_write
+
+# One record per question: the first 6 bytes of its id, how often it was
+# asked and solved, the sum of the clue numbers it was solved on, and the
+# total seconds it took to solve.
+RECORD = struct.Struct('<6sHHHf')
+LIMIT = 0xffff
+# How many questions' worth of evidence the prior counts as.
+PRIOR_WEIGHT = 2.0
+
+
+class DifficultyModel(object):
+    '''
+    This class estimates how likely each question is to be solved, from
+    how it went every time it was asked.
+
+    Each question has a Beta posterior over its solve rate, updated in
+    O(1) per outcome. The prior is centred on the solve rate over every
+    question, so a question asked once doesn't look trivial or
+    impossible.
+
+    The estimates are kept in a file of fixed size records, which is
+    only read the first time an estimate is needed, so startup doesn't
+    wait on it. Entries are replaced rather than changed in place, so
+    snapshot() is a cheap shallow copy, which write() can then pack and
+    write from a thread.
+
+    Methods:
+
+    solved(question, clue, latency): notes a question being solved.
+    unsolved(question): notes a question going unsolved or skipped.
+    solve_rate(question): returns the estimated solve rate.
+    scale(question): returns how much to scale the question's points by.
+    snapshot(): returns the estimates for write(), or None if there are
+        none yet.
+    write(questions): writes a snapshot of the estimates.
+    '''
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._questions = None
+        self._asked = 0
+        self._solved = 0
+
+    def _load(self):
+        questions = {}
+        if path.exists(self._filename):
+            with open(self._filename, 'rb') as fd:
+                data = fd.read()
+            for start in range(0, len(data) - RECORD.size + 1, RECORD.size):
+                key, asked, solved, clues, seconds = \
+                    RECORD.unpack_from(data, start)
+                questions[hexlify(key).decode('ascii')] = [asked, solved,
+                                                           clues, seconds]
+        self._questions = questions
+        self._asked = sum(entry[0] for entry in questions.values())
+        self._solved = sum(entry[1] for entry in questions.values())
+
+    def _entry(self, question):
+        '''
+        Returns a copy of a question's entry, to change and put back.
+        '''
+        if self._questions is None:
+            self._load()
+        key = question[:12]
+        entry = list(self._questions.get(key, (0, 0, 0, 0.0)))
+        self._questions[key] = entry
+        return entry
+
+    def solved(self, question, clue=0, latency=None):
+        entry = self._entry(question)
+        if entry[0] < LIMIT:
+            entry[0] += 1
+            entry[1] += 1
+            entry[2] = min(LIMIT, entry[2] + (clue or 0))
+            entry[3] += latency or 0
+            self._asked += 1
+            self._solved += 1
+
+    def unsolved(self, question):
+        entry = self._entry(question)
+        if entry[0] < LIMIT:
+            entry[0] += 1
+            self._asked += 1
+
+    def solve_rate(self, question):
+        '''
+        The posterior mean solve rate.
+        '''
+        if self._questions is None:
+            self._load()
+        entry = self._questions.get(question[:12])
+        prior = (self._solved + 1.0) / (self._asked + 2.0)
+        if entry is None:
+            return prior
+        return ((entry[1] + prior * PRIOR_WEIGHT) /
+                (entry[0] + PRIOR_WEIGHT))
+
+    def scale(self, question):
+        '''
+        Points scale from 0.5 for a question everyone gets, through 1 for
+        one solved half the time, to 1.5 for one nobody gets.
+        '''
+        return 1.5 - self.solve_rate(question)
+
+    def snapshot(self):
+        if self._questions is None:
+            return None
+        return dict(self._questions)
+
+    def write(self, questions):
+        atomic_write(self._filename, b''.join(
+            RECORD.pack(unhexlify(key), *entry)
+            for key, entry in questions.items()))
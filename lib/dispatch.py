@@ -0,0 +1,41 @@
+import re
+
+# mIRC formatting: colours (\x03 with optional fg,bg), hex colours (\x04),
+# and the bold, italic, underline, strikethrough, monospace, reverse and
+# reset toggles.
+FORMATTING = re.compile('\x03(?:[0-9]{1,2}(?:,[0-9]{1,2})?)?'
+                        '|\x04(?:[0-9a-fA-F]{6}(?:,[0-9a-fA-F]{6})?)?'
+                        '|[\x02\x0f\x11\x16\x1d\x1e\x1f]')
+
+
+def strip_formatting(text):
+    '''
+    Removes mIRC colours and formatting, along with surrounding spaces.
+    Lines without any control characters skip the regex altogether.
+    '''
+    if text.isprintable():
+        return text.strip()
+    return FORMATTING.sub('', text).strip()
+
+
+def split_command(msg, nickname):
+    '''
+    Returns (command, args) if msg is a command to the bot, either
+    "?command args" or "nickname: command args", otherwise None.
+
+    msg should already be stripped. It is only split into words once it
+    looks like a command, so chatter costs a couple of comparisons.
+    '''
+    if not msg:
+        return None
+    if msg[0] == '?':
+        words = msg.lstrip('?').split()
+        if not words:
+            return None
+        return words[0].lower(), words[1:]
+    if not msg.startswith(nickname):
+        return None
+    words = msg.split()
+    if len(words) < 2 or words[0].rstrip(':,') != nickname:
+        return None
+    return words[1].lower(), words[2:]
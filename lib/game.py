@@ -0,0 +1,408 @@
+from collections import deque
+
+from lib.answer import Answer
+from lib.output import GAME, INFO
+from lib.questionbank import question_id
+
+
+def new_user():
+    '''
+    Returns the record kept for each user in a game channel.
+    '''
+    return {'wins': 0, 'modes': set(), 'strikes': 0}
+
+
+class TriviaGame(object):
+    '''
+    This class runs the trivia game in a single channel.
+
+    Each game has its own question, clue timer, votes and user list,
+    while the question bank, the sampler and the scores are shared by
+    every game through the bot, so one connection can host many games.
+    The timers of every game run off the bot's one scheduler.
+
+    The first correct answer opens a short grace window. When it closes,
+    whoever answered first by the server's clock wins, so the winner
+    doesn't depend on the order the lines happened to be read in.
+
+    A few questions are drawn ahead, each with its Answer built, and
+    topped up one at a time once the reactor is free, so moving on to
+    the next question after a correct answer costs next to nothing.
+
+    Methods:
+
+    start(): starts asking questions.
+    resume(): carries on after halt(), from the question it was on.
+    configure(interval, grace, clue_style, prefetch): changes settings.
+    stop(): stops the game and shows the standings.
+    halt(): stops the timers without a word, when the connection goes.
+    play(): asks a question, gives a clue or reveals the answer.
+    check(user, msg, stamp): returns True if msg is the answer.
+    skip(): moves on to the next question.
+    vote(user): votes to skip the question.
+    give_clue(): gives the next clue straight away.
+    show_question(): repeats the question.
+    '''
+
+    POINTS = {0: 100,
+              1: 75,
+              2: 50,
+              3: 25
+              }
+    CLUE_LABELS = {0: 'Clue:',
+                   1: '2nd Clue:',
+                   2: '3rd Clue:',
+                   3: 'Final Clue:'
+                   }
+    # The game stops when no one has said anything for this many
+    # questions' worth of clues.
+    IDLE_QUESTIONS = 10
+
+    def __init__(self, bot, channel, interval, grace=1.0,
+                 clue_style='random', prefetch=3):
+        self.bot = bot
+        self.channel = channel
+        self.users = {}
+        self._interval = interval
+        self._grace = grace
+        self._style = clue_style
+        self._answer = Answer(style=clue_style)
+        self._question = ''
+        self._question_id = None
+        self._asked_at = 0
+        self._race = []
+        self._clue_number = 0
+        self._current_points = 5
+        self._scale = 1.0
+        self._votes = 0
+        self._voters = []
+        # The categories to ask from, or None for all of them, and the
+        # picker the bot made for them.
+        self.categories = None
+        self._picker = None
+        # Questions drawn ahead of time, with their answers ready to check,
+        # so asking one never waits on the question bank.
+        self._prefetch = prefetch
+        self._ready = deque()
+        self._filling = None
+        self._last_played = 0
+        self._timer = None
+        self._idle = None
+
+    def _gmsg(self, msg, priority=GAME):
+        """
+        Write a message to the channel playing this game.
+        """
+        self.bot.msg(self.channel, msg, priority=priority)
+
+    def _get_running(self):
+        return self._timer is not None
+
+    running = property(_get_running)
+
+    def _get_picker(self):
+        return self._picker
+
+    def _set_picker(self, picker):
+        # Questions drawn with the old picker may be from the wrong
+        # categories now.
+        self._picker = picker
+        self._ready.clear()
+
+    picker = property(_get_picker, _set_picker)
+
+    def _idle_timeout(self):
+        return self.IDLE_QUESTIONS * (len(self.POINTS) + 1) * self._interval
+
+    def start(self):
+        if self._timer is not None:
+            return
+        scheduler = self.bot.scheduler
+        self._clue_number = 0
+        self._last_played = scheduler.seconds()
+        self._idle = scheduler.call_later(self._idle_timeout(),
+                                          self._check_idle)
+        self._timer = scheduler.call_later(self._interval, self._tick)
+        self.play()
+
+    def resume(self):
+        '''
+        Carries on from where halt() left the game, repeating the
+        question it was on, so a reconnect doesn't cost the channel one.
+        '''
+        if self._timer is not None:
+            return
+        if not self._clue_number:
+            self.start()
+            return
+        scheduler = self.bot.scheduler
+        self._last_played = scheduler.seconds()
+        self._idle = scheduler.call_later(self._idle_timeout(),
+                                          self._check_idle)
+        self._timer = scheduler.call_later(self._interval, self._tick)
+        self._gmsg("Current question: %s" % self._question)
+        self._gmsg("%s %s  Points: %d" % (
+            self.CLUE_LABELS[self._clue_number - 1],
+            self._answer.current_clue(), self._current_points))
+
+    def configure(self, interval, grace, clue_style, prefetch):
+        '''
+        Changes the game's settings, from the next clue or question on.
+        '''
+        self._interval = interval
+        self._grace = grace
+        self._style = clue_style
+        self._prefetch = prefetch
+
+    def halt(self):
+        '''
+        Cancels the game's timers, leaving the game where it is.
+        '''
+        self._race = []
+        if self._filling is not None:
+            self._filling.cancel()
+            self._filling = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._idle is not None:
+            self._idle.cancel()
+            self._idle = None
+
+    def stop(self):
+        '''
+        Stops the game and thanks people for playing,
+        then saves the scores.
+        '''
+        if self._timer is None:
+            return
+        if self._race:
+            self._award_race()
+        self.halt()
+        self._gmsg('Thanks for playing trivia!')
+        self._gmsg('Current rankings are:')
+        self.bot._standings(None, None, self.channel)
+        self._gmsg('Scores have been saved, and see you next game!')
+
+    def _tick(self):
+        '''
+        Plays on, having first set the next deadline one interval after
+        this one, so late timers don't push the clues back.
+        '''
+        scheduler = self.bot.scheduler
+        deadline = self._timer.time + self._interval
+        if deadline < scheduler.seconds():
+            deadline = scheduler.seconds() + self._interval
+        self._timer = scheduler.call_at(deadline, self._tick)
+        self.play()
+
+    def _play_now(self):
+        '''
+        Plays on straight away, then waits a whole interval again.
+        '''
+        self._timer = self._timer.reschedule(self._interval)
+        self.play()
+
+    def _check_idle(self):
+        '''
+        Stops the game if no one has played since the idle timeout. The
+        time is only noted as people play, and checked here when it may
+        have run out.
+        '''
+        scheduler = self.bot.scheduler
+        remaining = (self._last_played + self._idle_timeout() -
+                     scheduler.seconds())
+        if remaining > 0:
+            self._idle = scheduler.call_later(remaining, self._check_idle)
+            return
+        self._idle = None
+        self._gmsg('It appears I am talking to myself now!')
+        self.bot._stop(None, None, self.channel)
+
+    def play(self):
+        '''
+        Implements the main loop of the game.
+        '''
+        if self._clue_number == 0:
+            self._votes = 0
+            self._voters = []
+            self._new_question()
+            self._current_points = self._points()
+            self._gmsg("Next question:")
+            self._gmsg(self._question)
+            self._gmsg("%s %s  Points: %d" % (
+                self.CLUE_LABELS[self._clue_number],
+                self._answer.current_clue(), self._current_points))
+            self._asked_at = self.bot.scheduler.seconds()
+            self.bot._question_asked(self._question_id)
+            self._clue_number += 1
+        # we must be somewhere in between
+        elif self._clue_number < 4:
+            self._current_points = self._points()
+            self._gmsg('%s %s  Points: %d' % (
+                self.CLUE_LABELS[self._clue_number],
+                self._answer.give_clue(), self._current_points))
+            self._clue_number += 1
+        # no one must have gotten it.
+        else:
+            self._gmsg('No one got it. The answer was: %s' %
+                       self._answer.answer)
+            self.bot._question_unsolved(self._question_id)
+            self._clue_number = 0
+
+    def played(self):
+        '''
+        Notes that someone is playing, so the game keeps going.
+        '''
+        if self._timer is not None:
+            self._last_played = self.bot.scheduler.seconds()
+
+    def check(self, user, msg, stamp=None):
+        '''
+        Returns True if msg answers the question. stamp is the server's
+        time for the message, if it sent one.
+        '''
+        # Once the question is won or revealed, it stays closed until the
+        # next one is asked.
+        if (self._timer is None or not self._clue_number or
+                not self._answer.check(msg)):
+            return False
+        scheduler = self.bot.scheduler
+        now = scheduler.seconds()
+        if not self._race:
+            # Hold the clues until the race is settled.
+            self._timer.cancel()
+            self._timer = scheduler.call_later(self._grace, self._settle)
+        self._race.append((now if stamp is None else stamp, len(self._race),
+                           user, now - self._asked_at))
+        return True
+
+    def _settle(self):
+        '''
+        Closes the grace window, then waits an interval for the next
+        question.
+        '''
+        self._award_race()
+        self._timer = self.bot.scheduler.call_later(self._interval,
+                                                    self._tick)
+
+    def _award_race(self):
+        stamp, order, user, latency = min(self._race)
+        self._race = []
+        self._winner(user, latency)
+
+    def _winner(self, user, latency):
+        '''
+        Congratulates the winner for guessing correctly and assigns
+        points appropriately, then signals that it was guessed.
+        '''
+        self._gmsg("%s GOT IT!" % user)
+        self.bot._award(user, self._current_points, self._question_id,
+                        self._clue_number, latency)
+        self._gmsg("%s points have been added to your score!" %
+                   str(self._current_points))
+        self._clue_number = 0
+        record = self.users.setdefault(user, new_user())
+        record['wins'] += 1
+        if (record['wins'] == 2):
+            self.bot.mode(self.channel, True, 'v', user=user)
+            self._gmsg('Five correct answers! That earns you a voice!')
+            record['modes'].add('voice')
+        elif (record['wins'] == 4):
+            self.bot.mode(self.channel, True, 'h', user=user)
+            self._gmsg('Another fifteen correct answers, have some halfops!')
+            record['modes'].add('halfop')
+
+    def vote(self, user):
+        '''Implements user voting for the next question.
+
+        Need to keep track of who voted, and how many votes.
+
+        '''
+        if self._timer is None:
+            self._gmsg("We aren't playing right now.", INFO)
+            return
+        if user in self._voters:
+            self._gmsg("You already voted, %s, give someone else a chance to "
+                       "hate this question" % user, INFO)
+        elif self._votes < 2:
+            self._votes += 1
+            self._voters.append(user)
+            self._gmsg("%s, you have voted. %s more votes needed to "
+                       "skip." % (user, str(3-self._votes)), INFO)
+        else:
+            self._votes = 0
+            self._voters = []
+            self.skip()
+
+    def skip(self):
+        '''
+        Skips the current question.
+        '''
+        if self._timer is None:
+            self._gmsg("We are not playing right now.", INFO)
+            return
+        if self._race:
+            return
+        self._gmsg("Question has been skipped. The answer was: %s" %
+                   self._answer.answer)
+        self.bot._question_unsolved(self._question_id)
+        self._clue_number = 0
+        self._play_now()
+
+    def show_question(self):
+        if self._timer is None:
+            self._gmsg("We are not playing right now.", INFO)
+            return
+        self._gmsg("Current question: %s" % self._question, INFO)
+
+    def give_clue(self):
+        if self._timer is None:
+            self._gmsg("We are not playing right now.", INFO)
+            return
+        if self._race:
+            return
+        # Give the clue now, then wait another interval until the next
+        self._play_now()
+
+    def _new_question(self):
+        '''
+        Sets the next question, from those drawn ahead of time if there
+        are any, then draws more once the reactor is free.
+        '''
+        if self._ready:
+            question, qid, answer = self._ready.popleft()
+        else:
+            question, qid, answer = self._draw()
+        self._question = question
+        self._question_id = qid
+        self._answer = answer
+        self._scale = self.bot._point_scale(qid)
+        self._refill()
+
+    def _draw(self):
+        question, answer = self.bot._draw_question(self._picker)
+        return question, question_id(question), Answer(answer, self._style)
+
+    def _refill(self):
+        if self._filling is None and len(self._ready) < self._prefetch:
+            self._filling = self.bot.scheduler.call_later(0, self._fill)
+
+    def _fill(self):
+        '''
+        Draws one question ahead, so a burst of them doesn't hold up
+        anything else waiting on the reactor.
+        '''
+        self._filling = None
+        if self._timer is None:
+            return
+        self._ready.append(self._draw())
+        self._refill()
+
+    def _points(self):
+        '''
+        The points for answering at the current clue, scaled by how hard
+        the question is, to the nearest 5.
+        '''
+        return max(5, int(round(self.POINTS[self._clue_number] *
+                                self._scale / 5.0)) * 5)
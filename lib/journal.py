@@ -0,0 +1,105 @@
+import json
+from os import path, remove, rename
+from time import time
+
+
+class ScoreJournal(object):
+    '''
+    This class keeps an append-only log of score changes, one json event
+    per line, beside the scores.json snapshot.
+
+    Every event carries the player's new total as well as the points
+    gained, so replaying an event the snapshot already includes is
+    harmless. That keeps compaction simple: the log is rotated aside, a
+    new snapshot is written, then the rotated log is thrown away, and a
+    crash at any point in between loses nothing.
+
+    Methods:
+
+    open(): opens the log for appending.
+    append(nick, points, total, question, clue, latency): logs a change.
+    events(): yields every logged event, oldest first, one at a time.
+    replay(scores): applies the logged events to a scores dict.
+    rotate(): moves the log aside, ahead of writing a new snapshot.
+    discard_rotated(): drops the rotated log once the snapshot is safe.
+    reset(): empties the journal once a snapshot holds all of it.
+    close(): closes the log.
+    '''
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._rotated = filename + '.1'
+        self._log = None
+
+    def open(self):
+        if self._log is None:
+            self._log = open(self._filename, 'a')
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def append(self, nick, points, total, question=None, clue=None,
+               latency=None):
+        event = {'time': round(time(), 3),
+                 'nick': nick,
+                 'points': points,
+                 'total': total,
+                 'question': question,
+                 'clue': clue,
+                 'latency': latency,
+                 }
+        self._log.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self._log.flush()
+
+    def events(self):
+        for filename in (self._rotated, self._filename):
+            if not path.exists(filename):
+                continue
+            with open(filename, 'r') as log:
+                for line in log:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A torn write from a crash, only ever the last line.
+                        continue
+
+    def replay(self, scores):
+        '''
+        Applies the log to scores, returning how many events were seen.
+        Only one event is held in memory at a time.
+        '''
+        count = 0
+        for event in self.events():
+            scores[str(event['nick'])] = int(event['total'])
+            count += 1
+        return count
+
+    def rotate(self):
+        '''
+        Moves the log aside. If a rotated log is still around from a
+        compaction that didn't finish, the log is left where it is.
+        '''
+        if path.exists(self._rotated) or not path.exists(self._filename):
+            return
+        reopen = self._log is not None
+        self.close()
+        rename(self._filename, self._rotated)
+        if reopen:
+            self.open()
+
+    def discard_rotated(self):
+        if path.exists(self._rotated):
+            remove(self._rotated)
+
+    def reset(self):
+        '''
+        Empties the journal, once a snapshot holds everything in it.
+        '''
+        reopen = self._log is not None
+        self.close()
+        self.discard_rotated()
+        open(self._filename, 'w').close()
+        if reopen:
+            self.open()
@@ -0,0 +1,56 @@
+from heapq import nsmallest
+
+
+class LatencyStats(object):
+    '''
+    This class keeps how quickly each player answers, from the question
+    being asked to their winning answer arriving.
+
+    Only the count, total and best are kept for each player, so the
+    stats stay small enough to save as they are.
+
+    Methods:
+
+    record(nick, latency): notes a winning answer.
+    stats(nick): returns (answers, average, best), or None.
+    fastest(count): returns [(rank, nick, best)] for the quickest players.
+    state(): returns the stats, to be saved as JSON.
+    restore(state): loads stats returned by state().
+    '''
+
+    def __init__(self):
+        self._players = {}
+
+    def __len__(self):
+        return len(self._players)
+
+    def record(self, nick, latency):
+        if latency is None or latency < 0:
+            return
+        entry = self._players.get(nick)
+        if entry is None:
+            self._players[nick] = [1, latency, latency]
+        else:
+            entry[0] += 1
+            entry[1] += latency
+            entry[2] = min(entry[2], latency)
+
+    def stats(self, nick):
+        entry = self._players.get(nick)
+        if entry is None:
+            return None
+        return entry[0], entry[1] / entry[0], entry[2]
+
+    def fastest(self, count=10):
+        quickest = nsmallest(count, self._players.items(),
+                             key=lambda item: (item[1][2], item[0]))
+        return [(rank, nick, entry[2])
+                for rank, (nick, entry) in enumerate(quickest, start=1)]
+
+    def state(self):
+        return self._players
+
+    def restore(self, state):
+        self._players = dict((str(nick), [int(count), float(total),
+                                          float(best)])
+                             for nick, (count, total, best) in state.items())
@@ -0,0 +1,149 @@
+from bisect import bisect_left, insort
+
+# Buckets are split once they grow past twice this size.
+LOAD = 256
+
+
+class Leaderboard(object):
+    '''
+    This class keeps players ranked by score as scores change, so the
+    standings never need a full sort.
+
+    Players are kept in order of (-score, nick) in a list of sorted
+    buckets, with a Fenwick tree over the bucket sizes. Updating a
+    player and finding a rank or a position are O(log n), give or take
+    a bucket-sized insert.
+
+    Methods:
+
+    update(nick, score): sets a player's score.
+    remove(nick): drops a player.
+    rank(nick): returns the player's rank, starting at 1, or None.
+    top(count, start): returns [(rank, nick, score)] from rank start+1.
+    around(nick, radius): returns the ranks around a player.
+    '''
+
+    def __init__(self, scores=None):
+        self._buckets = []
+        self._maxes = []
+        self._tree = [0]
+        self._scores = {}
+        if scores:
+            keys = sorted((-score, nick) for nick, score in scores.items())
+            self._scores = dict(scores)
+            self._buckets = [keys[i:i + LOAD]
+                             for i in range(0, len(keys), LOAD)]
+            self._maxes = [bucket[-1] for bucket in self._buckets]
+            self._rebuild()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, nick):
+        return nick in self._scores
+
+    def _rebuild(self):
+        self._tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets):
+            self._add(i, len(bucket))
+
+    def _add(self, i, delta):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _before(self, i):
+        '''
+        Number of players in the buckets before bucket i.
+        '''
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        '''
+        Finds the bucket holding a 0 based position, returning the
+        bucket index and the position within it.
+        '''
+        i = 0
+        step = 1
+        while step * 2 < len(self._tree):
+            step *= 2
+        while step:
+            if i + step < len(self._tree) and self._tree[i + step] <= position:
+                i += step
+                position -= self._tree[i]
+            step //= 2
+        return i, position
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets = [[key]]
+            self._maxes = [key]
+            self._rebuild()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        if len(bucket) > 2 * LOAD:
+            self._buckets.insert(i + 1, bucket[LOAD:])
+            del bucket[LOAD:]
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, self._buckets[i + 1][-1])
+            self._rebuild()
+        else:
+            self._add(i, 1)
+
+    def _delete(self, key):
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild()
+
+    def update(self, nick, score):
+        if nick in self._scores:
+            self._delete((-self._scores[nick], nick))
+        self._scores[nick] = score
+        self._insert((-score, nick))
+
+    def remove(self, nick):
+        if nick in self._scores:
+            self._delete((-self._scores.pop(nick), nick))
+
+    def rank(self, nick):
+        if nick not in self._scores:
+            return None
+        key = (-self._scores[nick], nick)
+        i = bisect_left(self._maxes, key)
+        return self._before(i) + bisect_left(self._buckets[i], key) + 1
+
+    def top(self, count, start=0):
+        result = []
+        if start >= len(self) or count <= 0:
+            return result
+        i, j = self._locate(start)
+        rank = start + 1
+        while i < len(self._buckets) and len(result) < count:
+            for score, nick in self._buckets[i][j:j + count - len(result)]:
+                result.append((rank, nick, -score))
+                rank += 1
+            i += 1
+            j = 0
+        return result
+
+    def around(self, nick, radius=5):
+        rank = self.rank(nick)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - radius)
+        return self.top(rank - start + radius, start)
@@ -0,0 +1,211 @@
+from bisect import bisect_left
+from timeit import default_timer
+
+# Upper bounds, in seconds, of the buckets timings are counted in.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+PREFIX = 'triviabot_'
+
+
+class Histogram(object):
+    '''
+    Counts observations into fixed buckets, along with their count, sum
+    and largest value, so recording one is O(log buckets) and the memory
+    used never grows.
+    '''
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def average(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Timer(object):
+    '''
+    Times a with block into a histogram.
+    '''
+
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(default_timer() - self._start)
+        return False
+
+
+class Metrics(object):
+    '''
+    This class keeps the bot's counters, timings and gauges, for the
+    stats command and for scraping in Prometheus' text format.
+
+    Counters and histograms are made the first time they are used.
+    Gauges are functions, asked for their value only when the metrics
+    are read, returning a number or a dict of them.
+
+    Methods:
+
+    count(name, amount): adds to a counter.
+    observe(name, value): records a value, like a time in seconds.
+    timed(name): returns a context manager timing a block into name.
+    gauge(name, function): registers a gauge, or removes it given None.
+    counters(): returns {name: count}.
+    histograms(): returns {name: Histogram}.
+    gauges(): returns {name: value}, with dict gauges flattened.
+    uptime(): returns the seconds since the metrics were made.
+    prometheus(): returns every metric in Prometheus' text format.
+    '''
+
+    def __init__(self, now):
+        self._now = now
+        self._started = now()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def count(self, name, amount=1):
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def _histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram()
+        return histogram
+
+    def observe(self, name, value):
+        self._histogram(name).observe(value)
+
+    def timed(self, name):
+        return Timer(self._histogram(name))
+
+    def gauge(self, name, function):
+        if function is None:
+            self._gauges.pop(name, None)
+        else:
+            self._gauges[name] = function
+
+    def counters(self):
+        return dict(self._counters)
+
+    def histograms(self):
+        return dict(self._histograms)
+
+    def gauges(self):
+        values = {}
+        for name, function in self._gauges.items():
+            value = function()
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    values['%s_%s' % (name, key)] = item
+            else:
+                values[name] = value
+        return values
+
+    def uptime(self):
+        return self._now() - self._started
+
+    def prometheus(self):
+        lines = ['# TYPE %suptime_seconds gauge' % PREFIX,
+                 '%suptime_seconds %g' % (PREFIX, self.uptime())]
+        for name, value in sorted(self._counters.items()):
+            lines.append('# TYPE %s%s_total counter' % (PREFIX, name))
+            lines.append('%s%s_total %d' % (PREFIX, name, value))
+        for name, value in sorted(self.gauges().items()):
+            lines.append('# TYPE %s%s gauge' % (PREFIX, name))
+            lines.append('%s%s %g' % (PREFIX, name, value))
+        for name, histogram in sorted(self._histograms.items()):
+            lines.append('# TYPE %s%s histogram' % (PREFIX, name))
+            total = 0
+            for bound, count in zip(histogram.bounds + ('+Inf',),
+                                    histogram.counts):
+                total += count
+                lines.append('%s%s_bucket{le="%s"} %d' %
+                             (PREFIX, name, bound, total))
+            lines.append('%s%s_sum %g' % (PREFIX, name, histogram.sum))
+            lines.append('%s%s_count %d' % (PREFIX, name, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+class LagMonitor(object):
+    '''
+    Measures how late the reactor runs a timer set every interval, which
+    is how long anything else would have waited on it too.
+    '''
+
+    def __init__(self, metrics, call_later, now, interval=1.0):
+        self._metrics = metrics
+        self._call_later = call_later
+        self._now = now
+        self._interval = interval
+        self._timer = None
+        self.lag = 0.0
+
+    def start(self):
+        if self._timer is None:
+            self._timer = self._call_later(self._interval, self._check,
+                                           self._now() + self._interval)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _check(self, expected):
+        self.lag = max(0.0, self._now() - expected)
+        self._metrics.observe('reactor_lag_seconds', self.lag)
+        self._timer = self._call_later(self._interval, self._check,
+                                       self._now() + self._interval)
+
+
+class Startup(object):
+    '''
+    Notes how long after the process started each step of starting up
+    was done, so a slow start can be put down to the step to blame.
+
+    Methods:
+
+    mark(name, when): notes that a step was done, at when or now, unless
+        it already was, and returns the seconds since starting.
+    elapsed(name): returns the seconds a step took from starting, or None.
+    steps(): returns [(name, seconds)], in the order they were done.
+    report(): returns the steps as a line like "imports 0.25s, ...".
+    '''
+
+    def __init__(self, now, started=None):
+        self._now = now
+        self._started = now() if started is None else started
+        self._steps = {}
+
+    def mark(self, name, when=None):
+        if name not in self._steps:
+            if when is None:
+                when = self._now()
+            self._steps[name] = when - self._started
+        return self._steps[name]
+
+    def elapsed(self, name):
+        return self._steps.get(name)
+
+    def steps(self):
+        return sorted(self._steps.items(), key=lambda step: step[1])
+
+    def report(self):
+        return ', '.join('%s %.2fs' % step for step in self.steps())
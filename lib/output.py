@@ -0,0 +1,247 @@
+# Most servers cut lines at 512 bytes, including the nick!user@host prefix
+# they add when relaying and the command, so stay well short of that.
+LINE_LIMIT = 400
+
+
+def pack_lines(items, limit=LINE_LIMIT, separator=', '):
+    '''
+    Joins items into as few lines as possible, none of them longer than
+    limit bytes once encoded. An item too long for a line of its own is
+    left whole, for the caller to deal with.
+    '''
+    lines = []
+    current = []
+    size = 0
+    for item in items:
+        length = len(item.encode('utf-8'))
+        if current and size + len(separator) + length > limit:
+            lines.append(separator.join(current))
+            current = []
+            size = 0
+        if current:
+            size += len(separator)
+        current.append(item)
+        size += length
+    if current:
+        lines.append(separator.join(current))
+    return lines
+
+# Priorities, highest first. Game lines are questions, clues and winners.
+GAME = 0
+INFO = 1
+# Lines that may be merged or dropped when the queue backs up.
+DEFERRABLE = 2
+
+# What the server adds in front of a relayed line when we don't know our
+# own prefix yet: ':' nick '!' up to 10 user chars '@' up to 63 host chars.
+UNKNOWN_PREFIX = 1 + 1 + 10 + 1 + 63
+SEPARATOR = ' | '
+
+
+def split_text(text, limit):
+    '''
+    Splits text into pieces of at most limit bytes, on spaces where
+    possible.
+    '''
+    pieces = []
+    current = ''
+    for word in text.split(' '):
+        candidate = current + ' ' + word if current else word
+        if len(candidate.encode('utf-8')) <= limit:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        current = ''
+        while len(word.encode('utf-8')) > limit:
+            cut = limit
+            while len(word[:cut].encode('utf-8')) > limit:
+                cut -= 1
+            pieces.append(word[:cut])
+            word = word[cut:]
+        current = word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class OutputQueue(object):
+    '''
+    This class sits between the bot and the connection and paces what
+    the bot says, sending at most one line every `rate` seconds.
+
+    Messages queued for the same target are packed into as few lines as
+    the server's 512 byte limit allows, so a question, its clue and the
+    previous winner arrive together instead of trickling out. Game lines
+    go out before informational ones, and deferrable ones, like the
+    standings, are merged when repeated and dropped once `backlog`
+    messages are waiting or they have waited `max_age` seconds.
+
+    Methods:
+
+    put(kind, target, text, priority, key): queues a PRIVMSG or NOTICE.
+    after(target, callback): calls back once target's lines are sent.
+    clear(): drops everything queued, when the connection goes away.
+    metrics(): returns a dict of queue depth, latency and counts.
+    '''
+
+    def __init__(self, send, call_later, now, rate, nickname, backlog=20,
+                 max_age=30):
+        self._send = send
+        self._call_later = call_later
+        self._now = now
+        self._rate = rate or 0
+        self._nickname = nickname
+        self._backlog = backlog
+        self._max_age = max_age
+        self._queues = ([], [], [])
+        self._timer = None
+        self._next = 0
+        self._waiting = []
+        self.prefix = None
+        self.sent = 0
+        self.messages = 0
+        self.dropped = 0
+        self.merged = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.depth_max = 0
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues)
+
+    def _budget(self, kind, target):
+        '''
+        How many bytes of text fit in one line to target.
+        '''
+        if self.prefix:
+            prefix = 1 + len(self.prefix.encode('utf-8'))
+        else:
+            prefix = UNKNOWN_PREFIX + len(self._nickname().encode('utf-8'))
+        return 510 - prefix - len(' %s %s :' % (kind, target))
+
+    def put(self, kind, target, text, priority=INFO, key=None):
+        if not text:
+            # Servers refuse empty messages.
+            return
+        queue = self._queues[priority]
+        if priority == DEFERRABLE:
+            for item in queue:
+                if item[1:] == [kind, target, text, key]:
+                    self.merged += 1
+                    return
+            if len(self) >= self._backlog:
+                self.dropped += 1
+                return
+        queue.append([self._now(), kind, target, text, key])
+        self.depth_max = max(self.depth_max, len(self))
+        self._schedule()
+
+    def after(self, target, callback):
+        '''
+        Calls callback once nothing is left queued for target, so a PART
+        doesn't overtake the goodbye.
+        '''
+        self._waiting.append((target.lower(), callback))
+        self._notify()
+
+    def _notify(self):
+        if not self._waiting:
+            return
+        waiting = self._waiting
+        self._waiting = []
+        pending = set(item[2].lower() for queue in self._queues
+                      for item in queue)
+        for target, callback in waiting:
+            if target in pending:
+                self._waiting.append((target, callback))
+            else:
+                callback()
+
+    def clear(self):
+        self._waiting = []
+        for queue in self._queues:
+            del queue[:]
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+
+    def _schedule(self):
+        if self._timer is None and len(self):
+            # Even with no wait, go through the reactor, so everything
+            # queued in this turn can be packed together.
+            delay = max(0, self._next - self._now())
+            self._timer = self._call_later(delay, self._tick)
+
+    def _expire(self, now):
+        queue = self._queues[DEFERRABLE]
+        fresh = [item for item in queue if now - item[0] <= self._max_age]
+        self.dropped += len(queue) - len(fresh)
+        queue[:] = fresh
+
+    def _tick(self):
+        self._timer = None
+        now = self._now()
+        self._expire(now)
+        for queue in self._queues:
+            if queue:
+                break
+        else:
+            # What was left may have just expired.
+            self._notify()
+            return
+        queued, kind, target, text, key = queue[0]
+        budget = self._budget(kind, target)
+        if '\x01' in text:
+            # CTCP has to go out on its own.
+            del queue[0]
+            self._write(kind, target, text, [queued], 1)
+            return
+        if len(text.encode('utf-8')) > budget:
+            pieces = split_text(text, budget)
+            queue[0][3] = ' '.join(pieces[1:])
+            self._write(kind, target, pieces[0], [], 0)
+            return
+        parts = []
+        remaining = []
+        size = 0
+        blocked = False
+        for item in queue:
+            if item[1] == kind and item[2] == target and not blocked:
+                length = len(item[3].encode('utf-8'))
+                if parts:
+                    length += len(SEPARATOR)
+                if '\x01' not in item[3] and size + length <= budget:
+                    parts.append(item)
+                    size += length
+                    continue
+                # Anything after this for the target has to wait for it.
+                blocked = True
+            remaining.append(item)
+        queue[:] = remaining
+        self._write(kind, target, SEPARATOR.join(item[3] for item in parts),
+                    [item[0] for item in parts], len(parts))
+
+    def _write(self, kind, target, line, queued, messages):
+        now = self._now()
+        self._send(kind, target, line)
+        self.sent += 1
+        self.messages += messages
+        for when in queued:
+            self.latency_total += now - when
+            self.latency_max = max(self.latency_max, now - when)
+        self._next = now + self._rate
+        self._notify()
+        self._schedule()
+
+    def metrics(self):
+        return {'depth': len(self),
+                'depth_max': self.depth_max,
+                'lines_sent': self.sent,
+                'messages_sent': self.messages,
+                'dropped': self.dropped,
+                'merged': self.merged,
+                'latency_avg': (self.latency_total / self.messages
+                                if self.messages else 0.0),
+                'latency_max': self.latency_max,
+                }
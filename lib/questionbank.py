@@ -0,0 +1,267 @@
+from array import array
+from hashlib import sha1
+import mmap
+from os import listdir, path, rename
+from random import randrange
+import struct
+import sys
+
+from lib.categories import MIN_MEMBERS, UNCATEGORIZED, category_of
+
+# Layout of a compiled question file: a header, then count+1 little-endian
+# offsets into the data section, the category number of each question, the
+# category names separated by newlines, then the packed question`answer
+# records.
+MAGIC = b'TRVQ'
+# Bump this whenever the layout or the way questions are categorized
+# changes, so files compiled before are rebuilt rather than served.
+VERSION = 3
+HEADER = struct.Struct('<4sIIII')
+OFFSET = struct.Struct('<I')
+SPAN = struct.Struct('<II')
+CATEGORY = struct.Struct('<H')
+
+
+def parse_line(line):
+    '''
+    Splits a question`answer line into its parts.
+
+    Raises ValueError if the line is broken, so it can be skipped.
+    '''
+    question, answer = line.split('`')
+    answer = answer.strip()
+    if not question.strip() or not answer:
+        raise ValueError('Broken question: %s' % line)
+    return question, answer
+
+
+def question_id(question):
+    '''
+    Returns a short id for a question which stays the same when question
+    files are edited or reordered, for keeping history about it.
+    '''
+    return sha1(question.strip().encode('utf-8')).hexdigest()[:12]
+
+
+def scan_questions(directory, broken=None):
+    '''
+    Yields every well formed line in the directory as UTF-8 bytes, with
+    the answer stripped. Broken lines are passed to broken(filepath,
+    lineno, line) instead.
+    '''
+    for filename in sorted(listdir(directory)):
+        filepath = path.join(directory, filename)
+        if not path.isfile(filepath):
+            continue
+        with open(filepath, 'rb') as fd:
+            for lineno, raw in enumerate(fd, start=1):
+                line = raw.rstrip(b'\r\n')
+                try:
+                    question, answer = parse_line(line.decode('utf-8'))
+                except ValueError:
+                    # UnicodeDecodeError is a ValueError too.
+                    if broken is not None:
+                        broken(filepath, lineno, line)
+                    continue
+                yield (question + '`' + answer).encode('utf-8')
+
+
+def categorize(record, ids, names, numbers):
+    '''
+    Appends the category number of a question`answer record to ids,
+    numbering new categories as they come up.
+    '''
+    name = category_of(record.split(b'`', 1)[0].decode('utf-8'))
+    number = numbers.get(name)
+    if number is None:
+        number = numbers[name] = len(names)
+        names.append(name)
+    ids.append(number)
+
+
+def compile_questions(directory, filename, broken=None):
+    '''
+    Compiles the questions directory into a single file which can be
+    served by MappedQuestionBank. Returns the number of questions.
+
+    The file is written next to its destination and renamed over it,
+    so a running bot never maps a half written file.
+    '''
+    records = []
+    offsets = array('L', [0])
+    ids = []
+    names = []
+    numbers = {}
+    position = 0
+    for record in scan_questions(directory, broken):
+        records.append(record)
+        categorize(record, ids, names, numbers)
+        position += len(record)
+        offsets.append(position)
+    if position > 0xffffffff or len(names) > 0xffff:
+        raise ValueError('Question bank is too large to compile.')
+    names = '\n'.join(names).encode('utf-8')
+    with open(filename + '.new', 'wb') as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(records),
+                              len(numbers), len(names)))
+        out.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+        out.write(b''.join(CATEGORY.pack(number) for number in ids))
+        out.write(names)
+        out.write(b''.join(records))
+    rename(filename + '.new', filename)
+    return len(records)
+
+
+class QuestionBank(object):
+    '''
+    This class holds every question from the questions directory in
+    memory, so picking a question never has to touch the disk.
+
+    The directory is scanned once. Every well formed line is kept as
+    UTF-8 in one packed buffer, along with an array of line offsets,
+    which keeps the overhead per question down to a single integer.
+
+    Questions are also indexed by category, taken from prefixes like
+    "Music:", so picking from a category never touches the files.
+
+    Methods:
+
+    load(): (re)scans the directory and swaps in the new index.
+    get(index): returns the (question, answer) pair at index.
+    random(): returns a random (question, answer) pair.
+    category(index): returns the category of the question at index.
+    categories(): returns [(category, count)], largest first.
+    members(category): returns the question numbers in a category.
+    '''
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._data = b''
+        self._offsets = array('L', [0])
+        self._category_ids = array('H')
+        self._category_names = []
+        self._members = {}
+        self.broken = 0
+
+    def load(self):
+        '''
+        Scans the directory, returning the number of questions loaded.
+        The old index keeps serving until the new one is complete.
+        '''
+        lines = []
+        offsets = array('L', [0])
+        ids = array('H')
+        names = []
+        numbers = {}
+        position = 0
+        broken = []
+
+        def skipped(filepath, lineno, line):
+            broken.append(lineno)
+
+        for line in scan_questions(self._directory, skipped):
+            lines.append(line)
+            categorize(line, ids, names, numbers)
+            position += len(line)
+            offsets.append(position)
+        self._data = b''.join(lines)
+        self._offsets = offsets
+        self._index_categories(ids, names)
+        self.broken = len(broken)
+        return len(self)
+
+    def _index_categories(self, ids, names):
+        counts = [0] * len(names)
+        for number in ids:
+            counts[number] += 1
+        names = [name if count >= MIN_MEMBERS else UNCATEGORIZED
+                 for name, count in zip(names, counts)]
+        members = dict((name, array('L')) for name in names)
+        for index, number in enumerate(ids):
+            members[names[number]].append(index)
+        self._category_ids = ids
+        self._category_names = names
+        self._members = members
+
+    def category(self, index):
+        return self._category_names[self._category_ids[index]]
+
+    def categories(self):
+        return sorted(((name, len(members))
+                       for name, members in self._members.items()),
+                      key=lambda item: (-item[1], item[0]))
+
+    def members(self, category):
+        return self._members.get(category, array('L'))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def get(self, index):
+        start = self._offsets[index]
+        end = self._offsets[index + 1]
+        return parse_line(self._data[start:end].decode('utf-8'))
+
+    def random(self):
+        if not len(self):
+            raise IndexError('The question bank is empty.')
+        return self.get(randrange(len(self)))
+
+
+class MappedQuestionBank(QuestionBank):
+    '''
+    Serves questions from a file built by compile_questions, which is
+    memory mapped rather than read, so startup is near instant and the
+    questions live in the page cache instead of on the heap.
+
+    Broken lines were already rejected when the file was compiled, and
+    categories worked out, so only their index is built here.
+    '''
+
+    def __init__(self, filename):
+        QuestionBank.__init__(self, None)
+        self._filename = filename
+        self._map = None
+        self._count = 0
+        self._data_start = 0
+
+    def load(self):
+        '''
+        Maps the compiled file, returning the number of questions.
+        '''
+        with open(self._filename, 'rb') as fd:
+            new_map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, categories, names_size = (0, 0, 0, 0, 0)
+        if len(new_map) >= HEADER.size:
+            magic, version, count, categories, names_size = \
+                HEADER.unpack_from(new_map, 0)
+        if magic != MAGIC or version != VERSION:
+            new_map.close()
+            raise ValueError('%s is not a compiled question file, or was '
+                             'compiled by an older version.' % self._filename)
+        ids_start = HEADER.size + OFFSET.size * (count + 1)
+        names_start = ids_start + CATEGORY.size * count
+        ids = array('H')
+        ids.frombytes(new_map[ids_start:names_start])
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        names = new_map[names_start:names_start + names_size]
+        self._index_categories(ids, names.decode('utf-8').split('\n'))
+        old_map = self._map
+        self._map = new_map
+        self._count = count
+        self._data_start = names_start + names_size
+        if old_map is not None:
+            old_map.close()
+        return count
+
+    def __len__(self):
+        return self._count
+
+    def get(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError('Question index out of range.')
+        start, end = SPAN.unpack_from(self._map,
+                                      HEADER.size + OFFSET.size * index)
+        record = self._map[self._data_start + start:self._data_start + end]
+        return parse_line(record.decode('utf-8'))
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+# What each command costs from a nick's bucket, which holds `burst` tokens
+# and refills at `rate` tokens a second. Anything else costs 1. A guess is
+# any line of chatter while a game is running.
+COSTS = {'guess': 0.25,
+         'help': 3,
+         'standings': 3,
+         'top': 3,
+         'fastest': 3,
+         'categories': 3,
+         }
+# Seconds before a command may be used again in the same channel, by
+# anyone, for commands which make the bot say a lot.
+COOLDOWNS = {'standings': 10,
+             'top': 30,
+             'fastest': 30,
+             'categories': 30,
+             'category': 30,
+             'help': 10,
+             }
+
+
+class RateLimiter(object):
+    '''
+    This class keeps a token bucket for each nick, so no one can flood
+    the bot with commands or guesses and starve the game output for
+    everyone else.
+
+    Each command has a cost, taken from the nick's bucket. Commands in
+    the cooldowns dict may then not be used again in that channel, by
+    anyone, until their cooldown is over. A nick that is over its limit
+    is meant to be ignored without a reply.
+
+    Only the most recently seen max_nicks nicks are tracked. A nick
+    which has been quiet long enough to be forgotten would have had a
+    full bucket again anyway, unless the limit is very small.
+
+    Methods:
+
+    allow(nick, command, channel): returns True if the command may run.
+    '''
+
+    def __init__(self, now, rate=0.5, burst=5, costs=None, cooldowns=None,
+                 max_nicks=1000):
+        self._now = now
+        self._rate = rate
+        self._burst = burst
+        self._costs = dict(COSTS)
+        self._costs.update(costs or {})
+        self._cooldowns = dict(COOLDOWNS)
+        self._cooldowns.update(cooldowns or {})
+        self._max_nicks = max_nicks
+        self._buckets = OrderedDict()
+        self._cooling = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, nick, command, channel=None):
+        now = self._now()
+        if self._cooling.get((command, channel), 0) > now:
+            return False
+        cost = self._costs.get(command, 1)
+        bucket = self._buckets.get(nick)
+        if bucket is None:
+            tokens = self._burst
+        else:
+            tokens = min(self._burst,
+                         bucket[0] + (now - bucket[1]) * self._rate)
+            self._buckets.move_to_end(nick)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[nick] = (tokens, now)
+        if len(self._buckets) > self._max_nicks:
+            self._buckets.popitem(last=False)
+        if allowed and command in self._cooldowns:
+            self._cooling[(command, channel)] = now + self._cooldowns[command]
+        return allowed
@@ -0,0 +1,75 @@
+from collections import deque
+from random import randrange
+
+# A narrow pick, like a small category, may be mostly recent questions, so
+# it only gets this many tries to find one which isn't.
+MAX_TRIES = 50
+
+
+class QuestionSampler(object):
+    '''
+    This class picks question numbers uniformly over the whole bank,
+    while making sure none of the most recently asked ones come up again.
+
+    The recent picks are kept in a bounded queue with a set beside it, so
+    checking and remembering a pick are both O(1). The window is capped
+    at half the bank, which keeps the expected number of draws per pick
+    under two.
+
+    Methods:
+
+    draw(size, pick, candidates, prefer): returns a question number in
+        range(size), from pick() if given, which might favour some
+        questions over others. With several candidates, the one with
+        the lowest prefer(index) is chosen, and only it is remembered.
+    state(): returns the sampler state as a json friendly dict.
+    restore(state): restores a state returned by state().
+    '''
+
+    def __init__(self, window):
+        self._window = window
+        self._size = 0
+        self._recent = deque()
+        self._seen = set()
+
+    def draw(self, size, pick=None, candidates=1, prefer=None):
+        if size != self._size:
+            # The bank changed, so the remembered numbers mean nothing now.
+            self._size = size
+            self._recent.clear()
+            self._seen.clear()
+        window = min(self._window, size // 2)
+        while len(self._recent) > window:
+            self._seen.discard(self._recent.popleft())
+        index = self._candidate(size, pick)
+        if candidates > 1 and prefer is not None:
+            index = min([index] + [self._candidate(size, pick)
+                                   for i in range(candidates - 1)],
+                        key=prefer)
+        if window:
+            if len(self._recent) == window:
+                self._seen.discard(self._recent.popleft())
+            self._recent.append(index)
+            self._seen.add(index)
+        return index
+
+    def _candidate(self, size, pick):
+        if pick is None:
+            index = randrange(size)
+            while index in self._seen:
+                index = randrange(size)
+            return index
+        index = pick()
+        for i in range(MAX_TRIES):
+            if index not in self._seen:
+                break
+            index = pick()
+        return index
+
+    def state(self):
+        return {'size': self._size, 'recent': list(self._recent)}
+
+    def restore(self, state):
+        self._size = int(state['size'])
+        self._recent = deque(int(index) for index in state['recent'])
+        self._seen = set(self._recent)
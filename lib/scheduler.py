@@ -0,0 +1,118 @@
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+
+class Event(object):
+    '''
+    A call waiting in a Scheduler. Keep it to cancel or move the call.
+    '''
+
+    __slots__ = ('time', 'function', 'args', 'cancelled', '_scheduler')
+
+    def __init__(self, scheduler, when, function, args):
+        self._scheduler = scheduler
+        self.time = when
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def active(self):
+        return not self.cancelled
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._scheduler._cancelled += 1
+
+    def reschedule(self, delay):
+        '''
+        Moves the call to delay seconds from now, returning the Event
+        which now stands for it.
+        '''
+        self.cancel()
+        return self._scheduler.call_later(delay, self.function, *self.args)
+
+
+class Scheduler(object):
+    '''
+    This class runs every timed event of every game off a single reactor
+    timer, which is always armed for the earliest deadline.
+
+    Deadlines live in a heap. Cancelling only marks the event, which is
+    O(1), and marked events are skipped when they come up, or swept out
+    once they make up half the heap. Scheduling and rescheduling are
+    O(log n).
+
+    Methods:
+
+    call_later(delay, function, *args): returns an Event.
+    call_at(when, function, *args): the same, at a given time.
+    seconds(): the current time, as the scheduler sees it.
+    '''
+
+    def __init__(self, call_later, now):
+        self._reactor_call_later = call_later
+        self._now = now
+        self._heap = []
+        self._order = count()
+        self._cancelled = 0
+        self._timer = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def seconds(self):
+        return self._now()
+
+    def call_later(self, delay, function, *args):
+        return self.call_at(self._now() + delay, function, *args)
+
+    def call_at(self, when, function, *args):
+        event = Event(self, when, function, args)
+        heappush(self._heap, (event.time, next(self._order), event))
+        if not self._running:
+            self._arm()
+        return event
+
+    def _arm(self):
+        '''
+        Points the reactor timer at the earliest live deadline.
+        '''
+        while self._heap and self._heap[0][2].cancelled:
+            heappop(self._heap)
+            self._cancelled -= 1
+        if self._cancelled > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap
+                          if not entry[2].cancelled]
+            heapify(self._heap)
+            self._cancelled = 0
+        if not self._heap:
+            if self._timer is not None and self._timer.active():
+                self._timer.cancel()
+            self._timer = None
+            return
+        delay = max(0, self._heap[0][0] - self._now())
+        if self._timer is not None and self._timer.active():
+            # A timer armed for a cancelled event is left to fire early.
+            if self._heap[0][0] < self._timer.getTime():
+                self._timer.reset(delay)
+        else:
+            self._timer = self._reactor_call_later(delay, self._run)
+
+    def _run(self):
+        self._timer = None
+        self._running = True
+        try:
+            now = self._now()
+            while self._heap and self._heap[0][0] <= now:
+                event = heappop(self._heap)[2]
+                if event.cancelled:
+                    self._cancelled -= 1
+                    continue
+                # Mark it spent, so cancelling it later is harmless.
+                event.cancelled = True
+                event.function(*event.args)
+        finally:
+            self._running = False
+            self._arm()
@@ -0,0 +1,98 @@
+import json
+from os import makedirs, path
+
+from lib.journal import ScoreJournal
+from lib.storage import DebouncedSaver, atomic_write
+
+
+class JsonScoreStore(object):
+    '''
+    This class keeps the scores in scores.json, with a journal of every
+    change made since that snapshot was written.
+
+    The bot keeps the scores dict returned by load() and updates it
+    itself, then tells the store about each change. Changes go straight
+    to the journal, and the snapshot is rewritten in the background now
+    and then.
+
+    Methods:
+
+    load(): returns the saved scores dict.
+    add_points(nick, points, total, question, clue, latency): a win.
+    set_score(nick, total, points): an administrative change.
+    question_asked(question): a question was put to the channel.
+    flush(): writes a snapshot now, in the background.
+    flush_sync(): writes a snapshot now and waits for it.
+    close(): flushes and closes the store.
+    '''
+
+    def __init__(self, directory, call_later, defer, delay=300,
+                 threshold=500, observe=None):
+        self._directory = directory
+        self._filename = path.join(directory, 'scores.json')
+        self._journal = ScoreJournal(path.join(directory, 'scores.log'))
+        self._scores = {}
+        self._saver = DebouncedSaver(self._snapshot, self._write, call_later,
+                                     defer, delay, threshold,
+                                     observe=observe)
+
+    def load(self):
+        '''
+        Loads the last snapshot, plus anything in the journal since,
+        which is then folded into a fresh snapshot.
+        '''
+        if not path.exists(self._directory):
+            makedirs(self._directory)
+        scores = {}
+        try:
+            with open(self._filename, 'r') as savefile:
+                temp_dict = json.load(savefile)
+            for name in temp_dict.keys():
+                scores[str(name)] = int(temp_dict[name])
+        except (IOError, OSError, ValueError):
+            pass
+        if self._journal.replay(scores):
+            self._write(scores)
+            self._journal.reset()
+        self._journal.open()
+        self._scores = scores
+        return scores
+
+    def add_points(self, nick, points, total, question=None, clue=None,
+                   latency=None):
+        self._journal.append(nick, points, total, question, clue, latency)
+        self._saver.changed()
+
+    def set_score(self, nick, total, points):
+        self._journal.append(nick, points, total)
+        self._saver.changed()
+
+    def question_asked(self, question):
+        pass
+
+    def flush(self):
+        self._saver.changed()
+        self._saver.flush()
+
+    def flush_sync(self):
+        self._saver.flush_sync()
+
+    def close(self):
+        self._saver.flush_sync()
+        self._journal.close()
+
+    def _snapshot(self):
+        '''
+        Copies the scores for a new snapshot, moving the journal aside
+        first so the snapshot covers everything in it.
+        '''
+        self._journal.rotate()
+        return dict(self._scores)
+
+    def _write(self, scores):
+        '''
+        Writes a snapshot, then drops the journal it replaces. This runs
+        in a thread, so it only touches the copy it was given.
+        '''
+        atomic_write(self._filename, json.dumps(scores))
+        self._journal.discard_rotated()
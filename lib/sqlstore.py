@@ -0,0 +1,276 @@
+from contextlib import contextmanager
+import sqlite3
+from os import makedirs, path, rename
+from threading import Lock
+from time import time
+
+from lib.scores import JsonScoreStore
+from lib.storage import DebouncedSaver
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS players (
+    nick TEXT PRIMARY KEY,
+    score INTEGER NOT NULL DEFAULT 0,
+    answers INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS players_score ON players (score DESC);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    nick TEXT NOT NULL,
+    question TEXT,
+    points INTEGER NOT NULL,
+    clue INTEGER,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS answers_time ON answers (time);
+CREATE INDEX IF NOT EXISTS answers_nick ON answers (nick, time);
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question);
+CREATE TABLE IF NOT EXISTS questions (
+    question TEXT PRIMARY KEY,
+    asked INTEGER NOT NULL DEFAULT 0,
+    solved INTEGER NOT NULL DEFAULT 0,
+    total_latency REAL NOT NULL DEFAULT 0
+);
+'''
+
+
+class SQLiteScoreStore(object):
+    '''
+    This class keeps the scores in an SQLite database, along with every
+    answer given and how often each question is asked and solved, so
+    questions like "top this week" can be answered without loading the
+    whole history.
+
+    It has the same interface as JsonScoreStore. Changes are queued on
+    the reactor thread and written in batches, one transaction each,
+    from a thread. Queries also run in a thread and return Deferreds.
+
+    The database runs in WAL mode, so queries don't block the writer.
+    The first time it is opened, any scores.json in the save directory
+    is imported, then renamed out of the way.
+
+    Several bots may share the database. Every write takes the write
+    lock up front with BEGIN IMMEDIATE and waits its turn for up to 30
+    seconds, and scores are only ever added to, never overwritten, so no
+    bot's points are lost to another's. refresh() picks up the changes
+    the others made.
+
+    Methods, beyond those of JsonScoreStore:
+
+    top_since(since, count): the top scorers since a unix time.
+    question_stats(question): (asked, solved, average latency).
+    refresh(): the scores, if another bot changed them, else None.
+    '''
+
+    def __init__(self, directory, call_later, defer, delay=30,
+                 threshold=50, observe=None):
+        self._directory = directory
+        self._filename = path.join(directory, 'trivia.db')
+        self._call_later = call_later
+        self._defer = defer
+        self._db = None
+        self._lock = Lock()
+        self._pending = []
+        self._version = None
+        # Points this bot has given each player, and how many of them have
+        # been written, so the scores read back can be topped up with the
+        # rest.
+        self._given = {}
+        self._written = {}
+        self._saver = DebouncedSaver(self._take, self._write, call_later,
+                                     defer, delay, threshold, deltas=True,
+                                     requeue=self._requeue, observe=observe)
+
+    def load(self):
+        if not path.exists(self._directory):
+            makedirs(self._directory)
+        # The timeout is how long to wait on another bot's write lock.
+        # Transactions are begun by hand, so they can be IMMEDIATE.
+        self._db = sqlite3.connect(self._filename, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            # executescript() commits as it goes, so it can't share the
+            # transaction, but CREATE IF NOT EXISTS is safe to race.
+            self._db.executescript(SCHEMA)
+            with self._transaction():
+                if not self._db.execute(
+                        'SELECT 1 FROM players LIMIT 1').fetchone():
+                    self._migrate()
+            self._version = self._data_version()
+            rows = self._db.execute('SELECT nick, score FROM players')
+            return dict((str(nick), score) for nick, score in rows)
+
+    @contextmanager
+    def _transaction(self):
+        '''
+        Runs a block in a transaction holding the write lock from the
+        start, so it never has to give up halfway for another writer.
+        '''
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    def _data_version(self):
+        # Changes whenever another connection commits.
+        return self._db.execute('PRAGMA data_version').fetchone()[0]
+
+    def _migrate(self):
+        '''
+        Imports the scores kept by JsonScoreStore, journal included.
+        '''
+        if not path.exists(path.join(self._directory, 'scores.json')):
+            return
+        old_store = JsonScoreStore(self._directory, self._call_later,
+                                   self._defer)
+        scores = old_store.load()
+        old_store.close()
+        self._db.executemany('INSERT INTO players (nick, score) '
+                             'VALUES (?, ?)', scores.items())
+        for name in ('scores.json', 'scores.log'):
+            old = path.join(self._directory, name)
+            if path.exists(old):
+                rename(old, old + '.migrated')
+
+    def add_points(self, nick, points, total, question=None, clue=None,
+                   latency=None):
+        self._given[nick] = self._given.get(nick, 0) + points
+        self._pending.append(('answer', (time(), nick, question, points,
+                                         clue, latency)))
+        self._saver.changed()
+
+    def set_score(self, nick, total, points):
+        # Applied as the change this bot saw, in case another bot has
+        # changed the score since.
+        self._given[nick] = self._given.get(nick, 0) + points
+        self._pending.append(('set', (nick, points)))
+        self._saver.changed()
+
+    def question_asked(self, question):
+        self._pending.append(('asked', (question,)))
+        self._saver.changed()
+
+    def flush(self):
+        self._saver.flush()
+
+    def flush_sync(self):
+        self._saver.flush_sync()
+
+    def close(self):
+        self._saver.flush_sync()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _take(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _requeue(self, batch):
+        # A batch which failed, like when another bot held the lock for
+        # too long, was rolled back whole, so it all goes again.
+        self._pending[:0] = batch
+
+    def _write(self, batch):
+        '''
+        Writes a batch of changes in one transaction. Scores are
+        incremented rather than overwritten, so batches may land in any
+        order, from any number of bots.
+        '''
+        written = {}
+        with self._lock:
+            with self._transaction():
+                for kind, row in batch:
+                    if kind == 'answer':
+                        self._write_answer(*row)
+                        written[row[1]] = written.get(row[1], 0) + row[3]
+                    elif kind == 'set':
+                        self._db.execute(
+                            'INSERT OR IGNORE INTO players (nick) VALUES (?)',
+                            row[:1])
+                        self._db.execute(
+                            'UPDATE players SET score = score + ? '
+                            'WHERE nick = ?', (row[1], row[0]))
+                        written[row[0]] = written.get(row[0], 0) + row[1]
+                    elif kind == 'asked':
+                        self._db.execute(
+                            'INSERT OR IGNORE INTO questions (question) '
+                            'VALUES (?)', row)
+                        self._db.execute(
+                            'UPDATE questions SET asked = asked + 1 '
+                            'WHERE question = ?', row)
+            for nick, points in written.items():
+                self._written[nick] = self._written.get(nick, 0) + points
+
+    def _write_answer(self, when, nick, question, points, clue, latency):
+        self._db.execute('INSERT INTO answers (time, nick, question, points, '
+                         'clue, latency) VALUES (?, ?, ?, ?, ?, ?)',
+                         (when, nick, question, points, clue, latency))
+        self._db.execute('INSERT OR IGNORE INTO players (nick) VALUES (?)',
+                         (nick,))
+        self._db.execute('UPDATE players SET score = score + ?, '
+                         'answers = answers + 1, last_seen = ? '
+                         'WHERE nick = ?', (points, when, nick))
+        if question is not None:
+            self._db.execute('INSERT OR IGNORE INTO questions (question) '
+                             'VALUES (?)', (question,))
+            self._db.execute('UPDATE questions SET solved = solved + 1, '
+                             'total_latency = total_latency + ? '
+                             'WHERE question = ?', (latency or 0, question))
+
+    def _query(self, sql, args):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _read_changes(self):
+        with self._lock:
+            version = self._data_version()
+            if version == self._version:
+                return None
+            self._version = version
+            rows = self._db.execute('SELECT nick, score FROM players')
+            return rows.fetchall(), dict(self._written)
+
+    def refresh(self):
+        '''
+        Reads the scores back if another bot has written to the database
+        since they were last read. Points this bot gave which aren't
+        written yet are added on, so they don't go missing until then.
+        '''
+        def merge(changes):
+            if changes is None:
+                return None
+            rows, written = changes
+            return dict((str(nick), score + self._given.get(nick, 0) -
+                         written.get(nick, 0)) for nick, score in rows)
+
+        return self._defer(self._read_changes).addCallback(merge)
+
+    def top_since(self, since, count=10):
+        return self._defer(self._query,
+                           'SELECT nick, SUM(points) AS total FROM answers '
+                           'WHERE time >= ? GROUP BY nick '
+                           'ORDER BY total DESC LIMIT ?', (since, count))
+
+    def question_stats(self, question):
+        d = self._defer(self._query,
+                        'SELECT asked, solved, total_latency FROM questions '
+                        'WHERE question = ?', (question,))
+
+        def averaged(rows):
+            if not rows:
+                return (0, 0, None)
+            asked, solved, total_latency = rows[0]
+            return (asked, solved, total_latency / solved if solved else None)
+
+        d.addCallback(averaged)
+        return d
@@ -0,0 +1,154 @@
+from os import fsync, rename
+from threading import Lock
+from timeit import default_timer
+
+
+def atomic_write(filename, data):
+    '''
+    Writes data to filename without ever leaving a half written file
+    behind: it goes to a temporary file first, which is synced to disk
+    and then renamed over the original.
+    '''
+    temp = filename + '.tmp'
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with open(temp, mode) as savefile:
+        savefile.write(data)
+        savefile.flush()
+        fsync(savefile.fileno())
+    rename(temp, filename)
+
+
+class DebouncedSaver(object):
+    '''
+    This class batches saves of data which changes often, like the
+    scores, so the game doesn't rewrite a file on every change.
+
+    A save happens once `delay` seconds have passed since the first
+    unsaved change, or as soon as `threshold` changes have piled up.
+    The data is captured by snapshot() on the calling thread, then handed
+    to write() through defer(), which is meant to run it in a thread.
+
+    Snapshots can be written in any order, so one which lands after a
+    newer one is skipped. Pass deltas=True if each write only holds the
+    changes since the last one, so every write has to happen.
+
+    If observe is given, it is called on the calling thread with how many
+    seconds each write took in the thread.
+
+    A write which fails is tried again after the delay. With deltas,
+    requeue(data) is given the changes which weren't written, to put
+    back ahead of any made since. The failure is still passed on.
+
+    Methods:
+
+    changed(): marks the data dirty, scheduling a save.
+    flush(): saves now in the background, if anything changed.
+    flush_sync(): saves now and waits for it, for use on shutdown.
+    '''
+
+    def __init__(self, snapshot, write, call_later, defer, delay=30,
+                 threshold=20, deltas=False, requeue=None, observe=None):
+        self._snapshot = snapshot
+        self._write = write
+        self._call_later = call_later
+        self._defer = defer
+        self._delay = delay
+        self._threshold = threshold
+        self._deltas = deltas
+        self._requeue = requeue
+        self._observe = observe
+        self._changes = 0
+        self._timer = None
+        self._writing = False
+        self._pending = False
+        self._lock = Lock()
+        self._generation = 0
+        self._written = 0
+
+    def changed(self):
+        self._changes += 1
+        if self._changes >= self._threshold:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self._call_later(self._delay, self.flush)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            if self._timer.active():
+                self._timer.cancel()
+            self._timer = None
+
+    def _take(self):
+        '''
+        Captures the data to save, along with a generation number which
+        stops an older write from landing after a newer one.
+        '''
+        self._cancel_timer()
+        self._changes = 0
+        self._generation += 1
+        return self._generation, self._snapshot()
+
+    def _save(self, generation, data):
+        '''
+        Writes data, returning how long that took, or None if it was
+        skipped.
+        '''
+        with self._lock:
+            if not self._deltas and generation <= self._written:
+                return None
+            start = default_timer()
+            self._write(data)
+            self._written = generation
+            return default_timer() - start
+
+    def flush(self):
+        if self._writing:
+            # Save again once the write in progress is done.
+            self._pending = True
+            return
+        if not self._changes:
+            self._cancel_timer()
+            return
+        self._writing = True
+        self._pending = False
+        generation, data = self._take()
+        d = self._defer(self._save, generation, data)
+        d.addCallbacks(self._saved, self._failed, errbackArgs=(data,))
+        return d
+
+    def _saved(self, result):
+        self._writing = False
+        if self._observe is not None and isinstance(result, float):
+            self._observe(result)
+        if self._pending:
+            self._pending = False
+            self.flush()
+        return result
+
+    def _failed(self, failure, data):
+        self._unsaved(data)
+        return self._saved(failure)
+
+    def _unsaved(self, data):
+        '''
+        Keeps data which couldn't be written, to try again later.
+        '''
+        if self._requeue is not None:
+            self._requeue(data)
+        self._changes += 1
+        if self._timer is None:
+            self._timer = self._call_later(self._delay, self.flush)
+
+    def flush_sync(self):
+        self._pending = False
+        if not self._changes:
+            self._cancel_timer()
+            return
+        generation, data = self._take()
+        try:
+            seconds = self._save(generation, data)
+        except:
+            self._unsaved(data)
+            raise
+        if self._observe is not None and seconds is not None:
+            self._observe(seconds)
@@ -0,0 +1,50 @@
+from calendar import timegm
+from time import strptime
+
+# How IRCv3 tag values escape the characters they can't contain.
+ESCAPES = {':': ';', 's': ' ', '\\': '\\', 'r': '\r', 'n': '\n'}
+
+
+def unescape(value):
+    if '\\' not in value:
+        return value
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '')
+            char = ESCAPES.get(char, char)
+        result.append(char)
+    return ''.join(result)
+
+
+def split_tags(line):
+    '''
+    Splits the IRCv3 message tags off a raw line, returning
+    (tags, line). Lines without tags get an empty dict.
+    '''
+    if not line.startswith('@'):
+        return {}, line
+    raw, _, line = line[1:].partition(' ')
+    tags = {}
+    for tag in raw.split(';'):
+        key, _, value = tag.partition('=')
+        tags[key] = unescape(value)
+    return tags, line.lstrip(' ')
+
+
+def parse_time(value):
+    '''
+    Turns a server-time tag, like "2011-10-19T16:40:51.620Z", into a
+    unix timestamp. Returns None if there is no usable time.
+    '''
+    if not value:
+        return None
+    seconds, _, fraction = value.rstrip('Z').partition('.')
+    try:
+        stamp = timegm(strptime(seconds, '%Y-%m-%dT%H:%M:%S'))
+        if fraction:
+            stamp += float('0.' + fraction)
+    except ValueError:
+        return None
+    return stamp
@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from lib.answer import Answer
+from lib.answer import Answer, normalize, within_distance
 
 
 class TestAnswer(TestCase):
@@ -12,3 +12,68 @@ class TestAnswer(TestCase):
     def test_masking_spaces(self):
         answer = Answer("test spaces")
         self.assertEqual(answer.current_clue(), "**** ******")
+
+    def test_normalize(self):
+        self.assertEqual(normalize('"My name is Bond, James Bond."'),
+                         'mynameisbondjamesbond')
+        self.assertEqual(normalize('The Twenty Five & Ten'), '25and10')
+
+    def test_within_distance(self):
+        self.assertTrue(within_distance('kitten', 'sitting', 3))
+        self.assertFalse(within_distance('kitten', 'sitting', 2))
+        self.assertFalse(within_distance('short', 'much longer', 2))
+
+    def test_check(self):
+        answer = Answer('"My name is Bond, James Bond."')
+        self.assertTrue(answer.check('my name is bond james bond'))
+        self.assertTrue(answer.check('My name is Bond, Jmes Bond'))
+        self.assertFalse(answer.check('bond'))
+
+    def test_check_alternatives(self):
+        answer = Answer('Tuberculosis (TB)')
+        self.assertTrue(answer.check('tuberculosis'))
+        answer = Answer('glad/good to see you')
+        self.assertTrue(answer.check('good to see you'))
+
+    def test_check_only_articles_or_punctuation(self):
+        self.assertTrue(Answer('The').check('The'))
+        self.assertTrue(Answer('the the').check('The The'))
+        self.assertFalse(Answer('the the').check('the'))
+        self.assertTrue(Answer('+').check(' + '))
+        self.assertFalse(Answer(')').check('('))
+
+    def test_check_numbers_are_exact(self):
+        answer = Answer('jackson 5')
+        self.assertTrue(answer.check('Jackson five'))
+        self.assertFalse(answer.check('jackson 6'))
+        self.assertTrue(Answer('seventy eight').check('Seventy Eight'))
+
+    def test_check_roman_numerals_are_exact(self):
+        self.assertFalse(Answer('World War I').check('World War II'))
+        self.assertFalse(Answer('World War II').check('world war i'))
+        self.assertFalse(Answer('Louis XIV').check('Louis XV'))
+        self.assertFalse(Answer('Henry VIII').check('Henry VII'))
+        self.assertFalse(Answer('Super Bowl XX').check('super bowl xxi'))
+        self.assertFalse(Answer('King Richard Ii').check('king richard i'))
+        self.assertTrue(Answer('Louis XIV').check('Luis XIV'))
+        self.assertTrue(Answer('Henry VIII').check('henry viii'))
+        self.assertTrue(Answer('Louis XIV; Sun King').check('sun kin'))
+
+    def test_clues_reveal_everything_once(self):
+        answer = Answer('abc def-ghi')
+        clues = [answer.give_clue() for i in range(5)]
+        self.assertEqual(clues[0].count('*'), 7)
+        self.assertEqual(clues[-1], 'abc def-ghi')
+        self.assertEqual(answer.unmask(), 'abc def-ghi')
+
+    def test_clue_styles(self):
+        answer = Answer('banana split', style='vowels')
+        clue = answer.give_clue()
+        self.assertEqual(clue.count('*'), 8)
+        self.assertTrue(set(clue) <= set('*ai '))
+        answer = Answer('banana split', style='initials')
+        answer.unmask()
+        self.assertEqual(answer.unmask(), 'b***** s****')
+        answer.set_answer('to be')
+        answer.unmask()
+        self.assertEqual(answer.unmask(), 't* b*')
@@ -0,0 +1,80 @@
+from collections import Counter
+from os import path
+from random import seed
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lib.categories import AliasTable, CategoryPicker, category_of
+from lib.questionbank import MappedQuestionBank, QuestionBank, compile_questions
+
+
+class TestCategories(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        with open(path.join(self.directory, 'questions_00'), 'w') as fd:
+            fd.write("Music : Who sang Thriller?`Michael Jackson\n")
+            fd.write("TV/Movies: Who played Zorro?`Antonio Banderas\n")
+            fd.write("What is 2+2?`4\n")
+            fd.write("tv / movies: Who played Bond?`Sean Connery\n")
+            fd.write("prying: Being nosy`snooping\n")
+            fd.write("To bring about: Effect`cause\n")
+            for i in range(4):
+                fd.write("Music: Song %d?`song %d\n" % (i, i))
+            for i in range(3):
+                fd.write("TV/Movies: Show %d?`show %d\n" % (i, i))
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_category_of(self):
+        self.assertEqual(category_of('Music : 80s: Name it'), 'music')
+        self.assertEqual(category_of('Science & Nature: Why?'),
+                         'science nature')
+        self.assertEqual(category_of('Category: 1980s GrabBag: What?'),
+                         '1980s grabbag')
+        self.assertEqual(category_of('007: Code number?'), '007')
+        self.assertEqual(category_of('At 10:30 what happened'),
+                         'uncategorized')
+        self.assertEqual(category_of('A question with no prefix'),
+                         'uncategorized')
+        self.assertEqual(category_of('To bring about: Effect'),
+                         'uncategorized')
+
+    def test_bank_index(self):
+        filename = path.join(self.directory, 'questions.bin')
+        compile_questions(self.directory, filename)
+        for bank in (QuestionBank(self.directory),
+                     MappedQuestionBank(filename)):
+            bank.load()
+            self.assertEqual(bank.categories(), [('music', 5),
+                                                 ('tv movies', 5),
+                                                 ('uncategorized', 3)])
+            self.assertEqual(list(bank.members('tv movies')),
+                             [1, 3, 10, 11, 12])
+            self.assertEqual(bank.category(2), 'uncategorized')
+            # Too small to be a category of its own.
+            self.assertEqual(bank.category(4), 'uncategorized')
+            self.assertEqual(list(bank.members('prying')), [])
+            self.assertEqual(list(bank.members('history')), [])
+
+    def test_alias_table(self):
+        seed(3)
+        table = AliasTable([1, 0, 3])
+        counts = Counter(table.draw() for i in range(8000))
+        self.assertEqual(counts[1], 0)
+        self.assertAlmostEqual(counts[2] / 8000.0, 0.75, delta=0.03)
+        self.assertRaises(ValueError, AliasTable, [0, 0])
+
+    def test_picker(self):
+        bank = QuestionBank(self.directory)
+        bank.load()
+        picker = CategoryPicker(bank, only=set(['tv movies', 'music']))
+        self.assertEqual(set(picker() for i in range(200)),
+                         set([0, 1, 3] + list(range(6, 13))))
+        picker = CategoryPicker(bank, {'tv movies': 0, 'uncategorized': 0})
+        self.assertEqual(set(picker() for i in range(100)),
+                         set([0, 6, 7, 8, 9]))
+        self.assertRaises(ValueError, CategoryPicker, bank,
+                          only=set(['history']))
@@ -0,0 +1,63 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lib.difficulty import DifficultyModel
+from lib.sampler import QuestionSampler
+
+
+class TestDifficulty(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.filename = path.join(self.directory, 'difficulty.bin')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_solve_rate(self):
+        model = DifficultyModel(self.filename)
+        self.assertEqual(model.solve_rate('aaaaaaaaaaaa'), 0.5)
+        for i in range(8):
+            model.solved('aaaaaaaaaaaa', 1, 5.0)
+            model.unsolved('bbbbbbbbbbbb')
+        easy = model.solve_rate('aaaaaaaaaaaa')
+        hard = model.solve_rate('bbbbbbbbbbbb')
+        self.assertTrue(hard < 0.5 < easy)
+        # A question never asked sits at the solve rate over everything.
+        self.assertEqual(model.solve_rate('cccccccccccc'), 9.0 / 18)
+        self.assertTrue(model.scale('bbbbbbbbbbbb') >
+                        model.scale('aaaaaaaaaaaa'))
+
+    def test_write_and_load(self):
+        model = DifficultyModel(self.filename)
+        model.solved('0123456789ab', 2, 3.5)
+        model.unsolved('0123456789ab')
+        model.unsolved('ba9876543210')
+        model.write(model.snapshot())
+        loaded = DifficultyModel(self.filename)
+        # Nothing is read until an estimate is needed.
+        self.assertEqual(loaded._questions, None)
+        self.assertEqual(loaded.solve_rate('0123456789ab'),
+                         model.solve_rate('0123456789ab'))
+        self.assertEqual(loaded._questions['0123456789ab'], [2, 1, 2, 3.5])
+
+    def test_snapshot_is_unchanged_by_later_answers(self):
+        model = DifficultyModel(self.filename)
+        self.assertEqual(model.snapshot(), None)
+        model.solved('0123456789ab', 1, 2.0)
+        snapshot = model.snapshot()
+        model.solved('0123456789ab', 1, 2.0)
+        model.unsolved('ba9876543210')
+        self.assertEqual(snapshot, {'0123456789ab': [1, 1, 1, 2.0]})
+        model.write(snapshot)
+        self.assertEqual(DifficultyModel(self.filename).solve_rate(
+            'ba9876543210'), 1.0 * 2 / 3)
+
+    def test_prefer(self):
+        sampler = QuestionSampler(0)
+        for i in range(20):
+            index = sampler.draw(100, candidates=100,
+                                 prefer=lambda index: abs(index - 50))
+            self.assertTrue(30 <= index <= 70)
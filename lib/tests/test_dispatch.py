@@ -0,0 +1,28 @@
+from unittest import TestCase
+
+from lib.dispatch import split_command, strip_formatting
+
+
+class TestDispatch(TestCase):
+
+    def test_strip_formatting(self):
+        self.assertEqual(strip_formatting('\x0304,12red\x03 and \x02bold\x02'),
+                         'red and bold')
+        self.assertEqual(strip_formatting('\x0312345'), '345')
+        self.assertEqual(strip_formatting('\x04ff0000hex\x0f '), 'hex')
+        self.assertEqual(strip_formatting('  plain '), 'plain')
+
+    def test_commands(self):
+        self.assertEqual(split_command('?score', 'Bot'), ('score', []))
+        self.assertEqual(split_command('??Standings 2', 'Bot'),
+                         ('standings', ['2']))
+        self.assertEqual(split_command('Bot: set bob 10', 'Bot'),
+                         ('set', ['bob', '10']))
+        self.assertEqual(split_command('Bot, help', 'Bot'), ('help', []))
+
+    def test_chatter(self):
+        self.assertEqual(split_command('hello there', 'Bot'), None)
+        self.assertEqual(split_command('?', 'Bot'), None)
+        self.assertEqual(split_command('', 'Bot'), None)
+        self.assertEqual(split_command('Bot', 'Bot'), None)
+        self.assertEqual(split_command('Bottles of beer', 'Bot'), None)
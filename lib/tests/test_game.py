@@ -0,0 +1,131 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.game import TriviaGame
+from lib.scheduler import Scheduler
+
+
+class FakeBot(object):
+
+    def __init__(self):
+        self.clock = Clock()
+        self.scheduler = Scheduler(self.clock.callLater, self.clock.seconds)
+        self.said = []
+        self.awards = []
+        self.drawn = 0
+
+    def msg(self, channel, message, priority=None):
+        self.said.append(message)
+
+    def _draw_question(self, pick=None):
+        self.drawn += 1
+        return 'Question %d' % self.drawn, 'answer %d' % self.drawn
+
+    def _question_asked(self, question):
+        pass
+
+    def _question_unsolved(self, question):
+        pass
+
+    def _point_scale(self, question):
+        return 1.0
+
+    def _award(self, user, points, question, clue, latency):
+        self.awards.append((user, points, latency))
+
+    def _standings(self, args, user, channel):
+        pass
+
+    def _stop(self, args, user, channel):
+        self.game.stop()
+
+
+class TestTriviaGame(TestCase):
+
+    def setUp(self):
+        self.bot = FakeBot()
+        self.game = TriviaGame(self.bot, '#trivia', 15, grace=1.0)
+        self.bot.game = self.game
+        self.game.start()
+
+    def test_earliest_server_time_wins(self):
+        answer = self.game._answer.answer
+        self.bot.clock.advance(3)
+        self.assertTrue(self.game.check('bob', answer, 1000.5))
+        self.assertFalse(self.game.check('carl', 'nope', 1000.1))
+        self.assertTrue(self.game.check('amy', answer, 1000.2))
+        self.assertEqual(self.bot.awards, [])
+        self.bot.clock.advance(1)
+        self.assertEqual(self.bot.awards, [('amy', 100, 3)])
+
+    def test_clues_wait_for_the_race(self):
+        answer = self.game._answer.answer
+        self.bot.clock.advance(14.5)
+        self.game.check('bob', answer)
+        self.game.give_clue()
+        self.bot.clock.advance(1)
+        self.assertEqual(len(self.bot.awards), 1)
+        self.assertFalse(any('2nd Clue' in line for line in self.bot.said))
+        said = len(self.bot.said)
+        self.bot.clock.advance(15)
+        self.assertEqual(self.bot.said[said], 'Next question:')
+
+    def test_idle_game_stops(self):
+        self.bot.clock.pump([15] * 49)
+        self.assertTrue(self.game.running)
+        self.bot.clock.advance(15)
+        self.assertFalse(self.game.running)
+        self.assertTrue('It appears I am talking to myself now!'
+                        in self.bot.said)
+
+    def test_questions_are_drawn_ahead(self):
+        self.assertEqual(self.bot.drawn, 1)
+        self.bot.clock.advance(0)
+        self.assertEqual(self.bot.drawn, 4)
+        self.bot.clock.advance(3)
+        self.game.check('bob', self.game._answer.answer)
+        self.bot.clock.advance(1)
+        self.bot.clock.advance(15)
+        # The next question came from the buffer, which is topped up again.
+        self.assertTrue('Question 2' in self.bot.said)
+        self.assertEqual(self.bot.drawn, 5)
+        self.game.picker = lambda: 0
+        self.assertEqual(len(self.game._ready), 0)
+        self.game.halt()
+        self.bot.clock.advance(0)
+        self.assertEqual(self.bot.drawn, 5)
+
+    def test_resume_after_halt(self):
+        self.bot.clock.advance(15)
+        question = self.game._question
+        self.game.halt()
+        self.assertFalse(self.game.running)
+        said = len(self.bot.said)
+        self.game.resume()
+        self.assertTrue(self.game.running)
+        self.assertEqual(self.game._question, question)
+        self.assertEqual(self.bot.said[said],
+                         'Current question: %s' % question)
+        self.assertTrue(self.bot.said[said + 1].startswith('2nd Clue:'))
+        self.bot.clock.advance(15)
+        self.assertTrue(self.bot.said[-1].startswith('3rd Clue:'))
+
+    def test_no_points_after_a_win(self):
+        answer = self.game._answer.answer
+        self.bot.clock.advance(3)
+        self.game.check('amy', answer)
+        self.bot.clock.advance(1)
+        self.assertFalse(self.game.check('bob', answer))
+        self.assertFalse(self.game.check('carl', answer))
+        self.bot.clock.advance(15)
+        self.assertEqual(self.bot.awards, [('amy', 100, 3)])
+        self.assertTrue('Question 2' in self.bot.said)
+
+    def test_no_points_after_the_answer_is_shown(self):
+        answer = self.game._answer.answer
+        self.bot.clock.pump([15] * 4)
+        self.assertTrue(self.bot.said[-1].startswith('No one got it.'))
+        self.assertFalse(self.game.check('dan', answer))
+        self.bot.clock.advance(15)
+        self.assertEqual(self.bot.awards, [])
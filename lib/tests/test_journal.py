@@ -0,0 +1,60 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lib.journal import ScoreJournal
+
+
+class TestScoreJournal(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.filename = path.join(self.directory, 'scores.log')
+        self.journal = ScoreJournal(self.filename)
+        self.journal.open()
+
+    def tearDown(self):
+        self.journal.close()
+        rmtree(self.directory)
+
+    def test_replay(self):
+        self.journal.append('bob', 100, 100, 'abc', 1)
+        self.journal.append('amy', 75, 75, 'def', 2)
+        self.journal.append('bob', 50, 150, 'ghi', 3)
+        events = list(self.journal.events())
+        self.assertEqual(events[0]['question'], 'abc')
+        self.assertEqual(events[1]['clue'], 2)
+        scores = {}
+        self.assertEqual(self.journal.replay(scores), 3)
+        self.assertEqual(scores, {'bob': 150, 'amy': 75})
+
+    def test_torn_line_is_skipped(self):
+        self.journal.append('bob', 100, 100)
+        self.journal.close()
+        with open(self.filename, 'a') as log:
+            log.write('{"nick":"amy","poi')
+        scores = {}
+        self.assertEqual(self.journal.replay(scores), 1)
+        self.assertEqual(scores, {'bob': 100})
+
+    def test_replay_over_snapshot_is_idempotent(self):
+        self.journal.append('bob', 100, 100)
+        self.journal.rotate()
+        self.journal.append('bob', 25, 125)
+        # The snapshot taken at rotation already has bob's first points,
+        # but the rotated log was never discarded.
+        scores = {'bob': 100}
+        self.journal.replay(scores)
+        self.assertEqual(scores, {'bob': 125})
+        self.journal.discard_rotated()
+        self.assertEqual(len(list(self.journal.events())), 1)
+
+    def test_reset(self):
+        self.journal.append('bob', 100, 100)
+        self.journal.rotate()
+        self.journal.append('bob', 25, 125)
+        self.journal.reset()
+        self.assertEqual(list(self.journal.events()), [])
+        self.journal.append('amy', 25, 25)
+        self.assertEqual(len(list(self.journal.events())), 1)
@@ -0,0 +1,51 @@
+from random import Random
+from unittest import TestCase
+
+from lib.leaderboard import Leaderboard
+
+
+class TestLeaderboard(TestCase):
+
+    def ranked(self, scores):
+        ordered = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return [(rank, nick, score)
+                for rank, (nick, score) in enumerate(ordered, start=1)]
+
+    def test_ranks(self):
+        board = Leaderboard({'bob': 100, 'amy': 250, 'carl': 100})
+        self.assertEqual(board.top(10), [(1, 'amy', 250), (2, 'bob', 100),
+                                         (3, 'carl', 100)])
+        board.update('carl', 300)
+        self.assertEqual(board.rank('carl'), 1)
+        self.assertEqual(board.rank('bob'), 3)
+        self.assertEqual(board.rank('dave'), None)
+        board.remove('amy')
+        self.assertEqual(board.top(1, 1), [(2, 'bob', 100)])
+        self.assertEqual(len(board), 2)
+
+    def test_matches_full_sort(self):
+        random = Random(1)
+        scores = dict(('nick%d' % i, random.randrange(1000))
+                      for i in range(2000))
+        board = Leaderboard(scores)
+        for i in range(5000):
+            nick = 'nick%d' % random.randrange(3000)
+            if random.random() < 0.1:
+                scores.pop(nick, None)
+                board.remove(nick)
+            else:
+                scores[nick] = scores.get(nick, 0) + random.randrange(100)
+                board.update(nick, scores[nick])
+        expected = self.ranked(scores)
+        self.assertEqual(board.top(len(expected)), expected)
+        self.assertEqual(board.top(10, 1000), expected[1000:1010])
+        for rank, nick, score in expected[::97]:
+            self.assertEqual(board.rank(nick), rank)
+
+    def test_around(self):
+        board = Leaderboard(dict(('nick%d' % i, i) for i in range(20)))
+        self.assertEqual([nick for rank, nick, score in
+                          board.around('nick10', 2)],
+                         ['nick12', 'nick11', 'nick10', 'nick9', 'nick8'])
+        self.assertEqual(board.around('nick19', 2)[0], (1, 'nick19', 19))
+        self.assertEqual(board.around('nobody'), [])
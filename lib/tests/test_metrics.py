@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.metrics import LagMonitor, Metrics, Startup
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.metrics = Metrics(self.clock.seconds)
+
+    def test_counters_and_histograms(self):
+        self.metrics.count('messages')
+        self.metrics.count('messages', 2)
+        self.assertEqual(self.metrics.counters(), {'messages': 3})
+        self.metrics.observe('save_seconds', 0.002)
+        self.metrics.observe('save_seconds', 0.2)
+        with self.metrics.timed('save_seconds'):
+            pass
+        histogram = self.metrics.histograms()['save_seconds']
+        self.assertEqual(histogram.count, 3)
+        self.assertEqual(histogram.max, 0.2)
+        self.assertEqual(sum(histogram.counts), 3)
+
+    def test_gauges(self):
+        depth = [4]
+        self.metrics.gauge('depth', lambda: depth[0])
+        self.metrics.gauge('output', lambda: {'sent': 2, 'dropped': 1})
+        depth[0] = 5
+        self.assertEqual(self.metrics.gauges(), {'depth': 5, 'output_sent': 2,
+                                                 'output_dropped': 1})
+        self.metrics.gauge('output', None)
+        self.assertEqual(self.metrics.gauges(), {'depth': 5})
+
+    def test_prometheus(self):
+        self.clock.advance(10)
+        self.metrics.count('messages', 7)
+        self.metrics.observe('command_seconds', 0.003)
+        text = self.metrics.prometheus()
+        self.assertTrue('triviabot_uptime_seconds 10\n' in text)
+        self.assertTrue('triviabot_messages_total 7\n' in text)
+        self.assertTrue('triviabot_command_seconds_bucket{le="0.001"} 0\n'
+                        in text)
+        self.assertTrue('triviabot_command_seconds_bucket{le="0.005"} 1\n'
+                        in text)
+        self.assertTrue('triviabot_command_seconds_bucket{le="+Inf"} 1\n'
+                        in text)
+        self.assertTrue('triviabot_command_seconds_count 1\n' in text)
+
+    def test_lag(self):
+        monitor = LagMonitor(self.metrics, self.clock.callLater,
+                             self.clock.seconds)
+        monitor.start()
+        self.clock.advance(1.25)
+        self.assertEqual(monitor.lag, 0.25)
+        self.clock.advance(1)
+        self.assertEqual(monitor.lag, 0)
+        monitor.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertEqual(
+            self.metrics.histograms()['reactor_lag_seconds'].count, 2)
+
+    def test_startup(self):
+        self.clock.advance(10)
+        startup = Startup(self.clock.seconds, 9.5)
+        self.assertEqual(startup.mark('imports', 9.75), 0.25)
+        self.clock.advance(2)
+        startup.mark('signon')
+        self.clock.advance(1)
+        self.assertEqual(startup.mark('questions', 11), 1.5)
+        # Only the first time counts, like signing on again later.
+        self.assertEqual(startup.mark('signon'), 2.5)
+        self.assertEqual(startup.elapsed('ready'), None)
+        self.assertEqual(startup.steps(), [('imports', 0.25),
+                                           ('questions', 1.5),
+                                           ('signon', 2.5)])
+        self.assertEqual(startup.report(),
+                         'imports 0.25s, questions 1.50s, signon 2.50s')
@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.output import DEFERRABLE, GAME, OutputQueue, pack_lines
+
+
+class TestPackLines(TestCase):
+
+    def test_pack_lines(self):
+        items = ['#%d: player%d with 100 points' % (i, i) for i in range(1, 31)]
+        lines = pack_lines(items, limit=100)
+        self.assertEqual(', '.join(lines), ', '.join(items))
+        for line in lines:
+            self.assertTrue(len(line) <= 100)
+        self.assertEqual(len(lines), 10)
+
+    def test_long_item_is_kept_whole(self):
+        self.assertEqual(pack_lines(['a' * 20, 'b'], limit=10),
+                         ['a' * 20, 'b'])
+
+
+class TestOutputQueue(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sent = []
+        self.output = OutputQueue(self.send, self.clock.callLater,
+                                  self.clock.seconds, 1, lambda: 'bot',
+                                  backlog=4)
+
+    def send(self, kind, target, line):
+        self.sent.append((kind, target, line))
+
+    def test_packs_same_target(self):
+        self.output.put('PRIVMSG', '#chan', 'Next question:', GAME)
+        self.output.put('NOTICE', 'bob', 'Your score is 5')
+        self.output.put('PRIVMSG', '#chan', 'Clue: ****', GAME)
+        self.output.put('PRIVMSG', '#chan', '')
+        self.clock.advance(0)
+        self.assertEqual(self.sent, [('PRIVMSG', '#chan',
+                                      'Next question: | Clue: ****')])
+        self.clock.advance(1)
+        self.assertEqual(self.sent[1], ('NOTICE', 'bob', 'Your score is 5'))
+        self.assertEqual(self.output.metrics()['messages_sent'], 3)
+
+    def test_game_lines_first(self):
+        self.output.put('NOTICE', 'bob', 'Commands: ...')
+        self.output.put('PRIVMSG', '#chan', 'bob GOT IT!', GAME)
+        self.clock.advance(0)
+        self.assertEqual(self.sent, [('PRIVMSG', '#chan', 'bob GOT IT!')])
+
+    def test_long_lines_are_split(self):
+        self.output.prefix = 'bot!bot@host'
+        self.output.put('PRIVMSG', '#chan', ' '.join(['word'] * 200))
+        self.clock.pump([0, 1, 1])
+        self.assertEqual(len(self.sent), 3)
+        for kind, target, line in self.sent:
+            self.assertTrue(len(':bot!bot@host PRIVMSG #chan :' + line) <= 510)
+        self.assertEqual(' '.join(line for kind, target, line in self.sent),
+                         ' '.join(['word'] * 200))
+
+    def test_deferrable_merged_and_dropped(self):
+        for text in ['one', 'one', 'two', 'three', 'four', 'five']:
+            self.output.put('NOTICE', '#chan', text, DEFERRABLE, 'standings')
+        self.assertEqual(self.output.merged, 1)
+        self.assertEqual(self.output.dropped, 1)
+        self.clock.advance(0)
+        self.assertEqual(self.sent, [('NOTICE', '#chan',
+                                      'one | two | three | four')])
+
+    def test_ctcp_goes_alone(self):
+        self.output.put('PRIVMSG', '#chan', 'hello')
+        self.output.put('PRIVMSG', '#chan', '\x01ACTION waves\x01')
+        self.output.put('PRIVMSG', '#chan', 'again')
+        self.clock.advance(0)
+        self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertEqual([line for kind, target, line in self.sent],
+                         ['hello', '\x01ACTION waves\x01', 'again'])
+
+    def test_after_waits_for_the_target(self):
+        parted = []
+        self.output.put('PRIVMSG', '#chan', 'Thanks for playing!')
+        self.output.put('NOTICE', 'bob', 'Your score is 5')
+        self.output.put('PRIVMSG', '#Chan', 'See you next game!')
+        self.output.after('#chan', lambda: parted.append('#chan'))
+        self.output.after('#other', lambda: parted.append('#other'))
+        self.assertEqual(parted, ['#other'])
+        self.clock.advance(0)
+        self.assertEqual(parted, ['#other'])
+        self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertEqual(parted, ['#other', '#chan'])
@@ -0,0 +1,69 @@
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lib.questionbank import (HEADER, MAGIC, VERSION, MappedQuestionBank,
+                              QuestionBank, compile_questions, parse_line)
+
+
+class TestQuestionBank(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        with open(path.join(self.directory, 'questions_00'), 'w') as fd:
+            fd.write("007: Bond's code number?`007\n")
+            fd.write("This line is broken\n")
+            fd.write("Too`many`answers\n")
+        with open(path.join(self.directory, 'questions_01'), 'w') as fd:
+            fd.write("Capital of France?` Paris \n")
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_parse_line(self):
+        self.assertEqual(parse_line("question?`answer "),
+                         ("question?", "answer"))
+        self.assertRaises(ValueError, parse_line, "no answer here")
+        self.assertRaises(ValueError, parse_line, "question?` ")
+
+    def test_load_skips_broken_lines(self):
+        bank = QuestionBank(self.directory)
+        self.assertEqual(bank.load(), 2)
+        self.assertEqual(bank.broken, 2)
+        self.assertEqual(bank.get(0), ("007: Bond's code number?", "007"))
+        self.assertEqual(bank.get(1), ("Capital of France?", "Paris"))
+
+    def test_random(self):
+        bank = QuestionBank(self.directory)
+        self.assertRaises(IndexError, bank.random)
+        bank.load()
+        self.assertIn(bank.random(), [bank.get(0), bank.get(1)])
+
+    def test_compiled_bank(self):
+        filename = path.join(self.directory, 'questions.bin')
+        broken = []
+        count = compile_questions(self.directory, filename,
+                                  lambda *args: broken.append(args[1]))
+        self.assertEqual(count, 2)
+        self.assertEqual(broken, [2, 3])
+        bank = MappedQuestionBank(filename)
+        self.assertEqual(bank.load(), 2)
+        self.assertEqual(bank.get(0), ("007: Bond's code number?", "007"))
+        self.assertEqual(bank.get(1), ("Capital of France?", "Paris"))
+        self.assertRaises(IndexError, bank.get, 2)
+
+    def test_compiled_bank_rejects_other_files(self):
+        filename = path.join(self.directory, 'questions_01')
+        self.assertRaises(ValueError, MappedQuestionBank(filename).load)
+
+    def test_compiled_bank_rejects_older_versions(self):
+        filename = path.join(self.directory, 'questions.bin')
+        compile_questions(self.directory, filename)
+        with open(filename, 'r+b') as fd:
+            header = list(HEADER.unpack(fd.read(HEADER.size)))
+            self.assertEqual(header[:2], [MAGIC, VERSION])
+            header[1] = VERSION - 1
+            fd.seek(0)
+            fd.write(HEADER.pack(*header))
+        self.assertRaises(ValueError, MappedQuestionBank(filename).load)
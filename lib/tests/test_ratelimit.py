@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from lib.ratelimit import RateLimiter
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self):
+        self.time = 0
+        self.limiter = RateLimiter(lambda: self.time, rate=1, burst=3,
+                                   costs={'help': 2}, cooldowns={'top': 30},
+                                   max_nicks=2)
+
+    def test_bucket_refills(self):
+        allowed = [self.limiter.allow('bob', 'score') for i in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+        self.time = 1
+        self.assertTrue(self.limiter.allow('bob', 'score'))
+        self.assertFalse(self.limiter.allow('bob', 'score'))
+        self.assertTrue(self.limiter.allow('amy', 'score'))
+
+    def test_costs(self):
+        self.assertTrue(self.limiter.allow('bob', 'help'))
+        self.assertFalse(self.limiter.allow('bob', 'help'))
+        self.assertTrue(self.limiter.allow('bob', 'guess'))
+        self.assertTrue(self.limiter.allow('bob', 'guess'))
+        self.time = 100
+        self.assertTrue(self.limiter.allow('bob', 'help'))
+
+    def test_cooldown_per_channel(self):
+        self.assertTrue(self.limiter.allow('bob', 'top', '#a'))
+        self.assertFalse(self.limiter.allow('amy', 'top', '#a'))
+        self.assertTrue(self.limiter.allow('amy', 'top', '#b'))
+        self.time = 30
+        self.assertTrue(self.limiter.allow('amy', 'top', '#a'))
+
+    def test_tracked_nicks_are_bounded(self):
+        for nick in ('bob', 'amy', 'bob', 'carl'):
+            self.limiter.allow(nick, 'score')
+        self.assertEqual(len(self.limiter), 2)
+        self.assertEqual(list(self.limiter._buckets), ['bob', 'carl'])
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from lib.sampler import QuestionSampler
+
+
+class TestQuestionSampler(TestCase):
+
+    def test_no_repeats_within_window(self):
+        sampler = QuestionSampler(50)
+        picks = [sampler.draw(100) for i in range(1000)]
+        for i in range(len(picks) - 50):
+            self.assertNotIn(picks[i], picks[i+1:i+51])
+
+    def test_restore(self):
+        sampler = QuestionSampler(5)
+        picks = [sampler.draw(10) for i in range(5)]
+        restored = QuestionSampler(5)
+        restored.restore(sampler.state())
+        self.assertNotIn(restored.draw(10), picks)
+
+    def test_resize_forgets(self):
+        sampler = QuestionSampler(5)
+        sampler.draw(10)
+        index = sampler.draw(3)
+        self.assertEqual(sampler.state(), {'size': 3, 'recent': [index]})
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.scheduler import Scheduler
+
+
+class TestScheduler(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = Scheduler(self.clock.callLater, self.clock.seconds)
+        self.fired = []
+
+    def test_order_and_one_timer(self):
+        for delay, name in ((3, 'c'), (1, 'a'), (2, 'b'), (1, 'a2')):
+            self.scheduler.call_later(delay, self.fired.append, name)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ['a', 'a2'])
+        self.clock.advance(2)
+        self.assertEqual(self.fired, ['a', 'a2', 'b', 'c'])
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_cancel_and_reschedule(self):
+        first = self.scheduler.call_later(1, self.fired.append, 'first')
+        later = self.scheduler.call_later(5, self.fired.append, 'later')
+        first.cancel()
+        later = later.reschedule(2)
+        self.clock.advance(1)
+        self.assertEqual(self.fired, [])
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ['later'])
+        self.assertFalse(later.active())
+        later.cancel()
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_earlier_event_rearms_timer(self):
+        self.scheduler.call_later(10, self.fired.append, 'slow')
+        self.scheduler.call_later(1, self.fired.append, 'fast')
+        self.assertEqual(self.clock.getDelayedCalls()[0].getTime(), 1)
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ['fast'])
+
+    def test_callbacks_can_schedule(self):
+        def tick(n):
+            self.fired.append(n)
+            if n < 3:
+                self.scheduler.call_later(1, tick, n + 1)
+        self.scheduler.call_later(1, tick, 1)
+        self.clock.pump([1, 1, 1, 1])
+        self.assertEqual(self.fired, [1, 2, 3])
+        self.assertEqual(len(self.clock.getDelayedCalls()), 0)
+
+    def test_cancelled_events_are_swept(self):
+        events = [self.scheduler.call_later(i + 1, self.fired.append, i)
+                  for i in range(100)]
+        for event in events[1:]:
+            event.cancel()
+        self.scheduler.call_later(200, self.fired.append, 'end')
+        self.assertTrue(len(self.scheduler._heap) < 60)
+        self.clock.pump([1] * 200)
+        self.assertEqual(self.fired, [0, 'end'])
@@ -0,0 +1,99 @@
+import json
+from os import path
+from shutil import rmtree
+import sqlite3
+from tempfile import mkdtemp
+from time import time
+from unittest import TestCase
+
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.task import Clock
+
+from lib.sqlstore import SQLiteScoreStore
+
+
+class TestSQLiteScoreStore(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        with open(path.join(self.directory, 'scores.json'), 'w') as savefile:
+            json.dump({'bob': 100}, savefile)
+        self.store = self.open_store()
+
+    def tearDown(self):
+        self.store.close()
+        rmtree(self.directory)
+
+    def open_store(self):
+        # Writes and queries run straight away instead of in a thread.
+        return SQLiteScoreStore(self.directory, Clock().callLater, maybeDeferred,
+                                threshold=1000)
+
+    def results(self, d):
+        results = []
+        d.addCallback(results.append)
+        return results[0]
+
+    def test_migrates_json_scores(self):
+        self.assertEqual(self.store.load(), {'bob': 100})
+        self.assertTrue(path.exists(path.join(self.directory,
+                                              'scores.json.migrated')))
+        self.store.close()
+        self.store = self.open_store()
+        self.assertEqual(self.store.load(), {'bob': 100})
+
+    def test_batched_answers(self):
+        self.store.load()
+        self.store.question_asked('q1')
+        self.store.add_points('bob', 75, 175, 'q1', 2, 4.0)
+        self.store.question_asked('q2')
+        self.store.add_points('amy', 100, 100, 'q2', 1, 2.0)
+        self.store.set_score('carl', 5, 5)
+        self.store.flush()
+        self.store.close()
+        self.store = self.open_store()
+        self.assertEqual(self.store.load(),
+                         {'bob': 175, 'amy': 100, 'carl': 5})
+        self.assertEqual(self.results(self.store.question_stats('q1')),
+                         (1, 1, 4.0))
+        self.assertEqual(self.results(self.store.question_stats('q3')),
+                         (0, 0, None))
+        self.assertEqual(self.results(self.store.top_since(time() - 60)),
+                         [('amy', 100), ('bob', 75)])
+
+    def test_shared_between_bots(self):
+        self.store.load()
+        other = self.open_store()
+        other.load()
+        self.assertEqual(self.results(other.refresh()), None)
+        self.store.add_points('bob', 50, 150)
+        self.store.set_score('amy', 30, 30)
+        self.store.flush()
+        # The other bot gave bob points it hasn't written yet.
+        other.add_points('bob', 25, 125)
+        self.assertEqual(self.results(other.refresh()),
+                         {'bob': 175, 'amy': 30})
+        other.flush()
+        self.assertEqual(self.results(other.refresh()), None)
+        self.assertEqual(self.results(self.store.refresh()),
+                         {'bob': 175, 'amy': 30})
+        other.close()
+
+    def test_failed_batch_is_kept(self):
+        self.store.load()
+        self.store.add_points('bob', 50, 150)
+
+        def locked(*args):
+            raise sqlite3.OperationalError('database is locked')
+
+        self.store._write_answer = locked
+        failures = []
+        self.store._saver.flush().addErrback(failures.append)
+        self.assertEqual(len(failures), 1)
+        del self.store._write_answer
+        self.store.add_points('amy', 10, 10)
+        self.store.flush()
+        self.assertEqual(self.store._written, self.store._given)
+        self.store.close()
+        self.store = self.open_store()
+        self.assertEqual(self.store.load(), {'bob': 150, 'amy': 10})
@@ -0,0 +1,163 @@
+from os import listdir, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lib.storage import DebouncedSaver, atomic_write
+
+
+class FakeTimer(object):
+
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.cancelled = False
+
+    def active(self):
+        return not self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeDeferred(object):
+    '''
+    Stands in for a thread: the work only runs when finish() is called.
+    '''
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self.callbacks = []
+
+    def addCallbacks(self, callback, errback, errbackArgs=()):
+        self.callbacks.append((callback, errback, errbackArgs))
+
+    def finish(self):
+        try:
+            result = self.function(*self.args)
+            failed = False
+        except IOError as error:
+            result = error
+            failed = True
+        for callback, errback, args in self.callbacks:
+            if failed:
+                result = errback(result, *args)
+            else:
+                result = callback(result)
+
+
+class TestStorage(TestCase):
+
+    def setUp(self):
+        self.scores = {}
+        self.written = []
+        self.timers = []
+        self.deferreds = []
+        self.saver = DebouncedSaver(lambda: dict(self.scores),
+                                    self.written.append, self.call_later,
+                                    self.defer, delay=30, threshold=3)
+
+    def call_later(self, delay, function):
+        self.timers.append(FakeTimer(delay, function))
+        return self.timers[-1]
+
+    def defer(self, function, *args):
+        self.deferreds.append(FakeDeferred(function, *args))
+        return self.deferreds[-1]
+
+    def test_atomic_write(self):
+        directory = mkdtemp()
+        try:
+            filename = path.join(directory, 'scores.json')
+            atomic_write(filename, '{}')
+            atomic_write(filename, '{"bob": 100}')
+            with open(filename) as savefile:
+                self.assertEqual(savefile.read(), '{"bob": 100}')
+            self.assertEqual(listdir(directory), ['scores.json'])
+        finally:
+            rmtree(directory)
+
+    def test_saves_after_delay(self):
+        self.scores['bob'] = 100
+        self.saver.changed()
+        self.saver.changed()
+        self.assertEqual(len(self.timers), 1)
+        self.assertEqual(self.deferreds, [])
+        self.timers[0].function()
+        self.deferreds[0].finish()
+        self.assertEqual(self.written, [{'bob': 100}])
+
+    def test_write_times_are_observed(self):
+        times = []
+        saver = DebouncedSaver(lambda: dict(self.scores), self.written.append,
+                               self.call_later, self.defer, delay=30,
+                               threshold=3, observe=times.append)
+        saver.changed()
+        saver.flush()
+        # Only the write itself counts, not handing it to the thread.
+        self.assertEqual(times, [])
+        self.deferreds[0].finish()
+        saver.changed()
+        saver.flush_sync()
+        self.assertEqual(len(times), 2)
+        self.assertTrue(all(0 <= seconds < 1 for seconds in times))
+
+    def test_saves_after_threshold(self):
+        for points in range(3):
+            self.scores['bob'] = points
+            self.saver.changed()
+        self.assertTrue(self.timers[0].cancelled)
+        self.deferreds[0].finish()
+        self.assertEqual(self.written, [{'bob': 2}])
+
+    def test_flush_during_write(self):
+        self.scores['bob'] = 1
+        self.saver.changed()
+        self.saver.flush()
+        self.scores['bob'] = 2
+        self.saver.changed()
+        self.saver.flush()
+        self.assertEqual(len(self.deferreds), 1)
+        self.deferreds[0].finish()
+        self.deferreds[1].finish()
+        self.assertEqual(self.written, [{'bob': 1}, {'bob': 2}])
+
+    def test_stale_write_is_skipped(self):
+        self.scores['bob'] = 1
+        self.saver.changed()
+        self.saver.flush()
+        self.scores['bob'] = 2
+        self.saver.changed()
+        self.saver.flush_sync()
+        self.deferreds[0].finish()
+        self.assertEqual(self.written, [{'bob': 2}])
+
+    def test_failed_write_is_retried(self):
+        written = []
+
+        def write(data):
+            if not written:
+                written.append(None)
+                raise IOError('disk full')
+            written.append(data)
+
+        saver = DebouncedSaver(self.take, write, self.call_later,
+                               self.defer, delay=30, threshold=3,
+                               deltas=True, requeue=self.requeue)
+        self.changes = ['bob+1']
+        saver.changed()
+        saver.flush()
+        self.deferreds[0].finish()
+        self.changes.append('amy+2')
+        self.assertEqual(self.timers[-1].delay, 30)
+        self.timers[-1].function()
+        self.deferreds[1].finish()
+        self.assertEqual(written, [None, ['bob+1', 'amy+2']])
+
+    def take(self):
+        changes, self.changes = self.changes, []
+        return changes
+
+    def requeue(self, changes):
+        self.changes[:0] = changes
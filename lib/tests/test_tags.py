@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from lib.latency import LatencyStats
+from lib.tags import parse_time, split_tags
+
+
+class TestTags(TestCase):
+
+    def test_split_tags(self):
+        tags, line = split_tags('@time=2011-10-19T16:40:51.620Z;msgid=a\\sb '
+                                ':nick!u@h PRIVMSG #c :hi')
+        self.assertEqual(tags, {'time': '2011-10-19T16:40:51.620Z',
+                                'msgid': 'a b'})
+        self.assertEqual(line, ':nick!u@h PRIVMSG #c :hi')
+        self.assertEqual(split_tags(':srv PING x'), ({}, ':srv PING x'))
+
+    def test_parse_time(self):
+        self.assertAlmostEqual(parse_time('2011-10-19T16:40:51.620Z'),
+                               1319042451.62)
+        self.assertEqual(parse_time('2011-10-19T16:40:51Z'), 1319042451)
+        self.assertEqual(parse_time('yesterday'), None)
+        self.assertEqual(parse_time(None), None)
+
+
+class TestLatencyStats(TestCase):
+
+    def test_stats(self):
+        stats = LatencyStats()
+        for nick, latency in (('bob', 4.0), ('amy', 2.5), ('bob', 2.0),
+                              ('carl', 9.0), ('amy', None)):
+            stats.record(nick, latency)
+        self.assertEqual(stats.stats('bob'), (2, 3.0, 2.0))
+        self.assertEqual(stats.stats('dave'), None)
+        self.assertEqual(stats.fastest(2), [(1, 'bob', 2.0),
+                                            (2, 'amy', 2.5)])
+        restored = LatencyStats()
+        restored.restore(stats.state())
+        self.assertEqual(restored.fastest(), stats.fastest())
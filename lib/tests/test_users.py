@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from lib.game import new_user
+from lib.users import UserTracker
+
+
+class TestUserTracker(TestCase):
+
+    def setUp(self):
+        self.tracker = UserTracker(new_user)
+        self.users = {}
+
+    def test_names(self):
+        self.users['gone'] = new_user()
+        self.tracker.names('#Trivia', ['@+amy', 'bob!b@host', '%carl'])
+        self.tracker.names('#trivia', ['~dave'])
+        self.assertEqual(self.users, {'gone': new_user()})
+        self.tracker.end_names('#trivia', self.users)
+        self.assertEqual(sorted(self.users), ['amy', 'bob', 'carl', 'dave'])
+        self.assertEqual(self.users['amy']['modes'], set(['op', 'voice']))
+        self.assertEqual(self.users['bob']['modes'], set())
+        self.assertEqual(self.users['carl']['modes'], set(['halfop']))
+        self.assertEqual(self.users['dave']['modes'], set(['owner']))
+
+    def test_names_keep_records(self):
+        self.users['amy'] = new_user()
+        self.users['amy']['wins'] = 3
+        self.tracker.names('#trivia', ['+amy'])
+        self.tracker.end_names('#trivia', self.users)
+        self.assertEqual(self.users['amy']['wins'], 3)
+        self.assertEqual(self.users['amy']['modes'], set(['voice']))
+
+    def test_mode(self):
+        self.tracker.names('#trivia', ['amy', 'bob'])
+        self.tracker.end_names('#trivia', self.users)
+        self.assertTrue(self.tracker.mode(self.users, True, 'vo',
+                                          ('amy', 'amy')))
+        self.assertEqual(self.users['amy']['modes'], set(['op', 'voice']))
+        self.assertTrue(self.tracker.mode(self.users, False, 'v', ('amy',)))
+        self.assertEqual(self.users['amy']['modes'], set(['op']))
+        # Bans and modes on people we don't know about change nothing.
+        self.assertFalse(self.tracker.mode(self.users, True, 'bv',
+                                           ('*!*@host', 'zed')))
+
+    def test_server_prefix(self):
+        self.tracker.set_prefix({'Y': ('!', 0), 'o': ('@', 1),
+                                 'v': ('+', 2)})
+        self.tracker.names('#trivia', ['!@amy', '%bob'])
+        self.tracker.end_names('#trivia', self.users)
+        self.assertEqual(self.users['amy']['modes'], set(['Y', 'op']))
+        self.assertTrue('%bob' in self.users)
+        self.assertFalse(self.tracker.mode(self.users, True, 'h', ('amy',)))
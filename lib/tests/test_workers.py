@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.workers import Supervisor, apply_worker
+
+
+class FakeProcess(object):
+
+    def __init__(self):
+        self.signals = []
+
+    def signalProcess(self, signal):
+        self.signals.append(signal)
+
+
+class FakeConfig(object):
+    SAVE_DIR = './savedata/'
+    SERVER = 'irc.example.net'
+    SCORE_BACKEND = 'json'
+    WORKERS = [{'GAME_CHANNELS': ['#a']},
+               {'SERVER': 'irc.other.net', 'GAME_CHANNELS': ['#b']}]
+
+
+class TestWorkers(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.spawned = []
+        self.supervisor = Supervisor(2, self.spawn, self.clock.callLater,
+                                     self.clock.seconds)
+
+    def spawn(self, index, supervisor):
+        process = FakeProcess()
+        self.spawned.append((index, process))
+        return process
+
+    def test_apply_worker(self):
+        config = FakeConfig()
+        apply_worker(config, 1)
+        self.assertEqual(config.SERVER, 'irc.other.net')
+        self.assertEqual(config.GAME_CHANNELS, ['#b'])
+        self.assertEqual(config.STATE_DIR, './savedata/worker1/')
+        self.assertEqual(config.SCORE_BACKEND, 'sqlite')
+        self.assertEqual(config.WORKER, 1)
+        self.assertEqual(config.SAVE_DELAY, 5)
+
+    def test_restarts_with_backoff(self):
+        self.supervisor.start()
+        self.assertEqual([index for index, process in self.spawned], [0, 1])
+        self.supervisor.exited(1, 1)
+        self.clock.advance(1)
+        self.assertEqual(len(self.spawned), 3)
+        self.supervisor.exited(1, 1)
+        self.clock.advance(1)
+        self.assertEqual(len(self.spawned), 3)
+        self.clock.advance(1)
+        self.assertEqual(len(self.spawned), 4)
+        # One that stays up long enough starts over at a second.
+        self.clock.advance(100)
+        self.supervisor.exited(1, 1)
+        self.clock.advance(1)
+        self.assertEqual(len(self.spawned), 5)
+
+    def test_clean_exit_and_stop(self):
+        self.supervisor.start()
+        self.supervisor.exited(0, 0)
+        self.clock.advance(60)
+        self.assertEqual(len(self.spawned), 2)
+        self.supervisor.stop()
+        self.assertEqual(self.spawned[1][1].signals, ['TERM'])
+        self.supervisor.exited(1, None)
+        self.clock.advance(60)
+        self.assertEqual(len(self.supervisor), 0)
+        self.assertEqual(len(self.spawned), 2)
@@ -0,0 +1,79 @@
+# What the prefix modes are called, for the ones we know.
+MODE_NAMES = {'q': 'owner', 'a': 'admin', 'o': 'op', 'h': 'halfop',
+              'v': 'voice'}
+# Used until the server says otherwise with ISUPPORT PREFIX.
+DEFAULT_PREFIX = {'q': ('~', 0), 'a': ('&', 1), 'o': ('@', 2),
+                  'h': ('%', 3), 'v': ('+', 4)}
+
+
+class UserTracker(object):
+    '''
+    This class keeps track of the prefix modes, like op and voice, of
+    everyone in the game channels, in the records the games keep for
+    them. A record's modes are a set of names like 'op' and 'voice'.
+
+    The server's PREFIX is only parsed when it is announced. NAMES
+    replies are gathered until RPL_ENDOFNAMES and then swapped in whole,
+    and each nick may carry several prefixes, with multi-prefix. MODE
+    changes are applied as they come, touching only the nicks named, so
+    nothing is ever rescanned or asked for again.
+
+    Methods:
+
+    set_prefix(prefix): takes the server's PREFIX, as {mode: (symbol, rank)}.
+    names(channel, entries): gathers nicks from a RPL_NAMREPLY.
+    end_names(channel, users): swaps the gathered nicks into users.
+    mode(users, adding, modes, args): applies a MODE change, returning
+        True if it changed anyone in users.
+    '''
+
+    def __init__(self, new_record, prefix=DEFAULT_PREFIX):
+        self._new_record = new_record
+        self._pending = {}
+        self.set_prefix(prefix)
+
+    def set_prefix(self, prefix):
+        self._modes = dict((mode, MODE_NAMES.get(mode, mode))
+                           for mode in prefix)
+        self._symbols = dict((symbol, self._modes[mode])
+                             for mode, (symbol, rank) in prefix.items())
+
+    def names(self, channel, entries):
+        pending = self._pending.setdefault(channel.lower(), {})
+        symbols = self._symbols
+        for entry in entries:
+            start = 0
+            while start < len(entry) and entry[start] in symbols:
+                start += 1
+            # With userhost-in-names, entries are nick!user@host.
+            nick = entry[start:].split('!', 1)[0]
+            if nick:
+                pending[nick] = set(symbols[symbol]
+                                    for symbol in entry[:start])
+
+    def end_names(self, channel, users):
+        pending = self._pending.pop(channel.lower(), {})
+        for nick in list(users):
+            if nick not in pending:
+                del users[nick]
+        for nick, modes in pending.items():
+            record = users.get(nick)
+            if record is None:
+                record = users[nick] = self._new_record()
+            record['modes'] = modes
+
+    def mode(self, users, adding, modes, args):
+        changed = False
+        for mode, nick in zip(modes, args):
+            name = self._modes.get(mode)
+            if name is None or nick is None:
+                continue
+            record = users.get(nick)
+            if record is None:
+                continue
+            if adding:
+                record['modes'].add(name)
+            else:
+                record['modes'].discard(name)
+            changed = True
+        return changed
@@ -0,0 +1,86 @@
+from os import path
+
+# Workers started again after crashing wait this long at first, doubling
+# each time up to MAX_DELAY, and back to the start once one has stayed up
+# for MAX_DELAY.
+INITIAL_DELAY = 1.0
+MAX_DELAY = 60.0
+# Workers write their scores at least this often, in seconds, so the
+# others see them soon.
+SAVE_DELAY = 5
+
+
+def apply_worker(config, index):
+    '''
+    Applies the settings for worker index in config.WORKERS over the
+    rest of the config. Each worker keeps its own sampler, answer times
+    and the like in a directory of its own under SAVE_DIR, while the
+    scores are shared, so they have to be kept in SQLite.
+    '''
+    config.SAVE_DELAY = min(getattr(config, 'SAVE_DELAY', SAVE_DELAY),
+                            SAVE_DELAY)
+    for name, value in config.WORKERS[index].items():
+        setattr(config, name, value)
+    config.WORKER = index
+    config.STATE_DIR = path.join(config.SAVE_DIR, 'worker%d' % index, '')
+    config.SCORE_BACKEND = 'sqlite'
+
+
+class Supervisor(object):
+    '''
+    This class keeps a process running for each worker, starting any
+    which die again after a growing delay. A worker which exits cleanly,
+    like after the die command, is left stopped.
+
+    Processes are started by spawn(index, supervisor), which returns
+    something with a signalProcess() method, and the supervisor is told
+    when one ends through exited(index, code).
+
+    Methods:
+
+    start(): starts every worker.
+    stop(): stops every worker, and starts no more.
+    exited(index, code): notes that a worker has ended.
+    '''
+
+    def __init__(self, count, spawn, call_later, now):
+        self._count = count
+        self._spawn = spawn
+        self._call_later = call_later
+        self._now = now
+        self._processes = {}
+        self._started = {}
+        self._delays = dict((index, INITIAL_DELAY) for index in range(count))
+        self._stopping = False
+
+    def start(self):
+        for index in range(self._count):
+            self._start(index)
+
+    def _start(self, index):
+        if self._stopping or index in self._processes:
+            return
+        self._started[index] = self._now()
+        self._processes[index] = self._spawn(index, self)
+
+    def exited(self, index, code):
+        self._processes.pop(index, None)
+        if self._stopping or code == 0:
+            return
+        if self._now() - self._started[index] >= MAX_DELAY:
+            self._delays[index] = INITIAL_DELAY
+        delay = self._delays[index]
+        self._delays[index] = min(delay * 2, MAX_DELAY)
+        self._call_later(delay, self._start, index)
+
+    def stop(self):
+        self._stopping = True
+        for process in self._processes.values():
+            try:
+                process.signalProcess('TERM')
+            except Exception:
+                # It already ended.
+                pass
+
+    def __len__(self):
+        return len(self._processes)
@@ -1,4 +1,4 @@
-#!/usr/bin/python2
+#!/usr/bin/env python3
 # Copyright (C) 2013 Joe Rawson
 #
 # This program is free software: you can redistribute it and/or modify
@@ -47,22 +47,48 @@
 # players, wait some, then continue.
 #
 
+from time import time
+# Taken before anything else is imported, for the startup report.
+STARTED = time()
+
+from functools import partial
+from importlib import reload
 import json
-from os import execl, listdir, path, makedirs
-from random import choice, randint
-import re
+import logging
+from os import execl, path, makedirs
+from random import randint
 import sys
 
 from twisted.words.protocols import irc
 from twisted.internet import reactor
-from twisted.internet import ssl
-from twisted.internet.protocol import ClientFactory
-from twisted.internet.task import LoopingCall
+from twisted.internet.defer import DeferredList
+from twisted.internet.protocol import (ProcessProtocol,
+                                        ReconnectingClientFactory)
+from twisted.internet.threads import deferToThread
 
-from lib.answer import Answer
+from lib.categories import CategoryPicker, category_key
+from lib.difficulty import DifficultyModel
+from lib.dispatch import split_command, strip_formatting
+from lib.game import TriviaGame, new_user
+from lib.latency import LatencyStats
+from lib.leaderboard import Leaderboard
+from lib.metrics import LagMonitor, Metrics, Startup
+from lib.output import DEFERRABLE, INFO, OutputQueue, pack_lines
+from lib.questionbank import MappedQuestionBank, QuestionBank, question_id
+from lib.ratelimit import RateLimiter
+from lib.sampler import QuestionSampler
+from lib.scheduler import Scheduler
+from lib.scores import JsonScoreStore
+from lib.storage import DebouncedSaver, atomic_write
+from lib.tags import parse_time, split_tags
+from lib.users import UserTracker
+from lib.workers import Supervisor, apply_worker
 
 import config
 
+IMPORTED = time()
+logger = logging.getLogger('triviabot')
+
 
 class triviabot(irc.IRCClient):
     '''
@@ -73,27 +99,24 @@ class triviabot(irc.IRCClient):
     server.
     '''
     def __init__(self):
-        self._answer = Answer()
-        self._question = ''
-        self._scores = {}
-        self._userlist = {}
-        self._clue_number = 0
         self._admins = list(config.ADMINS)
-        self._game_channel = config.GAME_CHANNEL
-        self._current_points = 5
-        self._questions_dir = config.Q_DIR
-        self._lc = LoopingCall(self._play_game)
+        self._caps_offered = []
+        self._line_time = None
+        self._users = UserTracker(new_user)
         self._restarting = False
         self._quit = False
-        self._load_game()
-        self._votes = 0
-        self._voters = []
-        self._no_plays = 0
+
+    # IRCv3 capabilities asked for, if the server has them.
+    CAPABILITIES = ['server-time', 'multi-prefix']
 
     def _get_nickname(self):
         return self.factory.nickname
 
-    nickname = property(_get_nickname)
+    def _set_nickname(self, nickname):
+        # IRCClient sets the nick the server accepted on RPL_WELCOME.
+        self.factory.nickname = nickname
+
+    nickname = property(_get_nickname, _set_nickname)
 
     def _get_realname(self):
         return self.factory.realname
@@ -101,90 +124,140 @@ class triviabot(irc.IRCClient):
     realname = property(_get_realname)
 
     def _get_lineRate(self):
-        return self.factory.lineRate
+        # PRIVMSGs and NOTICEs are paced by the output queue, using the
+        # factory's lineRate, so anything else can go straight out.
+        return None
 
     lineRate = property(_get_lineRate)
 
-    def _gmsg(self, msg):
+    def _get_questions(self):
+        return self.factory.questions
+
+    questions = property(_get_questions)
+
+    # The games and scores belong to the factory, so they outlive any one
+    # connection.
+    def _get_games(self):
+        return self.factory.games
+
+    _games = property(_get_games)
+
+    def _get_scores(self):
+        return self.factory.scores
+
+    _scores = property(_get_scores)
+
+    def _get_store(self):
+        return self.factory.store
+
+    _store = property(_get_store)
+
+    def _get_leaderboard(self):
+        return self.factory.leaderboard
+
+    _leaderboard = property(_get_leaderboard)
+
+    def _get_scheduler(self):
+        return self.factory.scheduler
+
+    scheduler = property(_get_scheduler)
+
+    def connectionMade(self):
+        self._output = OutputQueue(self._send, reactor.callLater,
+                                   reactor.seconds, self.factory.lineRate,
+                                   self._get_nickname, config.OUTPUT_BACKLOG)
+        self.factory.metrics.gauge('output', self._output.metrics)
+        for game in self._games.values():
+            game.bot = self
+        # Servers without IRCv3 capabilities just ignore this.
+        self._caps_offered = []
+        self.sendLine('CAP LS 302')
+        irc.IRCClient.connectionMade(self)
+
+    def lineReceived(self, line):
+        '''
+        Takes any IRCv3 tags off a line before it is handled, noting the
+        server's time for it when there is one.
+        '''
+        self._line_time = None
+        if line[:1] in (b'@', '@'):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            tags, line = split_tags(line)
+            self._line_time = parse_time(tags.get('time'))
+        irc.IRCClient.lineReceived(self, line)
+
+    def irc_CAP(self, prefix, params):
+        '''
+        Asks for the capabilities we can use from those the server
+        offers, then finishes registering.
+        '''
+        subcommand = params[1].upper()
+        if subcommand == 'LS':
+            self._caps_offered.extend(cap.split('=', 1)[0]
+                                      for cap in params[-1].split())
+            # "CAP * LS * :..." means more are on the way.
+            if len(params) > 3 and params[2] == '*':
+                return
+            wanted = [cap for cap in self.CAPABILITIES
+                      if cap in self._caps_offered]
+            if wanted:
+                self.sendLine('CAP REQ :%s' % ' '.join(wanted))
+                return
+        if subcommand in ('LS', 'ACK', 'NAK'):
+            self.sendLine('CAP END')
+
+    def _send(self, kind, target, line):
         """
-        Write a message to the channel playing the trivia game.
+        Called by the output queue to actually send a line.
         """
-        self.msg(self._game_channel, msg)
-
-    def _play_game(self):
-        '''
-        Implements the main loop of the game.
-        '''
-        self._points = {0: 100,
-                        1: 75,
-                        2: 50,
-                        3: 25
-                        }
-        self._cluelabels= {0: 'Clue:',
-                           1: '2nd Clue:',
-                           2: '3rd Clue:',
-                           3: 'Final Clue:'
-                           }
-        if self._clue_number == 0:
-            self._votes = 0
-            self._voters = []
-            self._get_new_question()
-            self._current_points = self._points[self._clue_number]
-            # Blank line.
-            self._gmsg("")
-            self._gmsg("Next question:")
-            self._gmsg(self._question)
-            self._gmsg("%s %s  Points: %d" % (self._cluelabels[self._clue_number],
-                       self._answer.current_clue(), self._current_points))
-            self._clue_number += 1
-        # we must be somewhere in between
-        elif self._clue_number < 4:
-            self._current_points = self._points[self._clue_number]
-            self._gmsg('%s %s  Points: %d' % (self._cluelabels[self._clue_number],
-                       self._answer.give_clue(), self._current_points))
-            self._clue_number += 1
-        # no one must have gotten it.
+        if kind == 'NOTICE':
+            irc.IRCClient.notice(self, target, line)
         else:
-            self._gmsg('No one got it. The answer was: %s' %
-                       self._answer.answer)
-            self._clue_number = 0
-            self._no_plays += 1
-            # Stop gameplay after 10 questions of no activity
-            if (self._no_plays == 10):
-                self._gmsg('It appears I am talking to myself now!')
-                self._stop()
-            else:
-                self._get_new_question()
+            irc.IRCClient.msg(self, target, line)
+
+    def msg(self, user, message, length=None, priority=INFO):
+        """
+        Queues a message, to be packed with others to the same target.
+        """
+        self._output.put('PRIVMSG', user, message, priority)
+
+    def notice(self, user, message, priority=INFO, key=None):
+        """
+        Queues a notice, to be packed with others to the same target.
+        """
+        self._output.put('NOTICE', user, message, priority, key)
 
-    def irc_RPL_NAMREPLY(self, *nargs):
+    def _game(self, channel):
         '''
-        Called when we get a reply to NAMES
-        Using this for tracking user modes, in a simplistic manner
+        Returns the game played in channel, or None.
         '''
-        if (nargs[1][2] != self._game_channel): return
-        users = nargs[1][3].split()
-        for u in users:
-            split = re.split('(\~|\&|\@|\%|\+)', u)
-            try:
-                mode = split[1]
-                user = split[2]
-            except IndexError:
-                mode = ''
-                user = split[0]
-            mode = mode.replace('+', 'voice')
-            mode = mode.replace('%', 'halfop')
-            mode = mode.replace('@', 'op')
-            mode = mode.replace('&', 'admin')
-            mode = mode.replace('~', 'owner')
-            # This is for us joining the channel and re-checking after mode changes
-            try:
-                self._userlist[user]
-                self._userlist['modes'] = (mode,)
-            except:
-                self._userlist[user] = {}
-                self._userlist[user]['wins'] = 0
-                self._userlist[user]['modes'] = (mode,)
-                self._userlist[user]['strikes'] = 0
+        if channel is None:
+            return None
+        return self._games.get(channel.lower())
+
+    def isupport(self, options):
+        '''
+        Picks up the server's prefix modes, if it announces them.
+        '''
+        if any(option.split('=', 1)[0] == 'PREFIX' for option in options):
+            self._users.set_prefix(self.supported.getFeature('PREFIX'))
+
+    def irc_RPL_NAMREPLY(self, prefix, params):
+        '''
+        Called when we get a reply to NAMES, which may take several
+        replies, for tracking user modes.
+        '''
+        if self._game(params[2]) is None: return
+        self._users.names(params[2], params[3].split())
+
+    def irc_RPL_ENDOFNAMES(self, prefix, params):
+        '''
+        Called once every reply to NAMES has been sent.
+        '''
+        game = self._game(params[1])
+        if game is None: return
+        self._users.end_names(params[1], game.users)
 
     def signedOn(self):
         '''
@@ -196,21 +269,46 @@ class triviabot(irc.IRCClient):
         except:
             pass
         self.mode(self.nickname, True, config.DEFAULT_MODES)
-        print("Signed on as %s." % (self.nickname,))
-        self.join(self._game_channel)
-        if self.factory.running:
-            self._start(None, None, None)
+        logger.info("Signed on as %s.", self.nickname)
+        self.factory.signed_on(self)
+
+    def ready(self):
+        '''
+        Called once signed on, with the questions and scores loaded.
+        '''
+        for game in self._games.values():
+            self._join_game(game)
+
+    def _join_game(self, game):
+        '''
+        Joins a game's channel, carrying on with the game if it was
+        running before the connection dropped.
+        '''
+        self._update_picker(game)
+        self.join(game.channel)
+        if game.channel.lower() in self.factory.running:
+            game.resume()
         else:
-            self._gmsg('Welcome to %s!' % self._game_channel)
-            self._gmsg("For how to use this bot, just say ?help or '%s help'." % self.nickname)
+            self.msg(game.channel, 'Welcome to %s!' % game.channel)
+            self.msg(game.channel, "For how to use this bot, just say "
+                     "?help or '%s help'." % self.nickname)
+
+    def irc_JOIN(self, prefix, params):
+        '''
+        Notes our own nick!user@host when we join, so the output queue
+        knows exactly how long the prefix on our lines is.
+        '''
+        if prefix.split('!', 1)[0] == self.nickname:
+            self._output.prefix = prefix
+        irc.IRCClient.irc_JOIN(self, prefix, params)
 
     def joined(self, channel):
         '''
         Callback runs when the bot joins a channel
         A join automatically receives a NAMES reply, for user listing
         '''
-        print("Joined %s." % (channel,))
-        if (channel != self._game_channel):
+        logger.info("Joined %s.", channel)
+        if self._game(channel) is None:
             self.leave(channel, 'No!')
             return
 
@@ -219,145 +317,140 @@ class triviabot(irc.IRCClient):
         If we get kicked from gthe game channel,
         attempt to rejoin.
         '''
-        print("Kicked from %s by %s: %s" % (channel, kicker, message))
-        if (channel != self._game_channel):
+        logger.warning("Kicked from %s by %s: %s", channel, kicker, message)
+        if self._game(channel) is None:
             return
-        self.join(self._game_channel)
+        self.join(channel)
 
     def userJoined(self, user, channel):
         '''
         Callback for when other users join the channel
         '''
-        if channel != self._game_channel: return
+        game = self._game(channel)
+        if game is None: return
         # Add user to userlist, track wins, modes, and strikes of user
-        self._userlist[user] = {}
-        self._userlist[user]['wins'] = 0
-        self._userlist[user]['modes'] = ('',)
-        self._userlist[user]['strikes'] = 0
+        game.users[user] = new_user()
         # If admin, don't send intro notice and op them
-        try:
-            self._admins.index(user)
+        if user in self._admins:
             self.mode(channel, True, 'o', user=user)
-            self._userlist[user]['modes'].append('op')
-        except:
-            self.notice(user, "Welcome to %s!" % self._game_channel)
+            game.users[user]['modes'].add('op')
+        else:
+            self.notice(user, "Welcome to %s!" % game.channel)
             self.notice(user, "For how to use this bot, just say ?help or '%s help'." % self.nickname)
-            if not self.factory.running:
+            if not game.running:
                 self.notice(user, "Just say ?start to start the game when you are ready.")
 
     def userLeft(self, user, channel):
         '''
         Called when a user leaves the game channel
         '''
-        if channel != self._game_channel: return
-        if user in self._userlist:
-            del self._userlist[user]
+        game = self._game(channel)
+        if game is None: return
+        game.users.pop(user, None)
 
     def userQuit(self, user, quitMessage):
         '''
         Called when a user quits
         '''
-        if channel != self._game_channel: return
-        if user in self._userlist:
-            del self._userlist[user]
+        for game in self._games.values():
+            game.users.pop(user, None)
 
     def userKicked(self, kickee, channel, kicker, message):
         '''
         Called when a user is kicked from the game channel
         '''
-        if channel != self._game_channel: return
-        if kickee in self._userlist:
-            del self._userlist[kickee]
+        game = self._game(channel)
+        if game is None: return
+        game.users.pop(kickee, None)
 
     def userRenamed(self, oldname, newname):
         '''
         Called when a user changes nicknames
         '''
-        if oldname in self._userlist:
-            self._userlist[newname] = self._userlist.pop(oldname)
+        for game in self._games.values():
+            if oldname in game.users:
+                game.users[newname] = game.users.pop(oldname)
 
     def modeChanged(self, user, channel, set, modes, args):
         '''
         Called when a mode change is seen
         '''
-        if channel != self._game_channel: return
-        #print('MODE: %s : direction %d : %s and %s' % (user, set, modes, args))
-        # Check if 'our' users are part of a mode change, re-run NAMES
-        user_change = False
-        for u in self._userlist:
-            if (u in args):
-                user_change = True
-                break
-        if (user_change == False): return
-        self.sendLine('NAMES %s' % channel)
+        game = self._game(channel)
+        if game is None: return
+        self._users.mode(game.users, set, modes, args)
 
     def privmsg(self, user, channel, msg):
         '''
         Parses out each message and initiates doing the right thing
         with it.
         '''
-        user, temp = user.split('!')
-        #print(user+" : "+channel+" : "+msg)
-        # ignore STATUSMSGs, lazy check
-        if (not channel[0] == "#"):
-            return
-        # need to strip off colors if present.
-        try:
-            while not msg[0].isalnum() and not msg[0] == '?':
-                msg = msg[1:]
-        except IndexError:
+        metrics = self.factory.metrics
+        metrics.count('messages')
+        user = user.split('!', 1)[0]
+        # ignore STATUSMSGs and channels without a game
+        game = self._game(channel)
+        if game is None:
             return
-
-        # parses each incoming line, and sees if it's a command for the bot.
-        try:
-            if (msg[0] == "?"):
-                command = msg.replace('?', '').split()[0]
-                args = msg.replace('?', '').split()[1:]
-                self.select_command(command, args, user, channel)
+        msg = strip_formatting(msg)
+        command = split_command(msg, self.nickname)
+        if command is not None:
+            # flooders are ignored without a word
+            if self._limited(user, command[0], channel):
                 return
-            elif (msg.split()[0].find(self.nickname) == 0):
-                command = msg.split()[1]
-                args = msg.replace(self.nickname, '').split()[2:]
-                self.select_command(command, args, user, channel)
-                return
-            # if not, try to match the message to the answer.
-            else:
-                if msg.lower().strip() == self._answer.answer.lower():
-                    self._no_plays = 0
-                    self._winner(user, channel)
-                    self._save_game()
-        except:
+            metrics.count('commands')
+            with metrics.timed('command_seconds'):
+                self.select_command(command[0], command[1], user, channel)
             return
+        # if not, try to match the message to the answer.
+        if game.running and self._limited(user, 'guess', channel):
+            return
+        with metrics.timed('answer_check_seconds'):
+            game.check(user, msg, self._line_time)
         # Assuming this is gameplay
-        self._no_plays = 0
+        game.played()
 
-    def _winner(self, user, channel):
+    def _limited(self, user, command, channel):
         '''
-        Congratulates the winner for guessing correctly and assigns
-        points appropriately, then signals that it was guessed.
+        Returns True if the user has gone over their rate limit. Admins
+        are never limited.
+        '''
+        if user in self._admins:
+            return False
+        if self.factory.limiter.allow(user, command, channel):
+            return False
+        self.factory.metrics.count('rate_limited')
+        return True
+
+    def _award(self, user, points, question, clue, latency):
+        '''
+        Adds a winner's points to the scores shared by every game.
         '''
-        if channel != self._game_channel:
-            self.msg(channel,
-                     "I'm sorry, answers must be given in the game channel.")
-            return
-        self._gmsg("%s GOT IT!" % user)
         try:
-            self._scores[user] += self._current_points
+            self._scores[user] += points
         except:
-            self._scores[user] = self._current_points
-        self._gmsg("%s points have been added to your score!" %
-                   str(self._current_points))
-        self._clue_number = 0
-        self._get_new_question()
-        self._userlist[user]['wins'] += 1
-        if (self._userlist[user]['wins'] == 2):
-            self.mode(channel, True, 'v', user=user)
-            self._gmsg('Five correct answers! That earns you a voice!')
-            self._userlist[user]['modes'].append('voice')
-        elif (self._userlist[user]['wins'] == 4):
-            self.mode(channel, True, 'h', user=user)
-            self._gmsg('Another fifteen correct answers, have some halfops!')
-            self._userlist[user]['modes'].append('halfop')
+            self._scores[user] = points
+        self._leaderboard.update(user, self._scores[user])
+        self.factory.latency.record(user, latency)
+        self.factory.difficulty.solved(question, clue, latency)
+        self.factory.state_saver.changed()
+        self._store.add_points(user, points, self._scores[user], question,
+                               clue, latency)
+
+    def _question_asked(self, question):
+        self._store.question_asked(question)
+        self.factory.state_saver.changed()
+
+    def _question_unsolved(self, question):
+        self.factory.difficulty.unsolved(question)
+        self.factory.state_saver.changed()
+
+    def _point_scale(self, question):
+        '''
+        How much a question's points are scaled by for its difficulty.
+        '''
+        if not config.DIFFICULTY_POINTS:
+            return 1.0
+        return self.factory.difficulty.scale(question)
 
     def ctcpQuery(self, user, channel, msg):
         '''
@@ -366,7 +459,7 @@ class triviabot(irc.IRCClient):
         msg = str(msg[0][0]).lower()
         user = (user.split("!"))[0]
         if (msg == 'action'): return
-        print("CTCP from %s : %s" % (user, msg))
+        logger.debug("CTCP from %s : %s", user, msg)
         if (msg == 'version'):
             self.notice(user, "CTCP VERSION: Trivia Bot!")
         elif (msg == 'time'):
@@ -386,13 +479,16 @@ class triviabot(irc.IRCClient):
         try:
             self._admins.index(user)
         except:
-            self.notice(user, "Commands: start, stop, score, standings, "
-                       "question, clue, help, next, source")
+            self.notice(user, "Commands: start, stop, score, "
+                        "standings [page|me], top, fastest, question, clue, "
+                        "category [name|all], categories [search], help, "
+                        "next, source")
             return
-        self.notice(user, "Commands: start, stop, score, standings, "
-                   "question, clue, help, next, source")
-        self.notice(user, "Admin commands: skip, restart, die, "
-                   "set <user> <score>, save")
+        self.notice(user, "Commands: start, stop, score, standings [page|me], "
+                   "top, fastest, question, clue, category [name|all], "
+                   "categories [search], help, next, source")
+        self.notice(user, "Admin commands: skip, restart [full], die, "
+                   "set <user> <score>, save, reload, stats, profile")
 
     def _show_source(self, args, user, channel):
         '''
@@ -412,161 +508,112 @@ class triviabot(irc.IRCClient):
         Need to differentiate between priviledged users and regular
         users.
         '''
-        # set up command dicts.
-        unpriviledged_commands = {'score': self._score,
-                                  'help': self._help,
-                                  'start': self._start,
-                                  'stop': self._stop,
-                                  'source': self._show_source,
-                                  'standings': self._standings,
-                                  'question': self._show_question,
-                                  'clue': self._give_clue,
-                                  'next': self._next_vote,
-                                  }
-        priviledged_commands = {'skip': self._next_question,
-                                'restart': self._restart,
-                                'die': self._die,
-                                'set': self._set_user_score,
-                                'save': self._save_game,
-                                }
-        print(command, args, user, channel)
-        try:
-            self._admins.index(user)
-            is_admin = True
-        except:
-            is_admin = False
-        command = command.lower()
-        # the following takes care of sorting out functions and
-        # priviledges.
-        if not is_admin and command in priviledged_commands.keys():
+        entry = self.COMMANDS.get(command.lower())
+        if entry is None:
+            self.describe(channel, 'looks at %s oddly.' % user)
+            return
+        function, privileged = entry
+        if privileged and user not in self._admins:
             self.msg(channel, "%s: You don't tell me what to do." % user)
-            self._userlist[user]['strikes'] += 1
-            if (self._userlist[user]['strikes'] == 5):
+            record = self._game(channel).users.setdefault(user, new_user())
+            record['strikes'] += 1
+            if (record['strikes'] == 5):
                 self.kick(channel, user, "You've earned five strikes, be gone!")
-            elif ('halfop' in self._userlist[user]['modes']):
+            elif ('halfop' in record['modes']):
                 self.mode(channel, False, 'h', user=user)
-                self._userlist[user]['modes'].remove('halfop')
-            elif ('voice' in self._userlist[user]['modes']):
+                record['modes'].remove('halfop')
+            elif ('voice' in record['modes']):
                 self.mode(channel, False, 'v', user=user)
-                self._userlist[user]['modes'].remove('voice')
+                record['modes'].remove('voice')
             return
-        elif is_admin and command in priviledged_commands.keys():
-            priviledged_commands[command](args, user, channel)
-        elif command in unpriviledged_commands.keys():
-            unpriviledged_commands[command](args, user, channel)
-        else:
-            self.describe(channel, 'looks at %s oddly.' % user)
+        function(self, args, user, channel)
 
     def _next_vote(self, args, user, channel):
-        '''Implements user voting for the next question.
-
-        Need to keep track of who voted, and how many votes.
-
         '''
-        if not self._lc.running:
-            self._gmsg("We aren't playing right now.")
-            return
-        try:
-            self._voters.index(user)
-            self._gmsg("You already voted, %s, give someone else a chance to "
-                       "hate this question" % user)
-            return
-        except:
-            if self._votes < 2:
-                self._votes += 1
-                self._voters.append(user)
-                print(self._voters)
-                self._gmsg("%s, you have voted. %s more votes needed to "
-                           "skip." % (user, str(3-self._votes)))
-            else:
-                self._votes = 0
-                self._voters = []
-                self._next_question(None, None, None)
+        Votes to skip the question in the user's game.
+        '''
+        self._game(channel).vote(user)
 
     def _start(self, args, user, channel):
         '''
-        Starts the trivia game.
-
-        TODO: Load scores from last game, if any.
+        Starts the trivia game in the channel.
         '''
-        if self._lc.running:
-            return
-        else:
-            self._get_new_question()
-            self._clue_number = 0
-            self._no_plays = 0
-            self._lc.start(config.WAIT_INTERVAL)
-            self.factory.running = True
+        self._game(channel).start()
+        self.factory.running.add(channel.lower())
 
-    def _stop(self, *args):
+    def _stop(self, args, user, channel):
         '''
-        Stops the game and thanks people for playing,
+        Stops the game in the channel and thanks people for playing,
         then saves the scores.
         '''
-        if not self._lc.running:
+        game = self._game(channel)
+        if not game.running:
             return
-        else:
-            self._lc.stop()
-            self._gmsg('Thanks for playing trivia!')
-            self._gmsg('Current rankings are:')
-            self._standings(None, None, self._game_channel)
-            self._gmsg('Scores have been saved, and see you next game!')
-            self._save_game()
-            self.factory.running = False
+        game.stop()
+        self._save_game()
+        self.factory.state_saver.flush()
+        self.factory.running.discard(channel.lower())
 
     def _save_game(self, *args):
         '''
-        Saves the game to the data directory.
-        '''
-        if not path.exists(config.SAVE_DIR):
-            makedirs(config.SAVE_DIR)
-        with open(config.SAVE_DIR+'scores.json', 'w') as savefile:
-            json.dump(self._scores, savefile)
-            print("Scores have been saved.")
-
-    def _load_game(self):
-        '''
-        Loads the running data from previous games.
+        Saves the game to the data directory, in the background.
         '''
-        # ensure initialization
-        self._scores = {}
-        if not path.exists(config.SAVE_DIR):
-            print("Save directory doesn't exist.")
-            return
-        try:
-            with open(config.SAVE_DIR+'scores.json', 'r') as savefile:
-                temp_dict = json.load(savefile)
-        except:
-            print("Save file doesn't exist.")
-            return
-        for name in temp_dict.keys():
-            self._scores[str(name)] = int(temp_dict[name])
-        print(self._scores)
-        print("Scores loaded.")
+        self._store.flush()
 
     def _set_user_score(self, args, user, channel):
         '''
         Administrative action taken to adjust scores, if needed.
         '''
+        if len(args) < 2:
+            self.notice(user, "Usage: set <nick> <score>")
+            return
         try:
-            self._scores[args[0]] = int(args[1])
-        except:
-            self.notice(user, args[0]+" not in scores database.")
+            score = int(args[1])
+        except ValueError:
+            self.notice(user, "Usage: set <nick> <score>")
             return
+        old_score = self._scores.get(args[0], 0)
+        self._scores[args[0]] = score
+        self._leaderboard.update(args[0], score)
+        self._store.set_score(args[0], self._scores[args[0]],
+                              self._scores[args[0]] - old_score)
         self.notice(user, args[0]+" score set to "+args[1])
 
-    def _restart(self, *args):
+    def _restart(self, args, user, channel):
         '''
-        Restart the bot.
+        Restart the bot. The config and the question bank are reloaded in
+        place, keeping the connection, the scores and every game where it
+        is. 'restart full' starts a new process instead.
         '''
-        self._restarting = True
-        self.quit('Restarting eh')
+        if args and args[0].lower() == 'full':
+            self._restarting = True
+            self.factory.stopTrying()
+            self.quit('Restarting eh')
+            return
+        start = time()
+
+        def restarted(games):
+            added, removed = games
+            for game in removed:
+                self._output.after(game.channel, partial(
+                    self.leave, game.channel, 'No more trivia here.'))
+            for game in added:
+                game.bot = self
+                self._join_game(game)
+            self._update_pickers()
+            self.notice(user, "Restarted in %dms, with %d questions." %
+                        ((time() - start) * 1000, len(self.questions)))
+
+        d = self.factory.reload()
+        self._admins = list(config.ADMINS)
+        d.addCallbacks(restarted, self._reload_failed, errbackArgs=(user,))
 
     def _die(self, *args):
         '''
         Terminates execution of the bot.
         '''
         self._quit = True
+        self.factory.stopTrying()
         self.quit(config.DEFAULT_QUIT)
 
     def connectionLost(self, reason):
@@ -574,6 +621,22 @@ class triviabot(irc.IRCClient):
         Called when connection is lost
         '''
         global reactor
+        # Stops the heartbeat, which would otherwise keep us alive.
+        irc.IRCClient.connectionLost(self, reason)
+        self.factory.metrics.gauge('output', None)
+        self._output.clear()
+        for game in self._games.values():
+            game.halt()
+        if self._store is None:
+            # Lost before the scores were loaded, so nothing to save.
+            pass
+        elif self._restarting or self._quit:
+            # Don't lose unsaved scores, whatever happens next.
+            self._store.close()
+            self.factory.save_state()
+        else:
+            # The scores stay with the factory for the next connection.
+            self._store.flush()
         if self._restarting:
             execl(sys.executable, *([sys.executable]+sys.argv))
         elif self._quit:
@@ -584,100 +647,626 @@ class triviabot(irc.IRCClient):
         Tells the user their score.
         '''
         try:
-            self.notice(user, "Your current score is: %s" %
-                       str(self._scores[user]))
+            self.notice(user, "Your current score is: %s (ranked #%d of %d)" %
+                        (str(self._scores[user]), self._leaderboard.rank(user),
+                         len(self._leaderboard)))
         except:
             self.notice(user, "You aren't in my database.")
+            return
+        stats = self.factory.latency.stats(user)
+        if stats is not None:
+            self.notice(user, "Answers: %d, average %.2fs, best %.2fs" %
+                        stats)
 
-    def _next_question(self, args, user, channel):
+    def _fastest(self, args, user, channel):
         '''
-        Administratively skips the current question.
+        Tells the user who has given the quickest answers.
         '''
-        if not self._lc.running:
-            self._gmsg("We are not playing right now.")
+        ranks = self.factory.latency.fastest(10)
+        if not ranks:
+            self.notice(user, "Nobody has answered anything yet.")
             return
-        self._gmsg("Question has been skipped. The answer was: %s" %
-                   self._answer.answer)
-        self._clue_number = 0
-        self._lc.stop()
-        self._lc.start(config.WAIT_INTERVAL)
+        self.notice(user, "Fastest answers: %s" % ", ".join(
+            "#%d: %s in %.2fs" % rank for rank in ranks))
+
+    def _skip(self, args, user, channel):
+        '''
+        Administratively skips the current question.
+        '''
+        self._game(channel).skip()
 
     def _standings(self, args, user, channel):
         '''
-        Tells the user the complete standings in the game.
+        Tells the user the standings in the game, a page at a time.
+        '?standings 2' shows the second page, and '?standings me' the
+        players ranked around the user.
         '''
         if channel == self.nickname:
             dst = user
         else:
-            if channel != self._game_channel: return
+            if self._game(channel) is None: return
             dst = channel
-        score_list = []
+        page_size = config.STANDINGS_PAGE
+        if args and args[0].lower() == 'me':
+            ranks = self._leaderboard.around(user, page_size // 2)
+            if not ranks:
+                self.notice(dst, "%s isn't in the standings yet." % user)
+                return
+        else:
+            try:
+                page = max(1, int(args[0])) if args else 1
+            except ValueError:
+                self.notice(dst, "Usage: standings [page|me]")
+                return
+            ranks = self._leaderboard.top(page_size, (page - 1) * page_size)
+            if not ranks:
+                self.notice(dst, "There are only %d players in the "
+                            "standings." % len(self._leaderboard))
+                return
         if not user is None:
-            self.notice(dst, "The current trivia standings are: ")
-        sorted_scores = sorted(self._scores.iteritems(), key=lambda x:x[1], reverse=True)
-        for rank, (player, score) in enumerate(sorted_scores, start=1):
-            formatted_score = "#%s: %s with %s points" % (rank, player, score)
-            score_list.append(formatted_score)
-        # Will have to split this at a certain length later
-        self.notice(dst, ", ".join([str(player) for player in score_list]))
+            self.notice(dst, "The current trivia standings are:",
+                        DEFERRABLE, 'standings')
+        score_list = ["#%s: %s with %s points" % (rank, player, score)
+                      for rank, player, score in ranks]
+        for line in pack_lines(score_list):
+            self.notice(dst, line, DEFERRABLE, 'standings')
 
-    def _show_question(self, args, user, channel):
-        if not self._lc.running:
-            self._gmsg("We are not playing right now.")
+    def _top(self, args, user, channel):
+        '''
+        Tells the user who scored the most over the last day, week or
+        month. The query runs in a thread.
+        '''
+        periods = {'day': 86400, 'week': 604800, 'month': 2592000}
+        period = args[0].lower() if args else 'week'
+        if period not in periods:
+            self.notice(user, "Usage: top [day|week|month]")
             return
-        self._gmsg("Current question: %s" % self._question)
+        if not hasattr(self._store, 'top_since'):
+            self.notice(user, "That needs the sqlite score backend.")
+            return
+
+        def show(rows):
+            if not rows:
+                self.notice(user, "Nobody has scored this %s." % period)
+                return
+            self.notice(user, "Top scorers this %s: %s" % (period, ", ".join(
+                "#%d: %s with %d points" % (rank, player, score)
+                for rank, (player, score) in enumerate(rows, start=1))))
+
+        self._store.top_since(time() - periods[period], 10).addCallback(show)
+
+    def _show_question(self, args, user, channel):
+        self._game(channel).show_question()
 
     def _give_clue(self, args, user, channel):
-        if not self._lc.running:
-            self._gmsg("We are not playing right now.")
+        self._game(channel).give_clue()
+
+    def _draw_question(self, pick=None):
+        '''
+        Picks a new (question, answer) pair from the shared question
+        bank, for any of the games, using the game's picker if it has
+        one.
+        '''
+        with self.factory.metrics.timed('question_draw_seconds'):
+            index = self.factory.sampler.draw(len(self.questions), pick,
+                                              config.DIFFICULTY_CANDIDATES,
+                                              self._off_target)
+            return self.questions.get(index)
+
+    def _off_target(self, index):
+        '''
+        How far a question's solve rate is from the one aimed for, so
+        the closest of a few candidates can be asked.
+        '''
+        question = self.questions.get(index)[0]
+        rate = self.factory.difficulty.solve_rate(question_id(question))
+        return abs(rate - config.TARGET_SOLVE_RATE)
+
+    def _update_picker(self, game):
+        '''
+        Makes the picker for a game's categories and the weights set for
+        its channel, or none if every question is as likely as any other.
+        Pickers hold question numbers, so they are remade on reload.
+        '''
+        weights = {}
+        for key in ('*', game.channel.lower()):
+            for name, weight in config.CATEGORY_WEIGHTS.get(key, {}).items():
+                weights[category_key(name)] = weight
+        game.picker = None
+        if game.categories is None and not weights:
+            return True
+        try:
+            game.picker = CategoryPicker(self.questions, weights,
+                                         game.categories)
+        except ValueError:
+            return False
+        return True
+
+    def _category(self, args, user, channel):
+        '''
+        Sets the categories questions come from in the channel.
+        '?category science' picks every category starting with science,
+        and '?category all' goes back to all of them.
+        '''
+        game = self._game(channel)
+        if not args:
+            if game.categories is None:
+                self.notice(user, "Questions come from every category.")
+            else:
+                self.notice(user, "Questions come from: %s" %
+                            ", ".join(sorted(game.categories)))
             return
-        # Just stop and start gameplay timer. It will give a new clue
-        # and wait another 'WAIT_INTERVAL' until the next clue
-        self._lc.stop()
-        self._lc.start(config.WAIT_INTERVAL)
-
-    def _get_new_question(self):
-        '''
-        Selects a new question from the questions directory and
-        sets it.
-        '''
-        damaged_question = True
-        while damaged_question:
-            # randomly select file
-            filename = choice(listdir(self._questions_dir))
-            fd = open(config.Q_DIR+filename)
-            lines = fd.read().splitlines()
-            myline = choice(lines)
-            fd.close()
-            try:
-                self._question, temp_answer = myline.split('`')
-            except ValueError:
-                print("Broken question:")
-                print(myline)
-                continue
-            self._answer.set_answer(temp_answer.strip())
-            damaged_question = False
+        wanted = category_key(' '.join(args))
+        if wanted in ('all', 'any', 'off'):
+            game.categories = None
+            self._update_picker(game)
+            self.msg(channel, "Questions will now come from every category.")
+            return
+        matches = [name for name, count in self.questions.categories()
+                   if (name + ' ').startswith(wanted + ' ')]
+        previous = game.categories
+        game.categories = set(matches)
+        if not matches or not self._update_picker(game):
+            game.categories = previous
+            self._update_picker(game)
+            self.notice(user, "There are no questions in %s. Try "
+                        "?categories to see what there is." % wanted)
+            return
+        self.msg(channel, "Questions will now come from: %s" %
+                 ", ".join(sorted(matches)))
+
+    def _categories(self, args, user, channel):
+        '''
+        Tells the user the biggest categories, or those matching a
+        search, with how many questions each has.
+        '''
+        wanted = category_key(' '.join(args))
+        found = [(name, count) for name, count in self.questions.categories()
+                 if wanted in name]
+        if not found:
+            self.notice(user, "No categories match %s." % wanted)
+            return
+        self.notice(user, "%d categories, the biggest first:" % len(found),
+                    DEFERRABLE, 'categories')
+        for line in pack_lines(["%s (%d)" % entry for entry in found[:30]]):
+            self.notice(user, line, DEFERRABLE, 'categories')
+
+    def _reload_questions(self, args, user, channel):
+        '''
+        Administratively rescans the questions directory, or remaps the
+        compiled question file, so edits can be picked up without a
+        restart. The games play on with the old bank meanwhile.
+        '''
+        def reloaded(questions):
+            self._update_pickers()
+            self.notice(user, "Question bank reloaded: %d questions, %d "
+                        "broken lines skipped." % (len(questions),
+                                                   questions.broken))
 
+        d = self.factory.reload_questions()
+        d.addCallbacks(reloaded, self._reload_failed, errbackArgs=(user,))
 
-class ircbotFactory(ClientFactory):
+    def _reload_failed(self, failure, user):
+        logger.error("Could not reload the questions:\n%s",
+                     failure.getTraceback())
+        self.notice(user, "Could not reload the questions: %s" %
+                    failure.getErrorMessage())
+
+    def _update_pickers(self):
+        '''
+        Remakes every game's picker, after the questions were reloaded.
+        Games whose categories are all gone go back to every category.
+        '''
+        for game in self._games.values():
+            if not self._update_picker(game):
+                game.categories = None
+                self._update_picker(game)
+
+    def _stats(self, args, user, channel):
+        '''
+        Tells an admin how the bot is performing: traffic, how long the
+        hot paths take, and how far behind the reactor and the output
+        queue are running.
+        '''
+        metrics = self.factory.metrics
+        uptime = metrics.uptime()
+        counters = metrics.counters()
+        messages = counters.get('messages', 0)
+        items = ["Up %dh%02dm" % (uptime // 3600, uptime % 3600 // 60),
+                 "%d messages (%.2f/s)" % (messages,
+                                           messages / max(uptime, 1.0)),
+                 "%d commands" % counters.get('commands', 0),
+                 "%d rate limited" % counters.get('rate_limited', 0),
+                 "%d reconnects" % max(0, self.factory.connects - 1)]
+        for name, histogram in sorted(metrics.histograms().items()):
+            if histogram.count:
+                items.append("%s: %d, avg %.2fms, max %.2fms" %
+                             (name.replace('_seconds', ''), histogram.count,
+                              histogram.average() * 1000,
+                              histogram.max * 1000))
+        gauges = metrics.gauges()
+        items.append("queue depth %d (max %d)" %
+                     (gauges.get('output_depth', 0),
+                      gauges.get('output_depth_max', 0)))
+        for line in pack_lines(items, separator='; '):
+            self.notice(user, line)
+
+    def _profile(self, args, user, channel):
+        '''
+        Starts profiling the bot, or stops and dumps the profile to the
+        data directory, for reading with pstats or snakeviz.
+        '''
+        if self.factory.profiler is None:
+            import cProfile
+            self.factory.profiler = cProfile.Profile()
+            self.factory.profiler.enable()
+            self.notice(user, "Profiling started, say profile again to "
+                        "stop.")
+            return
+        profiler = self.factory.profiler
+        self.factory.profiler = None
+        profiler.disable()
+        if not path.exists(config.STATE_DIR):
+            makedirs(config.STATE_DIR)
+        filename = config.STATE_DIR+'profile-%d.prof' % time()
+        profiler.dump_stats(filename)
+        self.notice(user, "Profile saved to %s" % filename)
+
+    # command -> (method, privileged), built once for every connection.
+    COMMANDS = {'score': (_score, False),
+                'help': (_help, False),
+                'start': (_start, False),
+                'stop': (_stop, False),
+                'source': (_show_source, False),
+                'standings': (_standings, False),
+                'top': (_top, False),
+                'fastest': (_fastest, False),
+                'category': (_category, False),
+                'categories': (_categories, False),
+                'question': (_show_question, False),
+                'clue': (_give_clue, False),
+                'next': (_next_vote, False),
+                'skip': (_skip, True),
+                'restart': (_restart, True),
+                'die': (_die, True),
+                'set': (_set_user_score, True),
+                'save': (_save_game, True),
+                'reload': (_reload_questions, True),
+                'stats': (_stats, True),
+                'profile': (_profile, True),
+                }
+
+
+class ircbotFactory(ReconnectingClientFactory):
+    '''
+    This class holds everything that outlives a connection: the games,
+    the scores, the questions and the timers. It reconnects when the
+    connection drops, waiting a second, then twice as long each time up
+    to RECONNECT_MAX_DELAY, give or take a quarter so a netsplit doesn't
+    bring every bot back at the same moment. The wait goes back to a
+    second once the bot has signed on again.
+    '''
     protocol = triviabot
+    initialDelay = 1.0
+    factor = 2.0
+    jitter = 0.25
 
-    def __init__(self, nickname=config.DEFAULT_NICK, realname=config.DEFAULT_NAME):
+    def __init__(self, nickname=config.DEFAULT_NICK,
+                 realname=config.DEFAULT_NAME):
         self.nickname = nickname
         self.realname = realname
-        self.running = False
+        self.clock = reactor
+        self.maxDelay = config.RECONNECT_MAX_DELAY
+        self.connects = 0
+        self.lost = 0
+        self.failed = 0
+        self.connected = False
+        self.running = set()
+        self.lineRate = config.LINE_RATE
+        self.startup = Startup(time, STARTED)
+        self.startup.mark('imports', IMPORTED)
+        self.scheduler = Scheduler(reactor.callLater, reactor.seconds)
+        self.metrics = Metrics(reactor.seconds)
+        self.lag = LagMonitor(self.metrics, self.scheduler.call_later,
+                              reactor.seconds)
+        self.lag.start()
+        self.metrics.gauge('reactor_lag_seconds_last', lambda: self.lag.lag)
+        self.metrics.gauge('scheduled_events', lambda: len(self.scheduler))
+        self.metrics.gauge('connection', self._health)
+        self.metrics.gauge('startup_seconds',
+                           lambda: dict(self.startup.steps()))
+        self.profiler = None
+        self.limiter = RateLimiter(reactor.seconds, config.COMMAND_RATE,
+                                   config.COMMAND_BURST, config.COMMAND_COSTS,
+                                   config.COMMAND_COOLDOWNS)
+        # Filled in by load(), while the connection is being made.
+        self.questions = None
+        self.store = None
+        self.scores = {}
+        self.leaderboard = Leaderboard(self.scores)
+        self.loaded = False
+        # The connection which has signed on, if any.
+        self.bot = None
+        self.sampler = QuestionSampler(config.REPEAT_WINDOW)
+        try:
+            with open(config.STATE_DIR+'sampler.json', 'r') as savefile:
+                self.sampler.restore(json.load(savefile))
+        except:
+            logger.info("Sampler state doesn't exist.")
+        self.difficulty = DifficultyModel(config.STATE_DIR+'difficulty.bin')
+        self.latency = LatencyStats()
+        try:
+            with open(config.STATE_DIR+'latency.json', 'r') as savefile:
+                self.latency.restore(json.load(savefile))
+        except:
+            logger.info("Answer times don't exist.")
+        # Saved like the scores, as questions are asked and answered.
+        self.state_saver = DebouncedSaver(
+            self._state_snapshot, self._write_state, reactor.callLater,
+            deferToThread, config.SAVE_DELAY, config.SAVE_CHANGES,
+            observe=self._observe_save)
+        self.games = {}
+        self._update_games()
+        self.startup.mark('setup')
+
+    def load(self):
+        '''
+        Loads the question bank and the scores, each in a thread, so
+        the connection can be made and signed on meanwhile. The games
+        are joined once both are in. Returns a Deferred.
+        '''
+        if config.SCORE_BACKEND == 'sqlite':
+            from lib.sqlstore import SQLiteScoreStore
+            store = SQLiteScoreStore
+        else:
+            store = JsonScoreStore
+        self.store = store(config.SAVE_DIR, reactor.callLater,
+                           deferToThread, config.SAVE_DELAY,
+                           config.SAVE_CHANGES, self._observe_save)
+        d = DeferredList([deferToThread(self._load_questions),
+                          deferToThread(self._load_scores)],
+                         fireOnOneErrback=True, consumeErrors=True)
+        d.addCallbacks(self._loaded, self._load_failed)
+        return d
+
+    def _load_questions(self):
+        '''
+        Loads the question bank the config asks for.
+        '''
+        if config.Q_FILE:
+            questions = MappedQuestionBank(config.Q_FILE)
+        else:
+            questions = QuestionBank(config.Q_DIR)
+        with self.metrics.timed('question_load_seconds'):
+            count = questions.load()
+        logger.info("Loaded %d questions, skipped %d broken lines.",
+                    count, questions.broken)
+        self.startup.mark('questions')
+        return questions
+
+    def _load_scores(self):
+        '''
+        Loads the running data from previous games.
+        '''
+        scores = self.store.load()
+        leaderboard = Leaderboard(scores)
+        logger.info("Scores loaded for %d players.", len(scores))
+        self.startup.mark('scores')
+        return scores, leaderboard
+
+    def _loaded(self, results):
+        self.questions = results[0][1]
+        self.scores, self.leaderboard = results[1][1]
+        self.loaded = True
+        if config.SCORE_SYNC and hasattr(self.store, 'refresh'):
+            self.scheduler.call_later(config.SCORE_SYNC, self._sync_scores)
+        if self.bot is not None:
+            self._ready()
+
+    def _load_failed(self, failure):
+        # A DeferredList wraps the first error it sees.
+        logger.critical("Could not load the questions or scores:\n%s",
+                        failure.value.subFailure.getTraceback())
+        self.stopTrying()
+        reactor.stop()
+
+    def _ready(self):
+        '''
+        Joins the games, now that the bot has both signed on and loaded
+        everything, and reports how long that took.
+        '''
+        self.bot.ready()
+        if self.startup.elapsed('ready') is not None:
+            return
+        seconds = self.startup.mark('ready')
+        if seconds > config.SIGNON_BUDGET:
+            logger.warning("Ready %.2fs after starting, over the %gs "
+                           "budget: %s", seconds, config.SIGNON_BUDGET,
+                           self.startup.report())
+        else:
+            logger.info("Ready %.2fs after starting: %s", seconds,
+                        self.startup.report())
+
+    def _sync_scores(self):
+        '''
+        Picks up points given by any other bots sharing the scores.
+        '''
+        self.scheduler.call_later(config.SCORE_SYNC, self._sync_scores)
+        self.store.refresh().addCallback(self._apply_scores)
+
+    def _apply_scores(self, scores):
+        if scores is None:
+            return
+        for nick, score in scores.items():
+            if self.scores.get(nick) != score:
+                self.scores[nick] = score
+                self.leaderboard.update(nick, score)
+
+    def _update_games(self):
+        '''
+        Makes a game for each channel in the config, and applies the
+        config to the games already there. Returns the games added and
+        those whose channels are gone from the config, which are no
+        longer kept.
+        '''
+        added = []
+        channels = set()
+        for channel in config.GAME_CHANNELS:
+            key = channel.lower()
+            channels.add(key)
+            game = self.games.get(key)
+            if game is None:
+                game = self.games[key] = TriviaGame(
+                    None, channel, config.WAIT_INTERVAL, config.ANSWER_GRACE,
+                    config.CLUE_STYLE, config.PREFETCH_QUESTIONS)
+                added.append(game)
+            else:
+                game.configure(config.WAIT_INTERVAL, config.ANSWER_GRACE,
+                               config.CLUE_STYLE, config.PREFETCH_QUESTIONS)
+        removed = []
+        for key in list(self.games):
+            if key in channels:
+                continue
+            # Say goodbye while the game can still show the standings,
+            # and forget it was running, so it doesn't come back.
+            self.games[key].stop()
+            self.running.discard(key)
+            removed.append(self.games.pop(key))
+        return added, removed
+
+    def reload(self):
+        '''
+        Reloads the config in place, then the question bank in a thread.
+        Returns a Deferred firing with the games added and removed, as by
+        _update_games, once the new bank is in. The score backend and
+        SAVE_DIR only change with a full restart.
+        '''
+        # reload() only sets what the file sets, leaving behind anything
+        # since removed from it, and the defaults filled in from the old
+        # settings, so start from an empty module.
+        worker = config.WORKER
+        previous = dict(vars(config))
+        for name in list(previous):
+            if not name.startswith('__'):
+                delattr(config, name)
+        try:
+            reload(config)
+        except:
+            vars(config).update(previous)
+            raise
+        if worker is not None:
+            apply_worker(config, worker)
+        config_defaults()
+        self.maxDelay = config.RECONNECT_MAX_DELAY
         self.lineRate = config.LINE_RATE
+        self.limiter = RateLimiter(reactor.seconds, config.COMMAND_RATE,
+                                   config.COMMAND_BURST, config.COMMAND_COSTS,
+                                   config.COMMAND_COOLDOWNS)
+        d = self.reload_questions()
+        d.addCallback(lambda questions: self._update_games())
+        return d
+
+    def reload_questions(self):
+        '''
+        Loads the question bank again in a thread, and swaps it in once
+        it is complete. Returns a Deferred firing with the new bank.
+        '''
+        d = deferToThread(self._load_questions)
+        d.addCallback(self._swap_questions)
+        return d
+
+    def _swap_questions(self, questions):
+        self.questions = questions
+        return questions
+
+    def _observe_save(self, seconds):
+        # Timed in the thread doing the write, handed back to the reactor.
+        self.metrics.observe('save_seconds', seconds)
+
+    def _state_snapshot(self):
+        '''
+        Captures the recently asked questions, so they aren't repeated
+        after a restart, along with the answer times and how hard each
+        question is, for _write_state() to write in a thread.
+        '''
+        return (json.dumps(self.sampler.state()),
+                json.dumps(self.latency.state()),
+                self.difficulty.snapshot())
+
+    def _write_state(self, state):
+        sampler, latency, difficulty = state
+        if not path.exists(config.STATE_DIR):
+            makedirs(config.STATE_DIR)
+        atomic_write(config.STATE_DIR+'sampler.json', sampler)
+        atomic_write(config.STATE_DIR+'latency.json', latency)
+        if difficulty is not None:
+            self.difficulty.write(difficulty)
+
+    def save_state(self):
+        '''
+        Saves anything unsaved from the games now, waiting for it, for
+        when the bot is stopping.
+        '''
+        self.state_saver.flush_sync()
+
+    def shutdown(self):
+        '''
+        Writes out everything unsaved before the reactor stops, however
+        it was stopped, like by the supervisor sending SIGTERM.
+        '''
+        if self.store is not None:
+            self.store.close()
+            self.save_state()
+
+    def _health(self):
+        return {'connects': self.connects,
+                'lost': self.lost,
+                'failed': self.failed,
+                'up': int(self.connected),
+                'retry_delay': self.delay}
+
+    def buildProtocol(self, addr):
+        self.connects += 1
+        self.connected = True
+        self.startup.mark('connected')
+        return ReconnectingClientFactory.buildProtocol(self, addr)
+
+    def signed_on(self, bot):
+        '''
+        Notes that the connection is healthy, so the next reconnect
+        doesn't wait, and has bot join the games once everything is
+        loaded.
+        '''
+        self.resetDelay()
+        self.startup.mark('signon')
+        self.bot = bot
+        if self.loaded:
+            self._ready()
 
     def clientConnectionLost(self, connector, reason):
-        print("Lost connection (%s)" % (reason,))
-        connector.connect()
+        self.lost += 1
+        self.connected = False
+        self.bot = None
+        ReconnectingClientFactory.clientConnectionLost(self, connector,
+                                                       reason)
+        if self.continueTrying:
+            logger.warning("Lost connection (%s), reconnecting in about "
+                           "%.0fs.", reason.getErrorMessage(), self.delay)
 
     def clientConnectionFailed(self, connector, reason):
-        print("Could not connect: %s" % (reason,))
-        connector.connect()
+        self.failed += 1
+        self.connected = False
+        ReconnectingClientFactory.clientConnectionFailed(self, connector,
+                                                         reason)
+        if self.continueTrying:
+            logger.warning("Could not connect (%s), trying again in about "
+                           "%.0fs.", reason.getErrorMessage(), self.delay)
 
 
-if __name__ == "__main__":
+def config_defaults():
+    '''
+    Fills in the defaults for settings which may be left out of the config.
+    '''
     try:
         config.BIND_PORT
     except:
@@ -690,18 +1279,213 @@ if __name__ == "__main__":
         config.SERVER_TYPE
     except:
         config.SERVER_TYPE = 'plain'
+    try:
+        config.GAME_CHANNELS
+    except:
+        config.GAME_CHANNELS = [config.GAME_CHANNEL]
+    try:
+        config.Q_FILE
+    except:
+        config.Q_FILE = None
+    try:
+        config.REPEAT_WINDOW
+    except:
+        config.REPEAT_WINDOW = 10000
+    try:
+        config.SAVE_DELAY
+    except:
+        config.SAVE_DELAY = 300
+    try:
+        config.SAVE_CHANGES
+    except:
+        config.SAVE_CHANGES = 500
+    try:
+        config.SCORE_BACKEND
+    except:
+        config.SCORE_BACKEND = 'json'
+    try:
+        config.STANDINGS_PAGE
+    except:
+        config.STANDINGS_PAGE = 10
+    try:
+        config.OUTPUT_BACKLOG
+    except:
+        config.OUTPUT_BACKLOG = 20
+    try:
+        config.TARGET_SOLVE_RATE
+    except:
+        config.TARGET_SOLVE_RATE = 0.5
+    try:
+        config.DIFFICULTY_CANDIDATES
+    except:
+        config.DIFFICULTY_CANDIDATES = 3
+    try:
+        config.DIFFICULTY_POINTS
+    except:
+        config.DIFFICULTY_POINTS = True
+    try:
+        config.CATEGORY_WEIGHTS
+    except:
+        config.CATEGORY_WEIGHTS = {}
+    try:
+        config.CLUE_STYLE
+    except:
+        config.CLUE_STYLE = 'random'
+    try:
+        config.PREFETCH_QUESTIONS
+    except:
+        config.PREFETCH_QUESTIONS = 3
+    try:
+        config.ANSWER_GRACE
+    except:
+        config.ANSWER_GRACE = 1.0
+    try:
+        config.WORKERS
+    except:
+        config.WORKERS = []
+    try:
+        config.WORKER
+    except:
+        config.WORKER = None
+    try:
+        config.STATE_DIR
+    except:
+        config.STATE_DIR = config.SAVE_DIR
+    try:
+        config.SCORE_SYNC
+    except:
+        config.SCORE_SYNC = 10
+    try:
+        config.SIGNON_BUDGET
+    except:
+        config.SIGNON_BUDGET = 10
+    try:
+        config.RECONNECT_MAX_DELAY
+    except:
+        config.RECONNECT_MAX_DELAY = 300
+    try:
+        config.LOG_LEVEL
+    except:
+        config.LOG_LEVEL = 'INFO'
+    try:
+        config.METRICS_PORT
+    except:
+        config.METRICS_PORT = None
+    try:
+        config.METRICS_ADDR
+    except:
+        config.METRICS_ADDR = '127.0.0.1'
+    try:
+        config.COMMAND_RATE
+    except:
+        config.COMMAND_RATE = 0.5
+    try:
+        config.COMMAND_BURST
+    except:
+        config.COMMAND_BURST = 5
+    try:
+        config.COMMAND_COSTS
+    except:
+        config.COMMAND_COSTS = {}
+    try:
+        config.COMMAND_COOLDOWNS
+    except:
+        config.COMMAND_COOLDOWNS = {}
+
+
+def serve_metrics(metrics):
+    '''
+    Serves the metrics in Prometheus' text format on METRICS_PORT, which
+    is a TCP port on METRICS_ADDR, or the path of a Unix socket.
+    '''
+    from twisted.web.resource import Resource
+    from twisted.web.server import Site
+
+    class MetricsPage(Resource):
+        isLeaf = True
+
+        def render_GET(self, request):
+            request.setHeader(b'content-type', b'text/plain; version=0.0.4')
+            return metrics.prometheus().encode('utf-8')
+
+    site = Site(MetricsPage())
+    if isinstance(config.METRICS_PORT, int):
+        reactor.listenTCP(config.METRICS_PORT, site,
+                          interface=config.METRICS_ADDR)
+    else:
+        reactor.listenUNIX(config.METRICS_PORT, site)
+
+
+class WorkerProcess(ProcessProtocol):
+    '''
+    Tells the supervisor when a worker process ends.
+    '''
+
+    def __init__(self, supervisor, index):
+        self._supervisor = supervisor
+        self._index = index
+
+    def processEnded(self, reason):
+        code = reason.value.exitCode
+        logger.warning("Worker %d ended with %s.", self._index, code)
+        self._supervisor.exited(self._index, code)
+
+
+def spawn_worker(index, supervisor):
+    '''
+    Starts worker index as a process of its own, sharing our output.
+    '''
+    script = path.abspath(__file__)
+    return reactor.spawnProcess(
+        WorkerProcess(supervisor, index), sys.executable,
+        [sys.executable, script, '--worker', str(index)],
+        env=None, path=path.dirname(script), childFDs={0: 'w', 1: 1, 2: 2})
+
+
+def supervise():
+    '''
+    Runs a worker process for each entry in WORKERS, until stopped.
+    '''
+    supervisor = Supervisor(len(config.WORKERS), spawn_worker,
+                            reactor.callLater, reactor.seconds)
+    reactor.callWhenRunning(supervisor.start)
+    reactor.addSystemEventTrigger('before', 'shutdown', supervisor.stop)
+    logger.info("Supervising %d workers.", len(config.WORKERS))
+    reactor.run()
+
+
+if __name__ == "__main__":
+    if '--worker' in sys.argv:
+        apply_worker(config, int(sys.argv[sys.argv.index('--worker') + 1]))
+    config_defaults()
+    logging.basicConfig(
+        format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s',
+        level=getattr(logging, str(config.LOG_LEVEL).upper(), logging.INFO))
+
+    if config.WORKERS and config.WORKER is None:
+        supervise()
+        sys.exit()
 
     BIND = (config.BIND_ADDR, config.BIND_PORT)
 
+    if config.SERVER_TYPE not in ('ssl', 'plain'):
+        logger.error("Invalid server_type specified in config. Either "
+                     "enter 'ssl', 'plain', or leave commented out.")
+        quit()
+    # Workers may have nicks of their own.
+    factory = ircbotFactory(config.DEFAULT_NICK, config.DEFAULT_NAME)
+    # The questions and scores load while connecting.
+    reactor.callWhenRunning(factory.load)
+    reactor.addSystemEventTrigger('before', 'shutdown', factory.shutdown)
+    if config.METRICS_PORT:
+        serve_metrics(factory.metrics)
     if config.SERVER_TYPE == 'ssl':
+        # Only imported when needed, as it brings in pyOpenSSL.
+        from twisted.internet import ssl
         reactor.connectSSL(config.SERVER, config.SERVER_PORT,
-                           ircbotFactory(), ssl.ClientContextFactory(),
+                           factory, ssl.ClientContextFactory(),
                            config.TIMEOUT, BIND)
-    elif config.SERVER_TYPE == 'plain':
-        reactor.connectTCP(config.SERVER, config.SERVER_PORT,
-                           ircbotFactory(), config.TIMEOUT, BIND)
     else:
-        print('Invalid server_type specified in config.')
-        print("Either enter 'ssl', 'plain', or leave commented out.")
-        quit()
+        reactor.connectTCP(config.SERVER, config.SERVER_PORT,
+                           factory, config.TIMEOUT, BIND)
     reactor.run()
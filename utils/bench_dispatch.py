@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Measures how many channel messages per second the inbound pipeline can
+# handle, on a synthetic trace of a busy channel: mostly chatter, some of it
+# coloured, with guesses at the answer and the odd command. The old pipeline,
+# which stripped colours a character at a time, split every line several
+# times and only took exact answers, is timed alongside for comparison, so
+# the difference includes what forgiving typos costs.
+
+import logging
+import os
+import optparse
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.answer import Answer
+from lib.dispatch import split_command, strip_formatting
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('bench_dispatch')
+logger.setLevel(logging.INFO)
+
+NICK = 'TriviaBot'
+COMMANDS = set(['score', 'help', 'start', 'stop', 'source', 'standings',
+                'top', 'question', 'clue', 'next', 'skip', 'restart', 'die',
+                'set', 'save', 'reload'])
+WORDS = ('the', 'answer', 'is', 'lol', 'no', 'way', 'what', 'was', 'that',
+         'question', 'again', 'i', 'think', 'it', 'might', 'be', 'a', 'song',
+         'from', 'the', 'eighties', 'maybe', 'brb', 'coffee', 'haha')
+
+
+def make_trace(count, seed):
+    rng = random.Random(seed)
+    trace = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            trace.append('?' + rng.choice(('score', 'question', 'clue',
+                                           'standings 2', 'next')))
+        elif roll < 0.07:
+            trace.append('%s: %s' % (NICK, rng.choice(('help', 'score'))))
+        elif roll < 0.25:
+            trace.append(rng.choice(('tomatoes', 'potatoes', 'tomato',
+                                     'the tomatoes', 'apples')))
+        else:
+            line = ' '.join(rng.choice(WORDS)
+                            for j in range(rng.randint(1, 15)))
+            if roll > 0.9:
+                line = '\x02\x0304,01' + line + '\x0f'
+            trace.append(line)
+    return trace
+
+
+def legacy(msg, answer):
+    '''
+    The pipeline as it was, less the command handlers themselves. Guesses
+    were compared with the answer exactly, ignoring case.
+    '''
+    try:
+        while not msg[0].isalnum() and not msg[0] == '?':
+            msg = msg[1:]
+    except IndexError:
+        return
+    try:
+        if (msg[0] == "?"):
+            command = msg.replace('?', '').split()[0]
+            args = msg.replace('?', '').split()[1:]
+            return command.lower() in COMMANDS, args
+        elif (msg.split()[0].find(NICK) == 0):
+            command = msg.split()[1]
+            args = msg.replace(NICK, '').split()[2:]
+            return command.lower() in COMMANDS, args
+        else:
+            return msg.lower().strip() == answer.answer.lower()
+    except:
+        return
+
+
+def current(msg, answer):
+    msg = strip_formatting(msg)
+    command = split_command(msg, NICK)
+    if command is not None:
+        return command[0] in COMMANDS, command[1]
+    return answer.check(msg)
+
+
+def exact(msg, answer):
+    '''
+    The current dispatch with the old exact answer check, to tell the
+    two changes apart.
+    '''
+    msg = strip_formatting(msg)
+    command = split_command(msg, NICK)
+    if command is not None:
+        return command[0] in COMMANDS, command[1]
+    return msg.lower().strip() == answer.answer.lower()
+
+
+op = optparse.OptionParser()
+op.add_option('-n', '--messages', dest='messages', type=int,
+              default=100000, help='Number of messages in the trace')
+op.add_option('-r', '--repeat', dest='repeat', type=int,
+              default=5, help='Runs to take the best of')
+op.add_option('-s', '--seed', dest='seed', type=int,
+              default=1, help='Seed for the synthetic trace')
+options, args = op.parse_args()
+
+trace = make_trace(options.messages, options.seed)
+answer = Answer('Tomatoes')
+for name, pipeline in (('legacy', legacy), ('current', current),
+                       ('current, exact answers', exact)):
+    best = min(timeit.repeat(lambda: [pipeline(msg, answer) for msg in trace],
+                             number=1, repeat=options.repeat))
+    logger.info('{0}: {1:.0f} messages/s'.format(name, len(trace) / best))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+# Compiles the questions directory into a single binary file which the bot
+# memory maps, instead of loading every question onto the heap. Broken lines
+# are reported here rather than when the bot happens to pick them.
+
+import logging
+import os
+import optparse
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.questionbank import compile_questions
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('build_questions')
+logger.setLevel(logging.INFO)
+
+
+def broken(path, lineno, line):
+    logger.warning('{0}:{1}: broken question: {2!r}'.format(path, lineno, line))
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with files to compile')
+op.add_option('-o', '--output', dest='output', type=str,
+              default='questions.bin', help='Compiled question file to write')
+op.add_option('-l', '--log-level', dest='log_level', type=str,
+              default='info', help='Logging output level')
+options, args = op.parse_args()
+
+if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                 'CRITICAL']:
+    logger.setLevel(getattr(logging, options.log_level.upper()))
+
+
+logger.info('Compiling {0} into {1} ...'.format(options.path, options.output))
+count = compile_questions(options.path, options.output, broken)
+logger.info('Done. {0} questions written.'.format(count))
@@ -1,68 +1,210 @@
 #!/usr/bin/env python
 
-# Short deduplication script. Runs over every file in the target directory and
-# spits out duplicate lines and files which contained them.
+# Deduplication script. Scans every file in the target directory in parallel
+# and reports duplicate questions, near duplicates and malformed lines.
+#
+# Questions count as duplicates when their question and answer are the same
+# once normalized the way the bot compares answers, so case, punctuation and
+# spacing don't hide them. Near duplicates have the same answer, the same
+# numbers in the question, and questions whose character trigrams overlap by
+# at least the threshold. Candidates are found with MinHash signatures of the
+# trigrams and locality sensitive hashing over bands of the signature, then
+# checked against the trigrams themselves.
+#
+# Only the first copy of each question, in sorted file order, is kept. With
+# -d every affected file is rewritten once, without its extra copies. Near
+# duplicates are only reported, as questions alike enough can still ask
+# different things, unless --delete-near is given too.
 
 from collections import defaultdict
+from functools import partial
+from hashlib import sha1
 import logging
+from multiprocessing import Pool
 import os
 import optparse
-import subprocess
+import re
+import struct
 import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.answer import normalize
+from lib.questionbank import parse_line
+from lib.storage import atomic_write
 
 
 logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
 logger = logging.getLogger('dedup')
 logger.setLevel(logging.INFO)
 
+# A signature has BANDS * ROWS slots. Two questions become candidates when
+# every slot in any one band matches, which is likely once their trigrams
+# overlap by about (1 / BANDS) ** (1 / ROWS), here around 60%.
+BANDS = 8
+ROWS = 4
+SLOTS = BANDS * ROWS
+EMPTY = 0xffffffff
+KEY = struct.Struct('<Q')
+DIGITS = re.compile(r'\d+')
+
+
+def digest(text):
+    return KEY.unpack(sha1(text.encode('utf-8')).digest()[:8])[0]
+
+
+def trigrams(text):
+    data = text.encode('utf-8')
+    return set(data[i:i + 3] for i in range(max(1, len(data) - 2)))
+
+
+def signature(text):
+    '''
+    Returns the MinHash signature of text's character trigrams. Each
+    trigram is hashed once and lands in one slot, which keeps the
+    smallest hash it sees, rather than hashing it once per slot.
+    '''
+    slots = [EMPTY] * SLOTS
+    for trigram in trigrams(text):
+        value = zlib.crc32(trigram) & 0xffffffff
+        slot = value % SLOTS
+        if value < slots[slot]:
+            slots[slot] = value
+    return tuple(slots)
+
 
-def collate(d, path):
-    with open(path, "rU") as handle:
-        for line in handle:
-            d[line].append(path)
+def alike(a, b, threshold):
+    '''
+    Returns True if questions a and b, normalized, ask the same thing:
+    they have the same numbers, like the day in "born on 15 January",
+    and their trigrams overlap by at least threshold.
+    '''
+    if DIGITS.findall(a) != DIGITS.findall(b):
+        return False
+    a = trigrams(a)
+    b = trigrams(b)
+    return len(a & b) >= threshold * len(a | b)
 
 
-def readdir(directory):
-    d = defaultdict(list)
+def scan_file(path, near=False):
+    '''
+    Reads one file, returning (path, records, malformed). Each record is
+    (lineno, key, answer, signature, question) for a usable line, with
+    the question normalized, and malformed lists (lineno, line) for the
+    rest. Blank lines are ignored. Signatures are only worked out when
+    looking for near duplicates, and are None otherwise.
+    '''
+    records = []
+    malformed = []
+    with open(path, 'rb') as handle:
+        for lineno, raw in enumerate(handle, start=1):
+            line = raw.rstrip(b'\r\n').decode('utf-8', 'replace')
+            if not line.strip():
+                continue
+            try:
+                question, answer = parse_line(line)
+            except ValueError:
+                malformed.append((lineno, line))
+                continue
+            question = normalize(question)
+            answer = normalize(answer)
+            records.append((lineno, digest(question + '`' + answer),
+                            digest(answer),
+                            signature(question) if near else None, question))
+    return path, records, malformed
+
+
+def find_files(directory):
+    paths = []
     for root, dirs, files in os.walk(directory):
         for name in files:
-            path = os.path.join(root, name)
-            collate(d, path)
-    return d
-
-
-op = optparse.OptionParser()
-op.add_option('-p', '--path', dest='path', type=str,
-              default='questions', help='Directory with files to scan')
-op.add_option('-l', '--log-level', dest='log_level', type=str,
-              default='warning', help='Logging output level')
-op.add_option('-d', '--destructive', dest='delete', action="store_true",
-              default=False, help='Setting this will delete all but one copy')
-options, args = op.parse_args()
-
-if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
-                                 'CRITICAL']:
-    logger.setLevel(getattr(logging, options.log_level.upper()))
-
-
-logger.info('Reading {0} ...'.format(options.path))
-d = readdir(options.path)
-
-logger.info("Done. Duplicates:")
-
-for line, paths in d.iteritems():
-    if len(paths) > 1:
-        logger.info(line)
-        logger.info(", ".join(paths))
-        purge = paths[:-1]  # keep the copy in the last file
-        cmd = [ 'sed', '-i', "{/" + line.strip() + "/d}", ] + purge
-        logger.warning(' '.join(cmd)) 
-        if options.delete:
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,)
-            (out, err) = proc.communicate()
-            if out:
-                logger.info(out)
-            if err:
-                logger.error(err)
+            paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def rewrite(path, drop):
+    '''
+    Rewrites a file once, without the lines numbered in drop.
+    '''
+    with open(path, 'rb') as handle:
+        lines = handle.readlines()
+    atomic_write(path, b''.join(line for lineno, line in
+                                enumerate(lines, start=1)
+                                if lineno not in drop))
+
+
+if __name__ == '__main__':
+    op = optparse.OptionParser()
+    op.add_option('-p', '--path', dest='path', type=str,
+                  default='questions', help='Directory with files to scan')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='warning', help='Logging output level')
+    op.add_option('-d', '--destructive', dest='delete', action="store_true",
+                  default=False,
+                  help='Setting this will delete all but one copy')
+    op.add_option('-n', '--near', dest='near', action="store_true",
+                  default=False, help='Also look for near duplicates')
+    op.add_option('--delete-near', dest='delete_near', action="store_true",
+                  default=False, help='With -d, delete near duplicates too')
+    op.add_option('-t', '--threshold', dest='threshold', type=float,
+                  default=0.8, help='How alike near duplicates are, 0 to 1')
+    op.add_option('-j', '--jobs', dest='jobs', type=int,
+                  default=None, help='Worker processes, default one per CPU')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    logger.info('Reading {0} ...'.format(options.path))
+    seen = {}
+    bands = {}
+    drop = defaultdict(set)
+    near = defaultdict(set)
+    counts = {'lines': 0, 'duplicates': 0, 'near': 0, 'malformed': 0}
+    pool = Pool(options.jobs)
+    # Files come back in order, so the first copy found is the one kept.
+    scan = partial(scan_file, near=options.near)
+    for path, records, malformed in pool.imap(scan, find_files(options.path)):
+        counts['lines'] += len(records) + len(malformed)
+        for lineno, line in malformed:
+            counts['malformed'] += 1
+            logger.warning('{0}:{1}: malformed line: {2!r}'.format(
+                path, lineno, line))
+        for lineno, key, answer, sig, question in records:
+            if key in seen:
+                counts['duplicates'] += 1
+                logger.info('{0}:{1}: duplicate of {2}:{3}'.format(
+                    path, lineno, *seen[key][:2]))
+                drop[path].add(lineno)
+                continue
+            if not options.near:
+                seen[key] = (path, lineno)
+                continue
+            seen[key] = (path, lineno, question)
+            for band in range(BANDS):
+                bucket = (band, answer, sig[band * ROWS:(band + 1) * ROWS])
+                other = bands.get(bucket)
+                if other is None:
+                    bands[bucket] = key
+                elif alike(question, seen[other][2], options.threshold):
+                    counts['near'] += 1
+                    logger.info('{0}:{1}: near duplicate of {2}:{3}'.format(
+                        path, lineno, *seen[other][:2]))
+                    near[path].add(lineno)
+                    break
+    pool.close()
+    pool.join()
+
+    logger.warning('{lines} lines: {duplicates} duplicates, {near} near '
+                   'duplicates, {malformed} malformed.'.format(**counts))
+    if options.delete:
+        if options.delete_near:
+            for path, lines in near.items():
+                drop[path].update(lines)
+        for path in sorted(drop):
+            rewrite(path, drop[path])
+            logger.info('{0}: removed {1} lines'.format(path, len(drop[path])))
+        logger.warning('Rewrote {0} files.'.format(len(drop)))
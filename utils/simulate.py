@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+# Offline simulator. Drives the real bot protocol over a fake transport, with
+# a fake clock standing in for the reactor, through simulated days of channel
+# traffic: chatter, guesses, right answers, command spam and people joining
+# and leaving. Nothing touches the network, and scores are saved to a
+# temporary directory.
+#
+# The traffic and the bot's own choices are seeded, so two runs with the same
+# options send the same lines and ask the same questions. Only the timings
+# differ, which makes the report a benchmark: how many messages a second the
+# bot handles, by kind, how long right answers take to detect, what drawing
+# and loading questions and saving cost, and how memory grows from day to
+# day.
+
+import gc
+import json
+import logging
+import os
+import optparse
+import random
+import shutil
+import sys
+import tempfile
+from time import gmtime, strftime
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('simulate')
+logger.setLevel(logging.INFO)
+
+NICK = 'TriviaBot'
+ADMIN = 'admin'
+DAY = 86400
+COMMANDS = ('score', 'standings', 'standings me', 'standings 3', 'top',
+            'fastest', 'question', 'clue', 'next', 'categories', 'help',
+            'start')
+WORDS = ('the', 'answer', 'is', 'lol', 'no', 'way', 'what', 'was', 'that',
+         'question', 'again', 'i', 'think', 'it', 'might', 'be', 'a', 'song',
+         'from', 'the', 'eighties', 'maybe', 'brb', 'coffee', 'haha')
+
+
+def load_config(name):
+    '''
+    Imports the named config module as config, which the bot imports,
+    and points it somewhere harmless.
+    '''
+    config = __import__(name)
+    sys.modules['config'] = config
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    if not os.path.isabs(config.Q_DIR):
+        config.Q_DIR = os.path.join(root, config.Q_DIR)
+    config.SAVE_DIR = tempfile.mkdtemp(prefix='simulate-') + os.sep
+    config.ADMINS = [ADMIN]
+    config.DEFAULT_NICK = NICK
+    return config
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def memory(tracing):
+    if tracing:
+        import tracemalloc
+        # Leave out the simulator's own timings, which grow by design.
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__)])
+        return sum(stat.size for stat in snapshot.statistics('filename'))
+    import resource
+    # Kilobytes on Linux, the peak rather than the current size.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Simulation(object):
+    '''
+    Sets up a bot on a fake clock and transport, and feeds it traffic.
+    '''
+
+    def __init__(self, options):
+        from twisted.internet.defer import maybeDeferred
+        from twisted.internet.task import Clock
+        from twisted.internet.testing import StringTransport
+        import trivia
+
+        self.options = options
+        self.rng = random.Random(options.seed)
+        # The bot's own randomness: question draws, clues and so on.
+        random.seed(options.seed)
+        self.clock = Clock()
+        self.clock.advance(1500000000)
+        trivia.reactor = self.clock
+        # Saves run straight away instead of in a thread, so their cost
+        # is counted.
+        trivia.deferToThread = maybeDeferred
+        trivia.config.GAME_CHANNELS = ['#sim%d' % i
+                                       for i in range(options.channels)]
+        trivia.config_defaults()
+        start = default_timer()
+        self.factory = trivia.ircbotFactory()
+        # Loads straight away too, with the threads replaced.
+        self.factory.load()
+        self.startup = default_timer() - start
+        # The fake clock jumps from one line to the next, which would look
+        # like the reactor running late.
+        self.factory.lag.stop()
+        self.transport = StringTransport()
+        self.bot = self.factory.buildProtocol(('127.0.0.1', 0))
+        self.bot.makeConnection(self.transport)
+        self.sent = 0
+        self.timings = dict((kind, []) for kind in
+                            ('chatter', 'guess', 'answer', 'command',
+                             'churn'))
+        self.timers = 0.0
+        self.present = dict((channel, set()) for channel in
+                            trivia.config.GAME_CHANNELS)
+        self.away = dict((channel, set('user%d' % i
+                                       for i in range(options.users)))
+                         for channel in trivia.config.GAME_CHANNELS)
+
+    def line(self, nick, line):
+        '''
+        Feeds the bot a line from nick, tagged with the server's time.
+        '''
+        now = self.clock.seconds()
+        stamp = strftime('%Y-%m-%dT%H:%M:%S', gmtime(now))
+        self.bot.lineReceived('@time=%s.%03dZ :%s!u@sim.host %s' %
+                              (stamp, int(now * 1000) % 1000, nick, line))
+
+    def connect(self):
+        self.bot.lineReceived(':srv CAP * LS :multi-prefix server-time')
+        self.bot.lineReceived(':srv CAP * ACK :server-time')
+        self.bot.lineReceived(':srv 001 %s :Welcome' % NICK)
+        for channel, away in sorted(self.away.items()):
+            self.line(NICK, 'JOIN %s' % channel)
+            joining = sorted(away)[:len(away) // 2]
+            self.present[channel].update(joining)
+            away.difference_update(joining)
+            self.bot.lineReceived(':srv 353 %s = %s :@%s %s' %
+                                  (NICK, channel, ADMIN, ' '.join(joining)))
+            self.bot.lineReceived(':srv 366 %s %s :End of /NAMES list.' %
+                                  (NICK, channel))
+            self.line(ADMIN, 'PRIVMSG %s :?start' % channel)
+
+    def event(self, channel):
+        '''
+        Returns (kind, nick, line) for a random piece of traffic.
+        '''
+        options = self.options
+        rng = self.rng
+        present = self.present[channel]
+        away = self.away[channel]
+        roll = rng.random()
+        if roll < options.churn or not present:
+            if away and (rng.random() < 0.5 or not present):
+                nick = rng.choice(sorted(away))
+                away.discard(nick)
+                present.add(nick)
+                return 'churn', nick, 'JOIN %s' % channel
+            nick = rng.choice(sorted(present))
+            present.discard(nick)
+            away.add(nick)
+            return 'churn', nick, 'PART %s :bye' % channel
+        nick = rng.choice(sorted(present))
+        roll -= options.churn
+        if roll < options.commands:
+            return 'command', nick, 'PRIVMSG %s :?%s' % (
+                channel, rng.choice(COMMANDS))
+        roll -= options.commands
+        if roll < options.guesses:
+            game = self.bot._game(channel)
+            if game.running and rng.random() < options.correct:
+                return 'answer', nick, 'PRIVMSG %s :%s' % (
+                    channel, game._answer.answer)
+            return 'guess', nick, 'PRIVMSG %s :%s' % (
+                channel, rng.choice(WORDS))
+        return 'chatter', nick, 'PRIVMSG %s :%s' % (
+            channel, ' '.join(rng.choice(WORDS)
+                              for i in range(rng.randint(1, 12))))
+
+    def run(self):
+        options = self.options
+        channels = sorted(self.present)
+        rate = options.rate * len(channels)
+        end = self.clock.seconds() + options.days * DAY
+        next_day = self.clock.seconds() + DAY
+        next_save = self.clock.seconds() + 3600
+        days = []
+        messages = 0
+        self.connect()
+        base = memory(options.tracemalloc)
+        while self.clock.seconds() < end:
+            start = default_timer()
+            self.clock.advance(self.rng.expovariate(rate))
+            self.timers += default_timer() - start
+            channel = self.rng.choice(channels)
+            kind, nick, line = self.event(channel)
+            start = default_timer()
+            self.line(nick, line)
+            self.timings[kind].append(default_timer() - start)
+            messages += 1
+            if messages % 1000 == 0:
+                self.sent += len(self.transport.value())
+                self.transport.clear()
+            if self.clock.seconds() >= next_save:
+                next_save += 3600
+                self.line(ADMIN, 'PRIVMSG %s :?save' % channels[0])
+            if self.clock.seconds() >= next_day:
+                next_day += DAY
+                gc.collect()
+                days.append(memory(options.tracemalloc) - base)
+        self.sent += len(self.transport.value())
+        self.transport.clear()
+        return messages, days
+
+    def report(self, messages, days):
+        metrics = self.factory.metrics
+        busy = sum(sum(timings) for timings in self.timings.values())
+        report = {'seed': self.options.seed,
+                  'simulated_days': self.options.days,
+                  'messages': messages,
+                  'messages_per_second': messages / busy if busy else 0.0,
+                  'timer_seconds': self.timers,
+                  'startup_seconds': self.startup,
+                  'startup_steps': dict(self.factory.startup.steps()),
+                  'bytes_sent': self.sent,
+                  'memory_growth_by_day': days,
+                  'kinds': {},
+                  'histograms': {}}
+        for kind, timings in sorted(self.timings.items()):
+            timings.sort()
+            report['kinds'][kind] = {
+                'count': len(timings),
+                'per_second': (len(timings) / sum(timings)
+                               if timings else 0.0),
+                'p50': percentile(timings, 0.5),
+                'p99': percentile(timings, 0.99),
+                'max': timings[-1] if timings else 0.0}
+        for name, histogram in sorted(metrics.histograms().items()):
+            report['histograms'][name] = {'count': histogram.count,
+                                          'average': histogram.average(),
+                                          'max': histogram.max}
+        report['counters'] = metrics.counters()
+        return report
+
+
+def show(report):
+    logger.info('{messages} messages over {simulated_days} days, '
+                '{messages_per_second:.0f} messages/s, timers took '
+                '{timer_seconds:.2f}s, startup {startup_seconds:.2f}s'.format(
+                    **report))
+    logger.info('startup: %s', ', '.join(
+        '%s %.2fs' % step for step in sorted(
+            report['startup_steps'].items(), key=lambda step: step[1])))
+    for kind, stats in sorted(report['kinds'].items()):
+        logger.info('{0:8} {count:8d} {per_second:10.0f}/s  p50 {1:8.1f}us  '
+                    'p99 {2:8.1f}us  max {3:8.1f}us'.format(
+                        kind, stats['p50'] * 1e6, stats['p99'] * 1e6,
+                        stats['max'] * 1e6, **stats))
+    for name, stats in sorted(report['histograms'].items()):
+        logger.info('{0:24} {count:8d}  avg {1:8.1f}us  max {2:8.1f}us'.format(
+            name, stats['average'] * 1e6, stats['max'] * 1e6, **stats))
+    for day, growth in enumerate(report['memory_growth_by_day'], start=1):
+        logger.info('day {0}: memory {1:+.1f} MiB'.format(
+            day, growth / 1048576.0))
+
+
+if __name__ == '__main__':
+    op = optparse.OptionParser()
+    op.add_option('-c', '--config', dest='config', type=str,
+                  default='example_config', help='Config module to start from')
+    op.add_option('-d', '--days', dest='days', type=float,
+                  default=1, help='Simulated days to run for')
+    op.add_option('-C', '--channels', dest='channels', type=int,
+                  default=1, help='Game channels')
+    op.add_option('-u', '--users', dest='users', type=int,
+                  default=50, help='Users per channel, half of them present')
+    op.add_option('-r', '--rate', dest='rate', type=float,
+                  default=1.0, help='Messages per second per channel')
+    op.add_option('-g', '--guesses', dest='guesses', type=float,
+                  default=0.3, help='Share of messages that are guesses')
+    op.add_option('-a', '--correct', dest='correct', type=float,
+                  default=0.05, help='Share of guesses that are right')
+    op.add_option('-m', '--commands', dest='commands', type=float,
+                  default=0.05, help='Share of messages that are commands')
+    op.add_option('-j', '--churn', dest='churn', type=float,
+                  default=0.01, help='Share of messages that are joins/parts')
+    op.add_option('-s', '--seed', dest='seed', type=int,
+                  default=1, help='Seed for the traffic and the bot')
+    op.add_option('-t', '--tracemalloc', dest='tracemalloc',
+                  action='store_true', default=False,
+                  help='Track memory exactly, which slows everything down')
+    op.add_option('-o', '--json', dest='json', type=str,
+                  default=None, help='Also write the report to this file')
+    op.add_option('-b', '--budget', dest='budget', type=float,
+                  default=None, help='Fail if the bot takes longer than '
+                  'this many seconds from import to joining its games')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='info', help='Logging output level')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+    # The bot's own logging would swamp the report.
+    logging.getLogger('triviabot').setLevel(logging.WARNING)
+    if options.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+
+    config = load_config(options.config)
+    try:
+        simulation = Simulation(options)
+        report = simulation.report(*simulation.run())
+    finally:
+        shutil.rmtree(config.SAVE_DIR)
+    show(report)
+    if options.json:
+        with open(options.json, 'w') as out:
+            json.dump(report, out, indent=2, sort_keys=True)
+    ready = report['startup_steps'].get('ready')
+    if options.budget is not None and (ready is None or
+                                       ready > options.budget):
+        logger.error('Not ready within the %gs budget.', options.budget)
+        sys.exit(1)